@@ -0,0 +1,531 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Benchmarks - sentetik TLC verisi üzerinde yükleme, temizleme, özet ve model ölçümleri
+
+Veri src/synthetic.py ile üretilir (benchmarks/.data altında önbelleğe alınır), böylece
+ölçümler TLC CDN'e ihtiyaç duymadan ve her commit'te aynı girdiyle tekrarlanabilir.
+Her benchmark için en iyi süre, satır/sn, tracemalloc tepe belleği (Python/NumPy yığını)
+ve örneklenen RSS artışı (Arrow / XGBoost gibi yerel bellek dahil) kaydedilir; model
+benchmark'ları fit ve predict'i ayrıca raporlar.
+
+    python benchmarks/run.py --rows 1000000
+    python benchmarks/run.py --rows 100000 --only clean,aggregate
+    python benchmarks/run.py --compare benchmarks/results/<eski>.json benchmarks/results/<yeni>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+import advanced_models
+import inference
+import main_analysis
+from aggregates import TripAggregates, aggregate_sections
+from cleaning import clean_yellow_taxi, clean_fhvhv
+from feature_store import build_features, iter_feature_batches, load_features, read_raw
+from pricing import GRID, Market, scenario_grid
+from micro_batch import LiveAggregates
+from profiling import PROFILER, MemoryTracker, measure
+from sketches import TripSketches
+from synthetic import generate
+from trip_cube import CubeBuilder, build_cube
+from trip_store import TripStore
+from zone_demand import ZONE_DEMAND_META, ZoneDemandForecaster, zone_hour_counts
+from zone_index import load_zone_index
+
+DATA_ROOT = os.path.join(BENCH_DIR, ".data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Benchmark kaydı; fonksiyon Context alır ve işlediği satır sayısını döndürür."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Benchmark'lar arasında paylaşılan girdiler; her biri ilk kullanımda bir kez hazırlanır."""
+
+    def __init__(self, data_dir, files):
+        self.data_dir = data_dir
+        self.files = files
+        self.paths = {source: path for path, source in files}
+        self.model_dir = tempfile.mkdtemp(prefix="nyc-bench-models-")
+        self._cache = {}
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def raw(self, source):
+        return self._get(('raw', source), lambda: read_raw(self.paths[source], source))
+
+    def features(self, source):
+        return self._get(('features', source), lambda: build_features(self.paths[source], source))
+
+    def cleaned(self):
+        return self._get('cleaned', lambda: {
+            'yellow': load_features(self.features('yellow')),
+            'fhv': load_features(self.features('fhv')),
+            'cube': self.cube(),
+            'sketches': self.sketches(),
+        })
+
+    def cube(self):
+        def build():
+            builder = CubeBuilder()
+            for source in ('yellow', 'fhv'):
+                for df in iter_feature_batches(self.features(source)):
+                    builder.update(df, source)
+            return builder.finish(self.zone_index())
+        return self._get('cube', build)
+
+    def sketches(self):
+        def build():
+            sketches = TripSketches()
+            for source in ('yellow', 'fhv'):
+                for df in iter_feature_batches(self.features(source)):
+                    sketches.update(df, source)
+            return sketches
+        return self._get('sketches', build)
+
+    def trip_store(self):
+        def build():
+            cleaned = self.cleaned()
+            return TripStore.write(os.path.join(self.model_dir, 'trips'),
+                                   {source: cleaned[source] for source in ('yellow', 'fhv')}).root
+        return self._get('trip_store', build)
+
+    def zone_index(self):
+        return load_zone_index(self.data_dir)
+
+    def od(self):
+        return self._get('od', lambda: advanced_models.od_matrix(self.files))
+
+    def zone_demand(self):
+        def build():
+            # zone_demand benchmark'ı önceden koştuysa kaydettiği model kullanılır
+            path = os.path.join(self.model_dir, main_analysis.ZONE_DEMAND_DIRNAME)
+            if os.path.exists(os.path.join(path, ZONE_DEMAND_META)):
+                return ZoneDemandForecaster.open(path)
+            counts, start = zone_hour_counts(self.files)
+            return ZoneDemandForecaster.train(counts, start)
+        return self._get('zone_demand', build)
+
+    def models(self):
+        def build():
+            # Model benchmark'ları önceden koştuysa kaydettikleri modeller kullanılır
+            models = inference.load_models(self.model_dir)
+            if len(models) == len(inference.MODELS):
+                return models
+            yellow = self.cleaned()['yellow']
+            main_analysis.train_tip(yellow, self.model_dir)
+            main_analysis.train_demand(self.files, self.model_dir)
+            advanced_models.train_duration(self.files, self.od(), self.model_dir)
+            return inference.load_models(self.model_dir)
+        return self._get('models', build)
+
+
+# =============================================================================
+# LOAD
+# =============================================================================
+@benchmark('load.read_raw.yellow')
+def bench_read_raw_yellow(ctx):
+    return len(read_raw(ctx.paths['yellow'], 'yellow'))
+
+
+@benchmark('load.read_raw.fhv')
+def bench_read_raw_fhv(ctx):
+    return len(read_raw(ctx.paths['fhv'], 'fhv'))
+
+
+@benchmark('load.load_features')
+def bench_load_features(ctx):
+    return sum(len(load_features(ctx.features(source))) for source in ('yellow', 'fhv'))
+
+
+@benchmark('load.trip_store')
+def bench_trip_store(ctx):
+    # clean aşamasının çıktısını sonraki aşamalar gibi açar: memory-map + kompakt şemada pandas
+    frames = TripStore.open(ctx.trip_store()).frames()
+    return sum(len(df) for df in frames.values())
+
+
+# =============================================================================
+# CLEAN
+# =============================================================================
+@benchmark('clean.clean_yellow_taxi')
+def bench_clean_yellow(ctx):
+    df = ctx.raw('yellow')
+    clean_yellow_taxi(df)
+    return len(df)
+
+
+@benchmark('clean.clean_fhvhv')
+def bench_clean_fhv(ctx):
+    df = ctx.raw('fhv')
+    clean_fhvhv(df)
+    return len(df)
+
+
+@benchmark('clean.build_features')
+def bench_build_features(ctx):
+    # Temizleme + zone bilgisi + kompakt şema + Parquet yazımı (önbelleğin soğuk oluşturulması)
+    rows = 0
+    for source in ('yellow', 'fhv'):
+        path = build_features(ctx.paths[source], source)
+        rows += pq.ParquetFile(ctx.paths[source]).metadata.num_rows
+        ctx._cache[('features', source)] = path
+    return rows
+
+
+# =============================================================================
+# AGGREGATE
+# =============================================================================
+@benchmark('aggregate.build')
+def bench_build_cube(ctx):
+    # Temizlenmiş örneklemlerden tek geçişte küp (clean aşamasının son adımı)
+    cleaned = ctx.cleaned()
+    build_cube({'yellow': cleaned['yellow'], 'fhv': cleaned['fhv']})
+    return len(cleaned['yellow']) + len(cleaned['fhv'])
+
+
+@benchmark('aggregate.sections')
+def bench_aggregate(ctx):
+    cleaned = ctx.cleaned()
+    main_analysis.aggregate(cleaned, ctx.zone_index())
+    return len(cleaned['yellow']) + len(cleaned['fhv'])
+
+
+@benchmark('aggregate.segments')
+def bench_segments(ctx):
+    cleaned = ctx.cleaned()
+    main_analysis.segments(cleaned, ctx.zone_index())
+    return len(cleaned['yellow'])
+
+
+@benchmark('aggregate.stream_update')
+def bench_stream_update(ctx):
+    builder = CubeBuilder()
+    for source in ('yellow', 'fhv'):
+        for df in iter_feature_batches(ctx.features(source)):
+            builder.update(df, source)
+    builder.compact()
+    return builder.rows
+
+
+@benchmark('aggregate.sketch_update')
+def bench_sketch_update(ctx):
+    # Quantile (t-digest) + tekil rota (HyperLogLog) özetleri, küple aynı batch'lerden
+    sketches = TripSketches()
+    for source in ('yellow', 'fhv'):
+        for df in iter_feature_batches(ctx.features(source)):
+            sketches.update(df, source)
+    return sketches.rows
+
+
+@benchmark('aggregate.stream_sections')
+def bench_stream_sections(ctx):
+    cube = ctx.cube()
+    yellow, fhv = TripAggregates.from_cube(cube, 'yellow'), TripAggregates.from_cube(cube, 'fhv')
+    aggregate_sections(yellow, fhv, ctx.zone_index(), ctx.sketches())
+    return cube.total
+
+
+@benchmark('live.ingest')
+def bench_live_ingest(ctx):
+    # Micro-batch: ham dosya temizlenip yalnızca bu batch çalışan sayaçlara ve özetlere eklenir
+    live = LiveAggregates()
+    for source in ('yellow', 'fhv'):
+        live.ingest(ctx.paths[source], ctx.data_dir)
+    return sum(pq.ParquetFile(ctx.paths[source]).metadata.num_rows for source in ('yellow', 'fhv'))
+
+
+@benchmark('live.publish')
+def bench_live_publish(ctx):
+    # Sabit boyutlu sayaçlardan bölümler + durum yazımı (batch boyutundan bağımsız)
+    live = LiveAggregates({source: TripAggregates.from_cube(ctx.cube(), source) for source in ('yellow', 'fhv')},
+                          ctx.sketches())
+    live.sections(ctx.zone_index())
+    live.save(os.path.join(ctx.model_dir, 'live'))
+    return live.rows
+
+
+@benchmark('cube.query')
+def bench_cube_query(ctx):
+    # Panel tipi sorgular: filtre + roll-up
+    cube = ctx.cube()
+    cube.query(by=['provider'], pu_borough='Brooklyn', day=[5, 6], hour=[22, 23, 0, 1, 2, 3, 4])
+    cube.query(by=['date', 'hour'])
+    cube.query(by=['pu_borough', 'provider'], day='Monday')
+    return 3 * len(cube)
+
+
+@benchmark('pricing.simulate')
+def bench_pricing(ctx):
+    # Varsayılan grid: senaryo × (grup × zone × saat) dizileri; satır = senaryo sayısı
+    market = Market.from_cube(ctx.cube(), ctx.zone_index())
+    return len(market.simulate(scenario_grid(**GRID)))
+
+
+# =============================================================================
+# MODELS (fit / predict alt ölçümleri profiling kayıtlarından)
+# =============================================================================
+@benchmark('train_tip')
+def bench_train_tip(ctx):
+    yellow = ctx.cleaned()['yellow']
+    main_analysis.train_tip(yellow, ctx.model_dir)
+    return len(yellow)
+
+
+@benchmark('train_tip.out_of_core')
+def bench_train_tip_out_of_core(ctx):
+    ctx.features('yellow')
+    main_analysis.train_tip(None, ctx.model_dir, files=ctx.files, out_of_core='external')
+    return pq.ParquetFile(ctx.paths['yellow']).metadata.num_rows
+
+
+@benchmark('train_demand')
+def bench_train_demand(ctx):
+    ctx.features('yellow')
+    main_analysis.train_demand(ctx.files, ctx.model_dir)
+    return pq.ParquetFile(ctx.paths['yellow']).metadata.num_rows
+
+
+@benchmark('zone_demand')
+def bench_zone_demand(ctx):
+    ctx.features('yellow')
+    ctx.features('fhv')
+    main_analysis.zone_demand(ctx.files, ctx.zone_index(), ctx.model_dir)
+    return sum(pq.ParquetFile(path).metadata.num_rows for path, _ in ctx.files)
+
+
+@benchmark('zone_demand.forecast')
+def bench_zone_forecast(ctx):
+    # Şehrin tamamı için sonraki 24 saat (2 kaynak × 266 zone × 24 ufuk), tek predict çağrısı
+    forecaster = ctx.zone_demand()
+    with measure('zone_demand.forecast.predict') as m:
+        forecast = forecaster.forecast()
+        m.rows_in = forecast.size
+    return forecast.size
+
+
+@benchmark('od_matrix')
+def bench_od_matrix(ctx):
+    ctx.features('yellow')
+    advanced_models.od_matrix(ctx.files)
+    return pq.ParquetFile(ctx.paths['yellow']).metadata.num_rows
+
+
+@benchmark('train_duration')
+def bench_train_duration(ctx):
+    ctx.features('yellow')
+    advanced_models.train_duration(ctx.files, ctx.od(), ctx.model_dir)
+    return pq.ParquetFile(ctx.paths['yellow']).metadata.num_rows
+
+
+@benchmark('train_duration.out_of_core')
+def bench_train_duration_out_of_core(ctx):
+    ctx.features('yellow')
+    advanced_models.train_duration(ctx.files, ctx.od(), ctx.model_dir, out_of_core='external')
+    return pq.ParquetFile(ctx.paths['yellow']).metadata.num_rows
+
+
+@benchmark('inference.predict')
+def bench_inference(ctx):
+    # Sürücü uygulaması trafiği: 1k kayıtlık batch'ler, istek gövdesinden özellik matrisi + predict
+    models = ctx.models()
+    yellow = ctx.cleaned()['yellow']
+    instances = yellow[['trip_distance', 'fare_amount', 'passenger_count', 'PULocationID', 'DOLocationID',
+                        'hour', 'day_of_week']].head(1000 * 10).astype(float).to_dict('records')
+    for start in range(0, len(instances), 1000):
+        batch = instances[start:start + 1000]
+        for model in models.values():
+            model.predict(model.matrix(batch))
+    return len(instances) * len(models)
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+def _quiet(fn, *args):
+    """Aşama fonksiyonlarının ilerleme çıktısını bastırır."""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        return fn(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def _rss_peak_delta(fn, *args, interval=0.005):
+    """fn çalışırken RSS'yi örnekler; başlangıca göre en yüksek artış (bayt, ölçülemezse None)."""
+    with MemoryTracker(interval) as tracker:
+        fn(*args)
+    return tracker.growth
+
+
+def run_benchmark(name, fn, ctx, repeat):
+    walls, operations = [], {}
+    rows = None
+    for _ in range(repeat):
+        start = len(PROFILER.records)
+        wall_start = time.perf_counter()
+        rows = _quiet(fn, ctx)
+        walls.append(time.perf_counter() - wall_start)
+        for record in PROFILER.records[start:]:
+            if record['name'].endswith(('.fit', '.predict')):
+                best = operations.get(record['name'])
+                if best is None or record['wall_s'] < best['wall_s']:
+                    operations[record['name']] = record
+
+    # Bellek ayrı turlarda ölçülür; tracemalloc ve örnekleme süre ölçümünü bozar
+    rss_peak = _rss_peak_delta(_quiet, fn, ctx)
+    tracemalloc.start()
+    try:
+        _quiet(fn, ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    wall = min(walls)
+    results = {name: {
+        'wall_s': round(wall, 4),
+        'wall_s_all': [round(w, 4) for w in walls],
+        'rows': int(rows),
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None,
+        'peak_mb': round(peak / 1024 / 1024, 1),
+        'rss_peak_mb': None if rss_peak is None else round(rss_peak / 1024 / 1024, 1),
+    }}
+    for op_name, record in operations.items():
+        op_rows = record['rows_in'] or 0
+        results[op_name] = {
+            'wall_s': record['wall_s'],
+            'rows': op_rows,
+            'rows_per_s': round(op_rows / record['wall_s'], 1) if record['wall_s'] > 0 else None,
+            'peak_mb': None,
+            'rss_peak_mb': None,
+        }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'xgboost': xgb.__version__,
+    }
+
+
+def run(rows, repeat=3, only=None, seed=0, output=None):
+    data_dir = os.path.join(DATA_ROOT, f"rows-{rows}-seed-{seed}")
+    print(f"Sentetik veri: {data_dir}")
+    files = generate(data_dir, [(2024, 1)], rows, seed=seed)
+    ctx = Context(data_dir, files)
+
+    selected = [name for name in BENCHMARKS
+                if not only or any(name == prefix or name.startswith(prefix + '.') for prefix in only)]
+    results = {}
+    print(f"\n{'benchmark':<28}{'süre (s)':>12}{'satır/sn':>16}{'tepe (MB)':>12}{'RSS (MB)':>12}")
+    for name in selected:
+        for result_name, result in run_benchmark(name, BENCHMARKS[name], ctx, repeat).items():
+            results[result_name] = result
+            peak, rss = ('-' if value is None else f"{value:.1f}" for value in (result['peak_mb'], result['rss_peak_mb']))
+            print(f"{result_name:<28}{result['wall_s']:>12.4f}{result['rows_per_s'] or 0:>16,.0f}{peak:>12}{rss:>12}")
+
+    report = {'rows': rows, 'seed': seed, 'repeat': repeat,
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+              'benchmarks': results}
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['environment']['commit']}-{rows}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 {output}")
+    return report
+
+
+def compare(base_path, new_path, threshold=1.1):
+    """İki sonuç dosyasını karşılaştırır; threshold'dan fazla yavaşlayan benchmark sayısını döndürür."""
+    with open(base_path, 'r') as f:
+        base = json.load(f)
+    with open(new_path, 'r') as f:
+        new = json.load(f)
+    if base['rows'] != new['rows']:
+        print(f"⚠️ Farklı ölçekler: {base['rows']:,} / {new['rows']:,} satır")
+
+    print(f"{base['environment']['commit']} -> {new['environment']['commit']}\n")
+    print(f"{'benchmark':<28}{'önce (s)':>12}{'sonra (s)':>12}{'oran':>8}{'tepe önce':>12}{'tepe sonra':>12}")
+    regressions = 0
+    for name, result in new['benchmarks'].items():
+        before = base['benchmarks'].get(name)
+        if before is None:
+            print(f"{name:<28}{'-':>12}{result['wall_s']:>12.4f}")
+            continue
+        ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            regressions += 1
+            flag = '  ⚠️ yavaşladı'
+        elif ratio < 1 / threshold:
+            flag = '  ✅ hızlandı'
+        peaks = [('-' if r['peak_mb'] is None else f"{r['peak_mb']:.1f}") for r in (before, result)]
+        print(f"{name:<28}{before['wall_s']:>12.4f}{result['wall_s']:>12.4f}{ratio:>8.2f}"
+              f"{peaks[0]:>12}{peaks[1]:>12}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NYC Urban Mobility Intelligence Platform - benchmarks")
+    parser.add_argument('--rows', type=int, default=200_000, help="Kaynak başına sentetik satır sayısı (100k - 100M)")
+    parser.add_argument('--repeat', type=int, default=3, help="Her benchmark için tekrar sayısı (en iyi süre raporlanır)")
+    parser.add_argument('--only', default=None, help="Virgülle ayrılmış benchmark adları ya da önekleri, örn. clean,aggregate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Sonuç JSON dosyası (varsayılan: benchmarks/results/)")
+    parser.add_argument('--compare', nargs=2, metavar=('ONCE', 'SONRA'), help="İki sonuç dosyasını karşılaştır")
+    parser.add_argument('--threshold', type=float, default=1.1, help="--compare için yavaşlama eşiği (oran)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    run(args.rows, args.repeat, only, args.seed, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,139 +1,241 @@
 """
 NYC Urban Mobility Intelligence Platform
 Advanced ML Models - Trip Duration Prediction
+
+train_duration, pipeline.py'nin bir aşamasıdır; modül import edildiğinde hiçbir iş yapılmaz.
 """
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import xgboost as xgb
 import joblib
-import json
 import gc
-
-DATA_DIR = "/home/ubuntu/nyc_mobility_intelligence/data"
-OUTPUT_DIR = "/home/ubuntu/nyc_mobility_intelligence/visualizations"
-MODEL_DIR = "/home/ubuntu/nyc_mobility_intelligence/models"
-
-print("=" * 60)
-print("Advanced ML Models - Trip Duration Prediction")
-print("=" * 60)
-
-# Load data
-print("\n[1/4] Veri yükleniyor...")
-yellow_cols = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'passenger_count',
-               'trip_distance', 'PULocationID', 'DOLocationID', 'fare_amount']
-
-yellow_df = pq.read_table(f"{DATA_DIR}/yellow_2024_01.parquet", columns=yellow_cols).to_pandas()
-yellow_df = yellow_df.sample(n=min(300000, len(yellow_df)), random_state=42)
-
-# Clean and prepare
-print("\n[2/4] Veri hazırlanıyor...")
-yellow_df['pickup_datetime'] = pd.to_datetime(yellow_df['tpep_pickup_datetime'])
-yellow_df['dropoff_datetime'] = pd.to_datetime(yellow_df['tpep_dropoff_datetime'])
-yellow_df['trip_duration'] = (yellow_df['dropoff_datetime'] - yellow_df['pickup_datetime']).dt.total_seconds() / 60
-
-# Filter
-yellow_df = yellow_df[(yellow_df['trip_duration'] > 1) & (yellow_df['trip_duration'] < 120)]
-yellow_df = yellow_df[(yellow_df['trip_distance'] > 0) & (yellow_df['trip_distance'] < 50)]
-yellow_df = yellow_df[(yellow_df['fare_amount'] > 0) & (yellow_df['fare_amount'] < 200)]
-
-# Features
-yellow_df['hour'] = yellow_df['pickup_datetime'].dt.hour
-yellow_df['day_of_week'] = yellow_df['pickup_datetime'].dt.dayofweek
-yellow_df['is_weekend'] = yellow_df['day_of_week'].isin([5, 6]).astype(int)
-yellow_df['is_rush_hour'] = yellow_df['hour'].isin([7, 8, 9, 17, 18, 19]).astype(int)
-
-print(f"  Hazırlanan veri: {len(yellow_df):,} kayıt")
-
-# =============================================================================
-# TRIP DURATION PREDICTION MODEL
-# =============================================================================
-print("\n[3/4] Süre tahmin modeli eğitiliyor...")
-
-duration_features = ['trip_distance', 'hour', 'day_of_week', 'is_weekend', 
-                     'is_rush_hour', 'PULocationID', 'DOLocationID']
-
-X = yellow_df[duration_features].dropna()
-y = yellow_df.loc[X.index, 'trip_duration']
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# XGBoost model
-duration_model = xgb.XGBRegressor(
-    n_estimators=100,
-    max_depth=8,
-    learning_rate=0.1,
-    random_state=42,
-    n_jobs=-1
-)
-duration_model.fit(X_train, y_train)
-
-# Evaluate
-y_pred = duration_model.predict(X_test)
-duration_mae = mean_absolute_error(y_test, y_pred)
-duration_rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-duration_r2 = r2_score(y_test, y_pred)
-
-print(f"  MAE: {duration_mae:.2f} dakika")
-print(f"  RMSE: {duration_rmse:.2f} dakika")
-print(f"  R²: {duration_r2:.3f}")
-
-# Feature importance
-feature_importance = pd.DataFrame({
-    'feature': duration_features,
-    'importance': duration_model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-print("\n  Feature Importance:")
-for _, row in feature_importance.iterrows():
-    print(f"    {row['feature']}: {row['importance']:.3f}")
-
-# Save model
-joblib.dump(duration_model, f"{MODEL_DIR}/duration_prediction_model.joblib")
-
-# =============================================================================
-# SAVE RESULTS
-# =============================================================================
-print("\n[4/4] Sonuçlar kaydediliyor...")
-
-# Load existing results
-with open(f"{OUTPUT_DIR}/analysis_results.json", 'r') as f:
-    results = json.load(f)
-
-# Add duration model results
-results['ml_results']['duration_prediction'] = {
-    'mae_minutes': round(duration_mae, 2),
-    'rmse_minutes': round(duration_rmse, 2),
-    'r2_score': round(duration_r2, 3),
-    'feature_importance': feature_importance.to_dict('records')
-}
-
-# Add congestion analysis
-congestion_by_hour = yellow_df.groupby('hour').agg({
-    'trip_duration': 'mean',
-    'trip_distance': 'mean'
-}).round(2)
-congestion_by_hour['avg_speed_mph'] = (congestion_by_hour['trip_distance'] / 
-                                        (congestion_by_hour['trip_duration'] / 60)).round(2)
-congestion_by_hour = congestion_by_hour.reset_index()
-
-results['congestion_analysis'] = {
-    'hourly_speed': congestion_by_hour.to_dict('records'),
-    'rush_hour_avg_speed': round(yellow_df[yellow_df['is_rush_hour'] == 1].apply(
-        lambda x: x['trip_distance'] / (x['trip_duration'] / 60), axis=1).mean(), 2),
-    'off_peak_avg_speed': round(yellow_df[yellow_df['is_rush_hour'] == 0].apply(
-        lambda x: x['trip_distance'] / (x['trip_duration'] / 60), axis=1).mean(), 2)
-}
-
-# Save updated results
-with open(f"{OUTPUT_DIR}/analysis_results.json", 'w') as f:
-    json.dump(results, f, indent=2, default=str)
-
-print("\n" + "=" * 60)
-print("✅ Süre tahmin modeli tamamlandı!")
-print(f"📁 Model: {MODEL_DIR}/duration_prediction_model.joblib")
-print("=" * 60)
+import os
+
+from cleaning import memory_report, round_floats
+from feature_store import ensure_features, load_features, raw_rows
+from model_manifest import file_month, record, resume
+from od_matrix import COLUMNS as OD_COLUMNS, OD_FEATURES, ODMatrix
+from out_of_core import evaluate_streaming, file_holdout, split_batches, train_streaming, training_report
+from profiling import MemoryTracker, measure
+from sketches import N_HOURS, QUANTILES, QuantileDigest
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+OUTPUT_DIR = os.path.join(BASE_DIR, "visualizations")
+MODEL_DIR = os.path.join(BASE_DIR, "models")
+OD_DIRNAME = "od_matrix"  # süre modelinin özellik kaynağı, modelle birlikte kaydedilir
+
+# advanced_models.py doğrudan çalıştırıldığında koşan aşamalar
+DURATION_STAGES = ['load', 'od_matrix', 'train_duration', 'save']
+
+MODEL_COLS = ['trip_distance', 'PULocationID', 'DOLocationID', 'fare_amount', 'trip_duration',
+              'hour', 'day_of_week', 'is_weekend', 'is_rush_hour']
+
+# Süre modelinin girdileri; inference.py aynı sırayla özellik vektörü kurar (od_* OD matrisinden)
+DURATION_FEATURES = ['trip_distance', 'hour', 'day_of_week', 'is_weekend',
+                     'is_rush_hour', 'PULocationID', 'DOLocationID'] + OD_FEATURES
+DURATION_PARAMS = dict(n_estimators=100, max_depth=8, learning_rate=0.1, random_state=42, n_jobs=-1)
+
+# Satırın out_of_core test kümesinde olup olmadığı; OD matrisi bu satırları hiç görmez
+HOLDOUT = 'is_holdout'
+
+
+def duration_filter(df):
+    """Ortak kuralların üzerine süre modeli için daha dar aralıklar."""
+    return df[(df['trip_duration'] < 120) & (df['trip_distance'] < 50) & (df['fare_amount'] < 200)]
+
+
+def duration_rows(od):
+    """Özellik önbelleği batch'i -> (X, y); out_of_core.py akışı için, OD özellikleri batch başına eklenir."""
+    def prepare(df):
+        df = duration_filter(df)
+        X = df[[name for name in DURATION_FEATURES if name not in OD_FEATURES]].assign(
+            **od.features(df['PULocationID'], df['DOLocationID'], df['hour']))
+        return X, df['trip_duration']
+    return prepare
+
+
+def load_duration_data(yellow_raw, sample_size=300000):
+    """Süre modeli için örneklem - main_analysis.py ile ortak temizlenmiş özellik önbelleğinden."""
+    print("\n[1/4] Veri yükleniyor...")
+    yellow_features = ensure_features(yellow_raw, 'yellow')
+    with measure('train_duration.load_features', rows_in=raw_rows(yellow_features)) as m:
+        yellow_df = load_features(yellow_features, columns=MODEL_COLS,
+                                  frac=sample_size / max(raw_rows(yellow_features), 1), random_state=42,
+                                  positions=True)
+        m.rows_out = len(yellow_df)
+    yellow_df[HOLDOUT] = file_holdout(yellow_features, yellow_df.index)
+
+    # Clean and prepare
+    print("\n[2/4] Veri hazırlanıyor...")
+
+    yellow_df = duration_filter(yellow_df)
+
+    print(f"  Hazırlanan veri: {len(yellow_df):,} kayıt")
+    memory_report('yellow_df', yellow_df)
+    return yellow_df
+
+
+def od_matrix(files):
+    """Ayların Yellow Taxi eğitim satırlarından (alış, bırakış, saat) süre / hız matrisi.
+
+    Süre modelinin test satırları (out_of_core.file_holdout) dışarıda bırakılır: od_* özellikleri
+    ve OD tabanlı ETA, değerlendirilen seyahatin kendi süresini içermez.
+    """
+    print("\n[OD] Zone'dan zone'a süre matrisi...")
+    paths = [ensure_features(path, source) for path, source in files if source == 'yellow']
+    rows = sum(raw_rows(path) for path in paths)
+    with measure('od_matrix.build', rows_in=rows) as m:
+        od = ODMatrix.build(split_batches(paths, OD_COLUMNS, 'train'))
+        m.rows_out = od.meta['cells']
+    print(f"  {od.meta['trips']:,} seyahat (test satırları hariç), "
+          f"{od.meta['cells']:,} dolu (alış, bırakış, saat) hücresi")
+    return od
+
+
+def train_duration(files, od, model_dir=MODEL_DIR, incremental=False, out_of_core=None):
+    """Süre tahmin modeli ve trafik yoğunluğu bölümleri; files load, od od_matrix aşamasının çıktısıdır.
+
+    Tam eğitim ilk ayın örneklemini kullanır; artımlı modda kayıtlı booster'a modelin görmediği
+    her ayın örnekleminden ağaç eklenir. out_of_core ('external' / 'quantile') verilirse örneklem
+    yerine ayların özellik önbelleğinin tamamıyla (tam eğitimde bütün aylar) akışla eğitilir.
+    """
+    print("=" * 60)
+    print("Advanced ML Models - Trip Duration Prediction")
+    print("=" * 60)
+
+    model_path = f"{model_dir}/duration_prediction_model.joblib"
+    yellow = {file_month(path) or path: path for path, source in files if source == 'yellow'}
+    first_month = next(iter(yellow))
+    previous, manifest, fit_months = resume(model_path, DURATION_FEATURES, list(yellow), incremental)
+    up_to_date = previous is not None and not fit_months
+    months = fit_months or [first_month]
+    if previous is None:
+        # Akış modunda tam eğitim bütün ayları kullanır; trafik bölümleri yine ilk ayın örnekleminden
+        fit_months = list(yellow) if out_of_core else [first_month]
+        months = [first_month]
+    yellow_df = pd.concat([load_duration_data(yellow[month]) for month in months], ignore_index=True)
+
+    # =============================================================================
+    # TRIP DURATION PREDICTION MODEL
+    # =============================================================================
+    print("\n[3/4] Süre tahmin modeli eğitiliyor...")
+
+    duration_features = DURATION_FEATURES
+    training = None
+    if out_of_core:
+        paths = [ensure_features(yellow[month], 'yellow') for month in (list(yellow) if up_to_date else fit_months)]
+        duration_model = previous
+        if not up_to_date:
+            duration_model, training = train_streaming('train_duration', DURATION_PARAMS, paths, MODEL_COLS,
+                                                       duration_rows(od), duration_features, out_of_core, previous)
+        scores = evaluate_streaming(
+            'train_duration',
+            {'model': duration_model.predict,
+             'od_eta': lambda X: od.eta(X['PULocationID'], X['DOLocationID'], X['hour'], X['trip_distance'])},
+            paths, MODEL_COLS, duration_rows(od))
+        duration_mae, duration_rmse, duration_r2 = (scores['model'][key] for key in ('mae', 'rmse', 'r2'))
+        baseline_mae = scores['od_eta']['mae']
+        train_rows = training['rows'] if training else 0
+    else:
+        with measure('train_duration.od_features', rows_in=len(yellow_df)):
+            lookup = od.features(yellow_df['PULocationID'], yellow_df['DOLocationID'], yellow_df['hour'])
+            for name, values in lookup.items():
+                yellow_df[name] = values
+
+        X = yellow_df[duration_features].dropna()
+        y = yellow_df.loc[X.index, 'trip_duration']
+
+        # Test satırları OD matrisinin dışarıda bıraktığı satırlardır (akış modundakiyle aynı seçim)
+        holdout = yellow_df.loc[X.index, HOLDOUT].to_numpy()
+        X_train, X_test, y_train, y_test = X[~holdout], X[holdout], y[~holdout], y[holdout]
+
+        if up_to_date:
+            # Model bu ayları zaten görmüş; yalnızca değerlendirilir
+            duration_model = previous
+        else:
+            # XGBoost model
+            duration_model = xgb.XGBRegressor(**DURATION_PARAMS)
+            with measure('train_duration.fit', rows_in=len(X_train)) as m, MemoryTracker() as tracker:
+                duration_model.fit(X_train, y_train, xgb_model=previous.get_booster() if previous is not None else None)
+            training = training_report('in_memory', len(X_train), m, tracker)
+
+        # Evaluate
+        with measure('train_duration.predict', rows_in=len(X_test)):
+            y_pred = duration_model.predict(X_test)
+        duration_mae = mean_absolute_error(y_test, y_pred)
+        duration_rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+        duration_r2 = r2_score(y_test, y_pred)
+        # Arama tabanlı ETA (modelsiz taban çizgisi)
+        baseline = od.eta(X_test['PULocationID'], X_test['DOLocationID'], X_test['hour'], X_test['trip_distance'])
+        baseline_mae = mean_absolute_error(y_test, baseline)
+        train_rows = len(X_train)
+
+    print(f"  MAE: {duration_mae:.2f} dakika (OD matrisi ETA: {baseline_mae:.2f})")
+    print(f"  RMSE: {duration_rmse:.2f} dakika")
+    print(f"  R²: {duration_r2:.3f}")
+    if training:
+        print(f"  Eğitim ({training['mode']}): {training['rows']:,} satır, {training['rows_per_s']:,.0f} satır/sn, "
+              f"tepe RSS {training['peak_rss_mb']} MB")
+
+    # Feature importance
+    feature_importance = pd.DataFrame({
+        'feature': duration_features,
+        'importance': duration_model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    print("\n  Feature Importance:")
+    for _, row in feature_importance.iterrows():
+        print(f"    {row['feature']}: {row['importance']:.3f}")
+
+    if not up_to_date:
+        os.makedirs(model_dir, exist_ok=True)
+        joblib.dump(duration_model, model_path)
+        od.save(os.path.join(model_dir, OD_DIRNAME))
+        manifest = record(model_path, 'duration', DURATION_FEATURES, fit_months, train_rows,
+                          duration_model.get_booster().num_boosted_rounds(), manifest, previous is not None)
+    print(f"📁 Model: {model_path} (+ {OD_DIRNAME}/, v{manifest['version']}, {len(manifest['months'])} ay)")
+
+    # Add congestion analysis
+    congestion_by_hour = yellow_df.groupby('hour').agg({
+        'trip_duration': 'mean',
+        'trip_distance': 'mean'
+    }).pipe(round_floats)
+    congestion_by_hour['avg_speed_mph'] = (congestion_by_hour['trip_distance'] / 
+                                            (congestion_by_hour['trip_duration'] / 60)).round(2)
+    speed = yellow_df['trip_distance'] / (yellow_df['trip_duration'] / 60)
+    # Saatlik hız dağılımı (medyan / p90 / p99) tek geçişli t-digest ile
+    speed_quantiles = QuantileDigest(N_HOURS).update(yellow_df['hour'], speed).quantiles()
+    for j, q in enumerate(QUANTILES):
+        congestion_by_hour[f"speed_p{q * 100:g}"] = speed_quantiles[congestion_by_hour.index, j].round(2)
+    congestion_by_hour = congestion_by_hour.reset_index()
+
+    rush = yellow_df['is_rush_hour'] == 1
+    congestion_analysis = {
+        'hourly_speed': congestion_by_hour.to_dict('records'),
+        'rush_hour_avg_speed': round(float(speed[rush].mean()), 2),
+        'off_peak_avg_speed': round(float(speed[~rush].mean()), 2)
+    }
+
+    return {
+        'ml_results': {
+            'duration_prediction': {
+                'mae_minutes': round(duration_mae, 2),
+                'rmse_minutes': round(duration_rmse, 2),
+                'r2_score': round(duration_r2, 3),
+                'od_baseline_mae_minutes': round(baseline_mae, 2),
+                'training': training,
+                'feature_importance': feature_importance.to_dict('records')
+            }
+        },
+        'congestion_analysis': congestion_analysis
+    }
+
+
+if __name__ == '__main__':
+    from pipeline import main
+    main(default_stages=DURATION_STAGES)
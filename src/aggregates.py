@@ -0,0 +1,487 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Streaming Aggregation Engine - Parquet row group'ları üzerinde birleştirilebilir özetler
+
+Seyahatler tek geçişte trip_cube.TripCube hücrelerine indirgenir. analysis_results.json'daki
+tablo bölümlerinin tamamı bu küpün (saat × gün × PU zone × segment) roll-up'ının dilimleridir;
+aynı geçişte beslenen sketches.TripSketches bölümlere quantile ve tekil rota alanları ekler.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from cleaning import DAY_ORDER, WEEKEND_DAYS, NIGHT_HOURS
+from feature_store import FeatureWriter, cached_feature_file, iter_feature_batches, iter_raw_batches
+from sketches import TripSketches
+from trip_cube import CubeBuilder
+from trip_store import TripStore, map_shards
+from zone_index import AIRPORT_ZONES, N_ZONES
+
+N_HOURS = 24
+N_DAYS = 7
+COMPANIES = ['Uber', 'Lyft', 'Via', 'Juno', 'Other']
+
+DIMS = ('hour', 'day', 'zone', 'segment')
+
+# Yellow seyahatlerinin özet segmentleri (havalimanı dışı + havalimanı)
+YELLOW_SEGMENTS = ['yellow', 'yellow_airport']
+
+# TripAggregates metriği -> (küp ölçüsü, çarpan); küp süreleri dakika, FHV trip_time saniye
+CUBE_METRICS = {
+    'yellow': {'fare_amount': ('fare', 1), 'trip_distance': ('distance', 1), 'trip_duration': ('duration', 1),
+               'tip_percentage': ('tip_pct', 1), 'total_fare': ('revenue', 1)},
+    'fhv': {'trip_miles': ('distance', 1), 'trip_time': ('duration', 60)},
+}
+
+SOURCES = {
+    'yellow': {
+        'metrics': ['fare_amount', 'trip_distance', 'trip_duration', 'tip_percentage', 'total_fare'],
+        'segments': ['other', 'airport'],
+    },
+    'fhv': {
+        'metrics': ['trip_miles', 'trip_time'],
+        'segments': COMPANIES,
+    },
+}
+
+
+def segment_codes(df, source):
+    if source == 'yellow':
+        return (df['PULocationID'].isin(AIRPORT_ZONES) | df['DOLocationID'].isin(AIRPORT_ZONES)).to_numpy().astype(np.int64)
+    codes = pd.Categorical(df['company'], categories=COMPANIES).codes.astype(np.int64)
+    return np.where(codes < 0, COMPANIES.index('Other'), codes)
+
+
+class TripAggregates:
+    """(hour, day_of_week, PULocationID, segment) ızgarasında count / sum / sum-of-squares tabloları.
+
+    Her batch `update` ile eklenir; parçalar `merge` ile toplanır, böylece tüm ay
+    sabit bellekle işlenebilir. Kareler toplamı bilinmiyorsa (küpten türetilmiş özet) `sumsq`
+    None'dır; birleştirmelerde None kalır ve `table` standart sapma sütunlarını üretmez.
+    """
+
+    def __init__(self, source):
+        spec = SOURCES[source]
+        self.source = source
+        self.metrics = list(spec['metrics'])
+        self.segments = list(spec['segments'])
+        self.shape = (N_HOURS, N_DAYS, N_ZONES, len(self.segments))
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self.sums = np.zeros((len(self.metrics),) + self.shape)
+        self.sumsq = np.zeros((len(self.metrics),) + self.shape)
+
+    def _codes(self, df):
+        zone = df['PULocationID'].to_numpy().astype(np.int64)
+        zone = np.where((zone > 0) & (zone < N_ZONES), zone, 0)
+        return np.ravel_multi_index((df['hour'].to_numpy().astype(np.int64),
+                                     df['day_of_week'].to_numpy().astype(np.int64),
+                                     zone, segment_codes(df, self.source)), self.shape)
+
+    def update(self, df):
+        if len(df) == 0:
+            return self
+        codes = self._codes(df)
+        size = self.count.size
+        self.count += np.bincount(codes, minlength=size).reshape(self.shape)
+        for i, metric in enumerate(self.metrics):
+            values = df[metric].to_numpy(dtype=np.float64)
+            self.sums[i] += np.bincount(codes, weights=values, minlength=size).reshape(self.shape)
+            if self.sumsq is not None:
+                self.sumsq[i] += np.bincount(codes, weights=values * values, minlength=size).reshape(self.shape)
+        return self
+
+    def merge(self, other):
+        if other.source != self.source:
+            raise ValueError(f"Farklı kaynaklar birleştirilemez: {self.source} / {other.source}")
+        self.count += other.count
+        self.sums += other.sums
+        if self.sumsq is not None and other.sumsq is not None:
+            self.sumsq += other.sumsq
+        else:
+            self.sumsq = None
+        return self
+
+    @classmethod
+    def from_cube(cls, cube, source):
+        """Küpün kaynağa ait hücrelerinin (saat, gün, PU zone, segment) roll-up'ı.
+
+        Küpte kareler toplamı tutulmaz; sumsq None olur (standart sapma bilinmiyor).
+        """
+        agg = cls(source)
+        agg.sumsq = None
+        columns = cube.columns
+        provider = columns['provider'][:].astype(np.int64)
+        rows = np.flatnonzero(provider == 0) if source == 'yellow' else np.flatnonzero(provider > 0)
+        pu = columns['pu'][rows].astype(np.int64)
+        if source == 'yellow':
+            segment = (np.isin(pu, AIRPORT_ZONES) | np.isin(columns['do'][rows], AIRPORT_ZONES)).astype(np.int64)
+        else:
+            segment = provider[rows] - 1
+        day = (columns['date'][rows].astype(np.int64) + 3) % 7
+        codes = np.ravel_multi_index((columns['hour'][rows].astype(np.int64), day, pu, segment), agg.shape)
+        size = agg.count.size
+        agg.count += np.bincount(codes, weights=columns['trips'][rows], minlength=size).astype(np.int64).reshape(agg.shape)
+        for i, metric in enumerate(agg.metrics):
+            measure, scale = CUBE_METRICS[source][metric]
+            weights = columns[measure][rows].astype(np.float64) * scale
+            agg.sums[i] += np.bincount(codes, weights=weights, minlength=size).reshape(agg.shape)
+        return agg
+
+    @property
+    def total(self):
+        return int(self.count.sum())
+
+    def mask(self, hours=None, days=None, segments=None):
+        where = np.ones(self.shape, dtype=bool)
+        if hours is not None:
+            where &= np.isin(np.arange(N_HOURS), hours)[:, None, None, None]
+        if days is not None:
+            where &= np.isin(np.arange(N_DAYS), days)[None, :, None, None]
+        if segments is not None:
+            where &= np.isin(self.segments, segments)[None, None, None, :]
+        return where
+
+    def rollup(self, keep=(), where=None):
+        axes = tuple(i for i, dim in enumerate(DIMS) if dim not in keep)
+        count, sums, sumsq = self.count, self.sums, self.sumsq
+        if where is not None:
+            count, sums = count * where, sums * where
+            sumsq = None if sumsq is None else sumsq * where
+        return (count.sum(axis=axes),
+                sums.sum(axis=tuple(a + 1 for a in axes)),
+                None if sumsq is None else sumsq.sum(axis=tuple(a + 1 for a in axes)))
+
+    def table(self, keep=(), where=None):
+        keep = [dim for dim in DIMS if dim in keep]
+        count, sums, sumsq = self.rollup(keep, where)
+        n = count.ravel()
+        data = {'trips': n}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for i, metric in enumerate(self.metrics):
+                mean = sums[i].ravel() / n
+                data[f'{metric}_sum'] = sums[i].ravel()
+                data[metric] = mean
+                if sumsq is not None:
+                    data[f'{metric}_std'] = np.sqrt(np.maximum(sumsq[i].ravel() / n - mean * mean, 0))
+        if not keep:
+            return pd.DataFrame(data, index=[0])
+        index = pd.MultiIndex.from_product([range(self.shape[DIMS.index(dim)]) for dim in keep], names=keep)
+        return pd.DataFrame(data, index=index).reset_index()
+
+
+def iter_clean_batches(path, source, batch_size=1_000_000, use_cache=True):
+    """Temizlenmiş batch'ler; önbellek varsa oradan okunur, yoksa ham veri temizlenirken yazılır."""
+    if not use_cache:
+        yield from iter_raw_batches(path, source, batch_size)
+        return
+    cached = cached_feature_file(path, source)
+    if cached is not None:
+        yield from iter_feature_batches(cached, batch_size)
+        return
+    with FeatureWriter(path, source) as writer:
+        for df in iter_raw_batches(path, source, batch_size):
+            writer.write(df)
+            yield df
+
+
+def stream_file(path, source, batch_size=1_000_000, sample_frac=0.0, random_state=42, use_cache=True):
+    """Dosyayı batch batch temizleyip küpe ve özetlere ekler; modeller için isteğe bağlı örneklem tutar."""
+    builder = CubeBuilder()
+    sketches = TripSketches()
+    samples = []
+    for i, df in enumerate(iter_clean_batches(path, source, batch_size, use_cache)):
+        builder.update(df, source)
+        sketches.update(df, source)
+        if sample_frac > 0:
+            samples.append(df.sample(frac=min(sample_frac, 1.0), random_state=random_state + i))
+    sample = pd.concat(samples, ignore_index=True) if samples else None
+    return builder, sketches, sample
+
+
+def _aggregate_task(task):
+    return stream_file(*task)
+
+
+def aggregate_files(files, batch_size=1_000_000, sample_size=0, workers=None, random_state=42, use_cache=True):
+    """Dosyaları süreç havuzunda paralel özetler (map) ve tek bir küpte birleştirir (reduce).
+
+    files: [(yol, kaynak)] listesi. Her işçi tek bir dosyayı akışla işler ve yalnızca kompakt küp
+    hücreleri, özetler ve küçük bir örneklem döndürür.
+    Sonuç: (CubeBuilder, TripSketches, {kaynak: örneklem}).
+    """
+    rows = [pq.ParquetFile(path).metadata.num_rows for path, _ in files]
+    source_rows = {}
+    for (_, source), n in zip(files, rows):
+        source_rows[source] = source_rows.get(source, 0) + n
+
+    tasks = [(path, source, batch_size, sample_size / max(source_rows[source], 1), random_state + 1009 * i, use_cache)
+             for i, (path, source) in enumerate(files)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        partials = list(map(_aggregate_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            partials = list(pool.map(_aggregate_task, tasks))
+
+    merged = CubeBuilder()
+    sketches = TripSketches()
+    samples = {}
+    for (_, source), (builder, file_sketches, sample) in zip(files, partials):
+        merged.merge(builder)
+        sketches.merge(file_sketches)
+        if sample is not None:
+            samples.setdefault(source, []).append(sample)
+
+    return merged, sketches, {source: pd.concat(parts, ignore_index=True) for source, parts in samples.items()}
+
+
+def summarize_shard(df, source):
+    return CubeBuilder().update(df, source), TripSketches().update(df, source)
+
+
+def aggregate_frames(frames, workers=None):
+    """Bellekteki temizlenmiş çerçeveleri küpe ve özetlere indirger: (CubeBuilder, TripSketches).
+
+    Birden çok işçide çerçeveler önce paylaşılan bellekteki bir TripStore'a bir kez yazılır; işçiler
+    satır dilimlerine kopyasız bağlanır, çerçeveler pickle edilmez.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        partials = [summarize_shard(df, source) for source, df in frames.items()]
+    else:
+        with TripStore.share(frames) as store:
+            partials = [part for _, part in map_shards(store, summarize_shard, list(frames), workers=workers)]
+
+    merged = CubeBuilder()
+    sketches = TripSketches()
+    for builder, shard_sketches in partials:
+        merged.merge(builder)
+        sketches.merge(shard_sketches)
+    return merged, sketches
+
+
+# =============================================================================
+# RESULT SECTIONS (analysis_results.json ile aynı düzen)
+# =============================================================================
+
+def _zone_table(agg, zone_index, where=None):
+    table = agg.table(['zone'], where)
+    table = table[table['trips'] > 0].copy()
+    table['PU_Borough'] = zone_index.names('Borough', table['zone'])
+    table['PU_Zone'] = zone_index.names('Zone', table['zone'])
+    return table
+
+
+def _percentiles(sketches, by, metrics, routes=False, **filters):
+    """Özetlerden `by` gruplarında <ölçü>_p50 / _p90 / _p99 (ve istenirse distinct_routes) tablosu."""
+    parts = [sketches.quantiles(metric, by, **filters).drop(columns='trips') for metric in metrics]
+    if routes:
+        filters.pop('hours', None)
+        parts.append(sketches.distinct_routes(by, **filters))
+    if not by:
+        return pd.concat(parts, axis=1).round(2)
+    table = parts[0]
+    for part in parts[1:]:
+        table = table.merge(part, on=list(by), how='outer')
+    return table.round(2)
+
+
+def _with_percentiles(table, sketches, columns, metrics, routes=False, **filters):
+    """Tabloya quantile sütunlarını ekler; columns: {özet boyutu: tablodaki sütun}."""
+    percentiles = _percentiles(sketches, list(columns), metrics, routes, **filters).rename(columns=columns)
+    return table.merge(percentiles, on=list(columns.values()), how='left')
+
+
+def _hour_records(table, columns):
+    table = table[table['trips'] > 0]
+    return table[['hour'] + list(columns)].round(2).to_dict('records')
+
+
+def summary_sections(yellow, fhv, zone_index, sketches=None):
+    """Özet, talep, borough, pazar payı, karlı lokasyon ve ortalama bahşiş bölümleri.
+
+    sketches (TripSketches) verilirse borough ve karlı zone kayıtlarına ücret / süre
+    quantile'ları ve tekil rota sayıları eklenir.
+    """
+    yellow_all = yellow.table()
+    fhv_segments = fhv.table(['segment'])
+    fhv_segments['company'] = [fhv.segments[s] for s in fhv_segments['segment']]
+    company_trips = fhv_segments.set_index('company')['trips']
+    total_yellow = yellow.total
+    total_fhv = fhv.total
+    fhv_all = fhv.table()
+
+    summary_stats = {
+        'yellow_taxi': {
+            'total_trips': int(total_yellow),
+            'avg_fare': round(float(yellow_all['fare_amount'].iloc[0]), 2),
+            'avg_distance': round(float(yellow_all['trip_distance'].iloc[0]), 2),
+            'avg_duration': round(float(yellow_all['trip_duration'].iloc[0]), 2),
+            'avg_tip_pct': round(float(yellow_all['tip_percentage'].iloc[0]), 2),
+            'total_revenue': round(float(yellow_all['total_fare_sum'].iloc[0]), 2)
+        },
+        'fhv': {
+            'total_trips': int(total_fhv),
+            'uber_trips': int(company_trips['Uber']),
+            'lyft_trips': int(company_trips['Lyft']),
+            'avg_distance': round(float(fhv_all['trip_miles'].iloc[0]), 2),
+            'avg_duration': round(float(fhv_all['trip_time'].iloc[0] / 60), 2)
+        }
+    }
+
+    # Saatlik & günlük talep
+    hourly_yellow = yellow.table(['hour'])
+    hourly_fhv = fhv.table(['hour'])
+    daily_yellow = yellow.table(['day'])
+    daily_fhv = fhv.table(['day'])
+    for daily in (daily_yellow, daily_fhv):
+        daily['day_name'] = [DAY_ORDER[d] for d in daily['day']]
+
+    # Borough analizi
+    zones_yellow = _zone_table(yellow, zone_index)
+    zones_fhv = _zone_table(fhv, zone_index)
+    borough_yellow = zones_yellow.groupby('PU_Borough')[
+        ['trips', 'fare_amount_sum', 'tip_percentage_sum', 'trip_distance_sum']].sum()
+    borough_yellow = pd.DataFrame({
+        'trips': borough_yellow['trips'],
+        'avg_fare': borough_yellow['fare_amount_sum'] / borough_yellow['trips'],
+        'total_revenue': borough_yellow['fare_amount_sum'],
+        'avg_tip_pct': borough_yellow['tip_percentage_sum'] / borough_yellow['trips'],
+        'avg_distance': borough_yellow['trip_distance_sum'] / borough_yellow['trips'],
+    }).round(2).reset_index()
+    borough_fhv = zones_fhv.groupby('PU_Borough')['trips'].sum().reset_index()
+    if sketches is not None:
+        borough_yellow = _with_percentiles(borough_yellow, sketches, {'borough': 'PU_Borough'}, ('fare', 'duration'),
+                                           routes=True, segments=YELLOW_SEGMENTS, zone_index=zone_index)
+        borough_fhv = _with_percentiles(borough_fhv, sketches, {'borough': 'PU_Borough'}, ('fare', 'duration'),
+                                        routes=True, segments=['fhv'], zone_index=zone_index)
+
+    # Pazar payı
+    hourly_market = pd.DataFrame({
+        'hour': range(N_HOURS),
+        'yellow_taxi': hourly_yellow['trips'].values,
+        'fhv': hourly_fhv['trips'].values
+    })
+    hourly_total = hourly_market['yellow_taxi'] + hourly_market['fhv']
+    hourly_market['yellow_pct'] = (hourly_market['yellow_taxi'] / hourly_total * 100).round(1)
+    hourly_market['fhv_pct'] = (hourly_market['fhv'] / hourly_total * 100).round(1)
+
+    # Karlı lokasyonlar
+    profitable_zones = zones_yellow.groupby(['PU_Borough', 'PU_Zone'])[
+        ['trips', 'total_fare_sum', 'tip_percentage_sum', 'trip_distance_sum']].sum()
+    profitable_zones = pd.DataFrame({
+        'avg_fare': profitable_zones['total_fare_sum'] / profitable_zones['trips'],
+        'total_revenue': profitable_zones['total_fare_sum'],
+        'trip_count': profitable_zones['trips'],
+        'avg_tip_pct': profitable_zones['tip_percentage_sum'] / profitable_zones['trips'],
+        'avg_distance': profitable_zones['trip_distance_sum'] / profitable_zones['trips'],
+    }).round(2).reset_index()
+    profitable_zones = profitable_zones[profitable_zones['trip_count'] >= 50]
+    if sketches is not None:
+        profitable_zones = _with_percentiles(profitable_zones, sketches,
+                                             {'borough': 'PU_Borough', 'zone_name': 'PU_Zone'}, ('fare',),
+                                             routes=True, segments=YELLOW_SEGMENTS, zone_index=zone_index)
+    profitable_zones = profitable_zones.sort_values('avg_fare', ascending=False)
+
+    return {
+        'summary_stats': summary_stats,
+        'hourly_demand': {
+            'yellow_taxi': hourly_yellow[['hour', 'trips']].to_dict('records'),
+            'fhv': hourly_fhv[['hour', 'trips']].to_dict('records')
+        },
+        'daily_demand': {
+            'yellow_taxi': daily_yellow[['day_name', 'trips']].to_dict('records'),
+            'fhv': daily_fhv[['day_name', 'trips']].to_dict('records')
+        },
+        'borough_analysis': {
+            'yellow_taxi': borough_yellow.to_dict('records'),
+            'fhv': borough_fhv.to_dict('records')
+        },
+        'market_share': {
+            'hourly': hourly_market.to_dict('records'),
+            'overall': {
+                'yellow_taxi_pct': round(total_yellow / (total_yellow + total_fhv) * 100, 1),
+                'fhv_pct': round(total_fhv / (total_yellow + total_fhv) * 100, 1)
+            },
+            'uber_vs_lyft': {
+                'uber_pct': round(company_trips['Uber'] / total_fhv * 100, 1),
+                'lyft_pct': round(company_trips['Lyft'] / total_fhv * 100, 1)
+            }
+        },
+        'profitable_locations': {
+            'top_zones': profitable_zones.head(20).to_dict('records'),
+            'profitable_hours': _hour_records(hourly_yellow, ['total_fare', 'tip_percentage'])
+        },
+        'tip_analysis': {
+            'avg_tip_by_hour': {int(h): round(float(v), 2) for h, v in
+                                zip(hourly_yellow['hour'], hourly_yellow['tip_percentage']) if not np.isnan(v)},
+            'avg_tip_by_day': {name: round(float(v), 2) for name, v in
+                               zip(daily_yellow['day_name'], daily_yellow['tip_percentage']) if not np.isnan(v)}
+        }
+    }
+
+
+def segment_sections(yellow, zone_index, sketches=None):
+    """Havalimanı (segment) ve gece hayatı (saat dilimi) bölümleri; sketches ile havalimanı quantile'ları."""
+    total_yellow = yellow.total
+
+    # Havalimanı
+    airport_where = yellow.mask(segments=['airport'])
+    airport_all = yellow.table(where=airport_where)
+    airport_hourly = yellow.table(['hour'], airport_where).rename(
+        columns={'trips': 'trip_count', 'fare_amount': 'avg_fare', 'tip_percentage': 'avg_tip'})
+    airport_hourly = airport_hourly[airport_hourly['trip_count'] > 0]
+    airport_total = int(airport_all['trips'].iloc[0])
+    hourly_columns = ['hour', 'trip_count', 'avg_fare', 'avg_tip']
+    airport_percentiles = {}
+    if sketches is not None:
+        airport_hourly = _with_percentiles(airport_hourly, sketches, {'hour': 'hour'}, ('fare',),
+                                           segments=['yellow_airport'])
+        hourly_columns += [c for c in airport_hourly.columns if c.startswith('fare_p')]
+        overall = _percentiles(sketches, [], ('fare', 'duration'), segments=['yellow_airport'])
+        airport_percentiles = {c: float(v) for c, v in overall.iloc[0].items() if not np.isnan(v)} if len(overall) else {}
+
+    # Gece hayatı
+    night_where = yellow.mask(hours=NIGHT_HOURS)
+    night_total = int(yellow.table(where=night_where)['trips'].iloc[0])
+    nightlife_zones = _zone_table(yellow, zone_index, night_where).groupby(
+        ['PU_Borough', 'PU_Zone'])['trips'].sum().reset_index()
+    nightlife_zones = nightlife_zones.sort_values('trips', ascending=False)
+    night_daily = yellow.table(['day'], night_where)
+    weekend_night = night_daily[night_daily['day'].isin(WEEKEND_DAYS)][['trips', 'fare_amount_sum']].sum()
+    weekday_night = night_daily[~night_daily['day'].isin(WEEKEND_DAYS)][['trips', 'fare_amount_sum']].sum()
+    night_hourly = yellow.table(['hour'], night_where)
+    night_hourly = night_hourly[night_hourly['trips'] > 0]
+
+    return {
+        'airport_analysis': {
+            'total_trips': airport_total,
+            'avg_fare': round(float(airport_all['fare_amount'].iloc[0]), 2),
+            'avg_tip_pct': round(float(airport_all['tip_percentage'].iloc[0]), 2),
+            **airport_percentiles,
+            'hourly_demand': airport_hourly[hourly_columns].round(2).to_dict('records'),
+            'pct_of_total': round(airport_total / total_yellow * 100, 2)
+        },
+        'nightlife_analysis': {
+            'total_night_trips': night_total,
+            'pct_of_total': round(night_total / total_yellow * 100, 2),
+            'top_nightlife_zones': nightlife_zones.head(15).to_dict('records'),
+            'weekend_vs_weekday': {
+                'weekend_trips': int(weekend_night['trips']),
+                'weekday_trips': int(weekday_night['trips']),
+                'weekend_avg_fare': round(float(weekend_night['fare_amount_sum'] / weekend_night['trips']), 2) if weekend_night['trips'] > 0 else 0,
+                'weekday_avg_fare': round(float(weekday_night['fare_amount_sum'] / weekday_night['trips']), 2) if weekday_night['trips'] > 0 else 0
+            },
+            'hourly_distribution': {int(h): int(t) for h, t in zip(night_hourly['hour'], night_hourly['trips'])}
+        }
+    }
+
+
+def aggregate_sections(yellow, fhv, zone_index, sketches=None):
+    """analysis_results.json tablo bölümlerinin tamamı (summary_sections + segment_sections)."""
+    return {**summary_sections(yellow, fhv, zone_index, sketches), **segment_sections(yellow, zone_index, sketches)}
@@ -0,0 +1,292 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Analytics Service - dashboard için yerel HTTP API (yalnızca standart kütüphane asyncio)
+
+    python src/analytics_service.py --port 8000
+
+    GET /api/sections                 analysis_results.json bölüm adları
+    GET /api/sections/<bölüm>         tek bir bölüm
+    GET /api/cube                     küp meta bilgisi (tarih aralığı, sağlayıcılar, ölçüler)
+    GET /api/query?by=provider&pu_borough=Brooklyn&day=Saturday,Sunday&hours=22-4&provider=Uber,Yellow
+    GET /api/query?by=pu&start=2024-01-01&end=2024-01-31&limit=20   en yoğun 20 alış zone'u
+    GET /api/stats                    önbellek ve istek sayaçları
+
+Sorgu satırlarındaki ölçüler hücre toplamlarıdır; fare, tip_pct, distance ve duration için
+sefer başına ortalamalar avg_<ölçü> sütunlarında döner (bu ölçüler istenince trips de eklenir).
+
+Yanıtlar LRU + TTL önbelleğinde tutulur ve ETag taşır; If-None-Match eşleşirse 304 döner.
+Aynı anda gelen özdeş sorgular tek bir hesaplamayı bekler. Küp ya da analysis_results.json
+diskte değişince (pipeline yeniden çalışınca) önbellek anahtarları kendiliğinden eskir.
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import pandas as pd
+
+from local_http import HTTPError, JSONServer, json_body, run
+from trip_cube import CUBE_META, MEASURES, QUERY_DIMENSIONS, TripCube, hour_range
+from zone_index import load_zone_index
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CUBE_DIR = os.path.join(DATA_DIR, "stages", "clean", "cube")  # pipeline clean aşamasının çıktısı
+RESULTS_FILE = os.path.join(BASE_DIR, "visualizations", "analysis_results.json")
+
+MAX_ROWS = 50_000  # tek yanıttaki en fazla satır; daha büyük sonuçlar limit ister
+
+# Sorgu parametresi -> TripCube.query filtresi; değerler virgülle ayrılır
+LIST_FILTERS = ('day', 'provider', 'pu_borough', 'do_borough')
+INT_FILTERS = ('pu', 'do')
+
+# Toplamı tek başına anlamsız ölçüler; yanıtta avg_<ölçü> = toplam / trips olarak da verilir
+AVERAGED = ('fare', 'tip_pct', 'distance', 'duration')
+
+
+class ResponseCache:
+    """(anahtar -> (etag, gövde)) LRU önbelleği; kayıtlar `ttl` saniye sonra geçersiz olur."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None or time.monotonic() - item[0] > self.ttl:
+            self._items.pop(key, None)
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key, value):
+        self._items[key] = (time.monotonic(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _split(values):
+    return [v for value in values for v in value.split(',') if v]
+
+
+def query_filters(params):
+    """Sorgu dizesi -> TripCube.query argümanları; hatalı parametreler 400 döner."""
+    unknown = set(params) - set(QUERY_DIMENSIONS) - {'by', 'measures', 'start', 'end', 'hours', 'hour', 'limit'}
+    if unknown:
+        raise HTTPError(400, f"Bilinmeyen parametre: {', '.join(sorted(unknown))}")
+    kwargs = {
+        'by': _split(params.get('by', [])),
+        'measures': _split(params.get('measures', [])) or list(MEASURES),
+        'start': params.get('start', [None])[-1],
+        'end': params.get('end', [None])[-1],
+    }
+    limit = params.get('limit', [None])[-1]
+    unknown = set(kwargs['measures']) - set(MEASURES)
+    if unknown:
+        raise HTTPError(400, f"Bilinmeyen ölçü: {', '.join(sorted(unknown))}")
+    if 'trips' not in kwargs['measures'] and set(kwargs['measures']) & set(AVERAGED):
+        kwargs['measures'] = ['trips'] + kwargs['measures']
+    if 'date' in params:
+        raise HTTPError(400, "Tarih filtresi start / end ile verilir")
+    try:
+        hours = _split(params.get('hours', []) + params.get('hour', []))
+        if hours:
+            kwargs['hour'] = hour_range(','.join(hours))
+        for name in INT_FILTERS:
+            if name in params:
+                kwargs[name] = [int(v) for v in _split(params[name])]
+        limit = None if limit is None else int(limit)
+    except ValueError as e:
+        raise HTTPError(400, f"Geçersiz değer: {e}") from None
+    for name in LIST_FILTERS:
+        if name in params:
+            kwargs[name] = [int(v) if v.isdigit() else v for v in _split(params[name])]
+    return kwargs, limit
+
+
+def with_averages(df):
+    """Toplam sütunlarının yanına sefer başına ortalamalar (avg_<ölçü>; seferi olmayan grup -> NaN)."""
+    if 'trips' not in df:
+        return df
+    trips = df['trips'].where(df['trips'] > 0)
+    for name in AVERAGED:
+        if name in df:
+            df[f'avg_{name}'] = df[name] / trips
+    return df
+
+
+def records(df):
+    """DataFrame -> JSON kayıtları (ondalıklar 2 basamak, NaN -> null, tarih -> ISO)."""
+    df = df.round(2).astype(object)
+    df = df.where(pd.notna(df), None)
+    return df.to_dict('records')
+
+
+class AnalyticsService(JSONServer):
+    name = "Analytics API"
+
+    def __init__(self, cube_dir=CUBE_DIR, results_file=RESULTS_FILE, data_dir=DATA_DIR,
+                 cache_size=256, ttl=300, workers=4, max_rows=MAX_ROWS):
+        super().__init__()
+        self.cube_dir = cube_dir
+        self.max_rows = max_rows
+        self.results_file = results_file
+        self.data_dir = data_dir
+        self.cache = ResponseCache(cache_size, ttl)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analytics")
+        self.inflight = {}
+        self.computations = 0
+        self._cube = (None, None)
+        self._results = (None, None)
+
+    # ------------------------------------------------------------------ veri
+    def cube(self):
+        """Diskteki küp; cube.json değişmişse yeniden açılır (memmap, kopya yok)."""
+        version = _mtime(os.path.join(self.cube_dir, CUBE_META))
+        if version is None:
+            raise HTTPError(503, f"Küp bulunamadı: {self.cube_dir} (önce python src/pipeline.py --stages clean)")
+        if self._cube[0] != version:
+            self._cube = (version, TripCube.open(self.cube_dir, load_zone_index(self.data_dir)))
+        return self._cube[1]
+
+    def results(self):
+        version = _mtime(self.results_file)
+        if version is None:
+            raise HTTPError(503, f"Sonuç dosyası bulunamadı: {self.results_file}")
+        if self._results[0] != version:
+            with open(self.results_file, 'r') as f:
+                self._results = (version, json.load(f))
+        return self._results[1]
+
+    def version(self, path):
+        """Önbellek anahtarına giren veri sürümü; pipeline çıktıları değişince anahtar da değişir."""
+        if path.startswith('/api/sections'):
+            return _mtime(self.results_file)
+        if path.startswith('/api/cube') or path.startswith('/api/query'):
+            return _mtime(os.path.join(self.cube_dir, CUBE_META))
+        return None
+
+    # ------------------------------------------------------------------ uç noktalar
+    def compute(self, path, params):
+        """Yanıt gövdesi (dict); iş parçacığı havuzunda çalışır."""
+        self.computations += 1
+        if path == '/api/sections':
+            return {'sections': list(self.results())}
+        if path.startswith('/api/sections/'):
+            name = unquote(path[len('/api/sections/'):])
+            results = self.results()
+            if name not in results:
+                raise HTTPError(404, f"Bölüm bulunamadı: {name}")
+            return {name: results[name]}
+        if path == '/api/cube':
+            with open(os.path.join(self.cube_dir, CUBE_META), 'r') as f:
+                meta = json.load(f)
+            zone_index = load_zone_index(self.data_dir)
+            return dict(meta, dimensions=list(QUERY_DIMENSIONS), boroughs=list(zone_index.categories['Borough']))
+        if path == '/api/query':
+            kwargs, limit = query_filters(params)
+            started = time.perf_counter()
+            try:
+                result = with_averages(self.cube().query(**kwargs))
+            except ValueError as e:
+                raise HTTPError(400, str(e)) from None
+            count = len(result)
+            if limit is not None and 'trips' in result:
+                # En yoğun gruplar (ör. ilk 20 zone)
+                result = result.nlargest(limit, 'trips', keep='first')
+            elif limit is not None:
+                result = result.head(limit)
+            if len(result) > self.max_rows:
+                raise HTTPError(400, f"Sonuç çok büyük ({count:,} satır, sınır {self.max_rows:,}); "
+                                     f"filtreleri daraltın ya da limit verin")
+            return {'rows': records(result), 'count': count,
+                    'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+        raise HTTPError(404, f"Bilinmeyen yol: {path}")
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'computations': self.computations,
+            'cache': {'size': len(self.cache), 'maxsize': self.cache.maxsize, 'ttl_s': self.cache.ttl,
+                      'hits': self.cache.hits, 'misses': self.cache.misses},
+            'inflight': len(self.inflight),
+        }
+
+    async def respond(self, path, params):
+        """(etag, gövde); önbellekte yoksa hesaplanır, eşzamanlı özdeş istekler aynı sonucu bekler."""
+        if path == '/api/stats':
+            return None, json_body(self.stats())
+        key = (path, tuple(sorted((k, tuple(v)) for k, v in params.items())), self.version(path))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self._render, path, params)
+            self.inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        # Bağlantısı kopan istemci hesaplamayı iptal etmez; diğer bekleyenler sonucu alır
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future):
+        self.inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def _render(self, path, params):
+        body = json_body(self.compute(path, params))
+        return f'"{hashlib.sha1(body).hexdigest()[:20]}"', body
+
+    # ------------------------------------------------------------------ HTTP
+    async def route(self, method, path, params, headers, body):
+        etag, payload = await self.respond(path, params)
+        if etag is None:
+            return 200, {'Cache-Control': 'no-store'}, payload
+        extra = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return 304, extra, b''
+        return 200, extra, payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NYC Mobility analytics API (yerel)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="taxi_zone_lookup.csv'nin bulunduğu dizin")
+    parser.add_argument('--cube', default=CUBE_DIR, help="küp dizini (clean aşamasının çıktısı)")
+    parser.add_argument('--results', default=RESULTS_FILE, help="analysis_results.json yolu")
+    parser.add_argument('--cache-size', type=int, default=256, help="önbellekteki en fazla yanıt sayısı")
+    parser.add_argument('--ttl', type=float, default=300, help="önbellek kaydının ömrü (saniye)")
+    parser.add_argument('--workers', type=int, default=4, help="sorgu iş parçacığı sayısı")
+    parser.add_argument('--max-rows', type=int, default=MAX_ROWS, help="tek yanıttaki en fazla satır")
+    args = parser.parse_args(argv)
+
+    service = AnalyticsService(args.cube, args.results, args.data_dir, args.cache_size, args.ttl,
+                               args.workers, args.max_rows)
+    run(service, args.host, args.port, '/api/sections')
+
+
+if __name__ == '__main__':
+    main()
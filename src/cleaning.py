@@ -0,0 +1,184 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Veri Temizleme & Özellik Mühendisliği (ortak kurallar)
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+# Yellow Taxi - sadece gerekli sütunlar
+yellow_cols = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'passenger_count',
+               'trip_distance', 'PULocationID', 'DOLocationID', 'fare_amount', 
+               'tip_amount', 'tolls_amount', 'payment_type']
+
+# FHV - sadece gerekli sütunlar
+fhv_cols = ['hvfhs_license_num', 'pickup_datetime', 'dropoff_datetime', 
+            'PULocationID', 'DOLocationID', 'trip_miles', 'trip_time', 'base_passenger_fare', 'tips']
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+WEEKEND_DAYS = [5, 6]
+RUSH_HOURS = [7, 8, 9, 17, 18, 19]
+NIGHT_HOURS = [22, 23, 0, 1, 2, 3, 4]
+
+# 24 / 7 girişli arama tabloları: saat ve gün kodu doğrudan bayrağa indekslenir
+RUSH_MASK = np.isin(np.arange(24), RUSH_HOURS).astype(np.uint8)
+NIGHT_MASK = np.isin(np.arange(24), NIGHT_HOURS).astype(np.uint8)
+WEEKEND_MASK = np.isin(np.arange(7), WEEKEND_DAYS).astype(np.uint8)
+TIME_COLUMNS = ['hour', 'day_of_week', 'day_name', 'is_weekend', 'is_rush_hour', 'is_night']
+
+COMPANY_MAP = {'HV0003': 'Uber', 'HV0005': 'Lyft', 'HV0004': 'Via', 'HV0002': 'Juno'}
+COMPANIES = list(COMPANY_MAP.values()) + ['Other']
+
+# Kompakt şema - yükleme anında uygulanır. Saat/gün/bayrak sütunları uint8, LocationID'ler
+# uint16, ücret ve mesafeler float32; tekrar eden metinler kategorik (kodlar + tek kopya isim).
+TRIP_SCHEMA = {
+    'hour': 'uint8', 'day_of_week': 'uint8', 'is_weekend': 'uint8',
+    'is_rush_hour': 'uint8', 'is_night': 'uint8', 'passenger_count': 'uint8',
+    'payment_type': 'uint8', 'PULocationID': 'uint16', 'DOLocationID': 'uint16',
+    'trip_time': 'uint32',
+    'trip_distance': 'float32', 'fare_amount': 'float32', 'tip_amount': 'float32',
+    'tolls_amount': 'float32', 'trip_duration': 'float32', 'avg_speed': 'float32',
+    'tip_percentage': 'float32', 'total_fare': 'float32', 'trip_miles': 'float32',
+    'base_passenger_fare': 'float32', 'tips': 'float32',
+    'day_name': pd.CategoricalDtype(DAY_ORDER),
+    'company': pd.CategoricalDtype(COMPANIES),
+    'hvfhs_license_num': 'category',
+}
+
+# Temizleme sonrası gereksiz kalan sütunlar (pickup_datetime / dropoff_datetime ile aynı)
+REDUNDANT_COLUMNS = ['tpep_pickup_datetime', 'tpep_dropoff_datetime']
+
+# Ham sütunlar üzerindeki sınırlar - Arrow ifadeleri olarak pyarrow.dataset taramalarına
+# gönderilir; row group istatistikleri uymayan blokları okumadan atlar. Türetilmiş
+# sütunlara (süre, hız) bağlı kurallar temizleme fonksiyonlarında kalır. Alış / bırakış zamanı
+# boş (null) satırlar atılır: zaman özellikleri ve küp hücre kodu geçerli bir zaman ister.
+YELLOW_FILTER = (
+    pc.field('tpep_pickup_datetime').is_valid() & pc.field('tpep_dropoff_datetime').is_valid()
+    & (pc.field('fare_amount') > 0) & (pc.field('fare_amount') < 500)
+    & (pc.field('trip_distance') > 0) & (pc.field('trip_distance') < 100)
+    & (pc.field('passenger_count') > 0) & (pc.field('passenger_count') <= 6)
+    & (pc.field('tip_amount') >= 0)
+)
+
+FHV_FILTER = (
+    pc.field('pickup_datetime').is_valid() & pc.field('dropoff_datetime').is_valid()
+    & (pc.field('trip_miles') > 0) & (pc.field('trip_time') > 0)
+)
+
+
+def epoch_ticks(values):
+    """Zaman damgaları -> (int64 epoch tıkları, saniyedeki tık sayısı); datetime64 sütunlar kopyalanmaz."""
+    values = np.asarray(values)
+    if values.dtype.kind != 'M':
+        values = pd.to_datetime(values).to_numpy()
+    if np.datetime_data(values.dtype)[0] in ('Y', 'M', 'W', 'D', 'h', 'm'):
+        values = values.astype('datetime64[s]')
+    unit, count = np.datetime_data(values.dtype)
+    return values.view(np.int64), np.timedelta64(1, 's') // np.timedelta64(count, unit)
+
+
+def time_features(values):
+    """Zaman damgalarından saat, gün kodu (Pazartesi = 0), epoch gün indeksi ve bayraklar.
+
+    Hesap ham int64 epoch değerleri üzerinde tamsayı bölme ile yapılır; bayraklar RUSH_MASK /
+    NIGHT_MASK / WEEKEND_MASK tablolarından okunur. Metin üretilmez, sütunlar uint8 (gün int32).
+    """
+    ticks, per_second = epoch_ticks(values)
+    seconds = ticks // per_second
+    days = seconds // 86400
+    hour = ((seconds - days * 86400) // 3600).astype(np.uint8)
+    day_of_week = ((days + 3) % 7).astype(np.uint8)  # 1970-01-01 Perşembe
+    return {'hour': hour, 'day_of_week': day_of_week, 'date': days.astype(np.int32),
+            'is_weekend': WEEKEND_MASK[day_of_week], 'is_rush_hour': RUSH_MASK[hour],
+            'is_night': NIGHT_MASK[hour]}
+
+
+def add_time_columns(df):
+    features = time_features(df['pickup_datetime'])
+    # Gün adı kategorik kodlardan kurulur; satır başına metin yok
+    features['day_name'] = pd.Categorical.from_codes(features['day_of_week'], dtype=TRIP_SCHEMA['day_name'])
+    for column in TIME_COLUMNS:
+        df[column] = features[column]
+    return df
+
+
+def clean_yellow_taxi(df):
+    df = df.copy()
+    df = df[df['tpep_pickup_datetime'].notna() & df['tpep_dropoff_datetime'].notna()]
+    df = df[(df['fare_amount'] > 0) & (df['fare_amount'] < 500)]
+    df = df[(df['trip_distance'] > 0) & (df['trip_distance'] < 100)]
+    df = df[(df['passenger_count'] > 0) & (df['passenger_count'] <= 6)]
+    df = df[df['tip_amount'] >= 0]
+    
+    df['pickup_datetime'] = df['tpep_pickup_datetime']
+    df['dropoff_datetime'] = df['tpep_dropoff_datetime']
+    df = add_time_columns(df)
+    
+    pickup, per_second = epoch_ticks(df['pickup_datetime'])
+    dropoff, dropoff_per_second = epoch_ticks(df['dropoff_datetime'])
+    df['trip_duration'] = (dropoff / dropoff_per_second - pickup / per_second) / 60
+    df = df[(df['trip_duration'] > 1) & (df['trip_duration'] < 180)]
+    
+    df['avg_speed'] = df['trip_distance'] / (df['trip_duration'] / 60)
+    df = df[(df['avg_speed'] > 0) & (df['avg_speed'] < 60)]
+    
+    df['tip_percentage'] = (df['tip_amount'] / df['fare_amount'] * 100).clip(0, 100)
+    df['total_fare'] = df['fare_amount'] + df['tip_amount'] + df['tolls_amount']
+    
+    return df
+
+def clean_fhvhv(df):
+    df = df.copy()
+    df = df[df['pickup_datetime'].notna() & df['dropoff_datetime'].notna()]
+    df = df[df['trip_miles'] > 0]
+    df = df[df['trip_time'] > 0]
+    
+    df = add_time_columns(df)
+    
+    df['company'] = df['hvfhs_license_num'].map(COMPANY_MAP).fillna('Other')
+    
+    return df
+
+def add_zone_columns(df, zone_index):
+    # İsimler satır başına kopyalanmaz; kategorik kodlar zone tablosundaki tek kopyaya işaret eder
+    df = df.copy()
+    for prefix in ('PU', 'DO'):
+        location_ids = df[f'{prefix}LocationID'].to_numpy()
+        df[f'{prefix}_Borough'] = zone_index.categorical('Borough', location_ids)
+        df[f'{prefix}_Zone'] = zone_index.categorical('Zone', location_ids)
+    return df
+
+
+def apply_compact_schema(df):
+    df = df.drop(columns=[c for c in REDUNDANT_COLUMNS if c in df.columns])
+    return df.astype({c: t for c, t in TRIP_SCHEMA.items() if c in df.columns})
+
+
+def round_floats(df, decimals=2):
+    """float32 sütunları float64'e genişletip yuvarlar; JSON'a 10.020000457 gibi değerler gitmez."""
+    return df.astype({c: 'float64' for c in df.columns if df[c].dtype == 'float32'}).round(decimals)
+
+
+def wide_memory_usage(df):
+    """Aynı çerçevenin int64/float64/object (pandas varsayılanı) karşılığının bayt cinsinden boyutu."""
+    total = 0
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts = series.value_counts(sort=False)
+            total += 8 * len(series) + sum(sys.getsizeof(value) * n for value, n in counts.items())
+        else:
+            total += series.memory_usage(index=False, deep=True) * max(8 // series.dtype.itemsize, 1)
+    return total
+
+
+def memory_report(name, df):
+    before = wide_memory_usage(df)
+    after = df.memory_usage(index=False, deep=True).sum()
+    print(f"  Bellek - {name}: {before / 1024 ** 2:,.1f} MB -> {after / 1024 ** 2:,.1f} MB "
+          f"({(1 - after / max(before, 1)) * 100:.0f}% azalma)")
+    return {'rows': int(len(df)), 'wide_bytes': int(before), 'compact_bytes': int(after)}
+
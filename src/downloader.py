@@ -0,0 +1,276 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Smart Downloader - paralel, kaldığı yerden devam eden ve doğrulanan TLC indirmeleri
+
+- Dosyalar ortak bir requests.Session havuzu üzerinden eşzamanlı indirilir.
+- Yarım kalan indirmeler `<dosya>.part` içinde tutulur ve HTTP Range ile devam ettirilir;
+  .part'ın hangi uzak sürüme ait olduğu `<dosya>.part.json` içindeki ETag ile If-Range'e verilir
+  (kayıtlı ETag yoksa indirme baştan başlar).
+- Tamamlanan dosyalar boyut (ve mümkünse ETag/MD5) ile doğrulanıp yerine taşınır;
+  yarım bir dosya hiçbir zaman "Mevcut" sayılmaz.
+- Kaynak adres yerel bir ayna klasörü (`/mnt/tlc` veya `file:///mnt/tlc`) ya da yerel bir
+  HTTP sunucusu olabilir.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, unquote
+
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CHUNK_SIZE = 8 * 1024 * 1024
+MANIFEST_FILE = ".downloads.json"
+PART_META_SUFFIX = ".part.json"
+PARQUET_MAGIC = b'PAR1'
+
+_manifest_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    pass
+
+
+def make_session(pool_size=8, retries=3):
+    retry = Retry(total=retries, backoff_factor=1.0, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['HEAD', 'GET'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _local_path(url):
+    """Yerel ayna adresleri için dosya yolu; HTTP(S) adresleri için None."""
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return unquote(parsed.path)
+    if parsed.scheme in ('', ) or (len(parsed.scheme) == 1 and os.name == 'nt'):
+        return url
+    return None
+
+
+def _load_manifest(data_dir):
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _record(data_dir, filename, entry):
+    with _manifest_lock:
+        manifest = _load_manifest(data_dir)
+        manifest[filename] = entry
+        tmp_path = os.path.join(data_dir, f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(data_dir, MANIFEST_FILE))
+
+
+def _etag_md5(etag):
+    """Tek parça yüklemelerde S3/CloudFront ETag'i dosyanın MD5'idir; çok parçalılarda ('-') değil."""
+    if not etag:
+        return None
+    etag = etag.strip('"')
+    if etag.startswith('W/') or '-' in etag or len(etag) != 32:
+        return None
+    return etag.lower()
+
+
+def _md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _looks_complete(filepath):
+    """Uzakla doğrulanamayan dosya için yapısal kontrol: Parquet'te PAR1 ile biten ve açılan bir footer."""
+    if not filepath.endswith('.parquet'):
+        return os.path.getsize(filepath) > 0
+    try:
+        with open(filepath, 'rb') as f:
+            f.seek(-len(PARQUET_MAGIC), os.SEEK_END)
+            if f.read() != PARQUET_MAGIC:
+                return False
+        pq.ParquetFile(filepath)
+    except (OSError, ValueError):
+        # ArrowInvalid ValueError'dan türer; çok kısa dosyada seek OSError verir
+        return False
+    return True
+
+
+def _part_etag(filepath):
+    """.part'ın yazılmaya başlandığı uzak sürümün ETag'i; kayıt yoksa None."""
+    path = f"{filepath}{PART_META_SUFFIX}"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f).get('etag')
+
+
+def _start_part(filepath, url, etag):
+    """.part'ı sıfırdan başlatır ve hangi sürüme ait olduğunu yan dosyaya yazar."""
+    path = f"{filepath}{PART_META_SUFFIX}"
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump({'url': url, 'etag': etag}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _discard_part(filepath):
+    for path in (f"{filepath}.part", f"{filepath}{PART_META_SUFFIX}"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _copy_local(source_path, filepath):
+    part_path = f"{filepath}.part"
+    shutil.copyfile(source_path, part_path)
+    size = os.path.getsize(source_path)
+    if os.path.getsize(part_path) != size:
+        raise DownloadError(f"Boyut uyuşmuyor: {part_path}")
+    os.replace(part_path, filepath)
+    return {'url': source_path, 'size': size, 'etag': None}
+
+
+def _download_http(session, url, filepath, retries=3, timeout=60):
+    part_path = f"{filepath}.part"
+    head = session.head(url, allow_redirects=True, timeout=timeout)
+    # HEAD desteklemeyen yerel sunucularda doğrulama yalnızca indirme sonrası boyutla sınırlı kalır
+    headers = head.headers if head.ok else {}
+    expected_size = int(headers['Content-Length']) if 'Content-Length' in headers else None
+    etag = headers.get('ETag')
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_etag = _part_etag(filepath) if offset else None
+        # Hangi sürüme ait olduğu bilinmeyen, uzak dosyadan büyük ya da başka sürümden kalan .part atılır
+        if offset and (part_etag is None or (expected_size is not None and offset > expected_size)
+                       or (etag and part_etag != etag)):
+            _discard_part(filepath)
+            offset = 0
+        headers = {}
+        if offset and (expected_size is None or offset < expected_size):
+            headers['Range'] = f"bytes={offset}-"
+            # .part'ın kendi sürümü: uzak dosya o zamandan beri değiştiyse sunucu 200 ile tamamını döndürür
+            headers['If-Range'] = part_etag
+        try:
+            if expected_size is None or offset < expected_size:
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    response.raise_for_status()
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    if mode == 'wb':
+                        etag = response.headers.get('ETag', etag)
+                        _start_part(filepath, url, etag)
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise DownloadError(f"{url}: {e}") from e
+            time.sleep(2 ** attempt)
+
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        raise DownloadError(f"Boyut uyuşmuyor: {size} != {expected_size} ({url})")
+    expected_md5 = _etag_md5(etag)
+    if expected_md5 is not None and _md5(part_path) != expected_md5:
+        _discard_part(filepath)
+        raise DownloadError(f"ETag/MD5 doğrulaması başarısız: {url}")
+    os.replace(part_path, filepath)
+    _discard_part(filepath)
+    return {'url': url, 'size': size, 'etag': etag}
+
+
+def _is_complete(session, filename, url, data_dir, verify=False):
+    """Dosya tam mı? Manifest kaydı olmayan (eski sürümle indirilmiş) dosyalar kaynakla karşılaştırılır."""
+    filepath = os.path.join(data_dir, filename)
+    if not os.path.exists(filepath):
+        return False
+    size = os.path.getsize(filepath)
+    entry = _load_manifest(data_dir).get(filename)
+    if entry is not None and entry.get('size') is not None and size != entry['size']:
+        return False
+    if entry is not None and not verify:
+        return True
+
+    local_path = _local_path(url)
+    if local_path is not None:
+        remote_size, remote_etag = (os.path.getsize(local_path) if os.path.exists(local_path) else None), None
+    else:
+        try:
+            head = session.head(url, allow_redirects=True, timeout=60)
+        except requests.RequestException:
+            head = None
+        if head is None or not head.ok:
+            # Kaynakla karşılaştırılamıyor (çevrimdışı / HEAD yok): kayıtsız dosya en azından
+            # yapısal olarak tam olmalı, değilse .part olarak yeniden indirilir
+            return entry is not None or _looks_complete(filepath)
+        remote_size = int(head.headers['Content-Length']) if 'Content-Length' in head.headers else None
+        remote_etag = head.headers.get('ETag')
+
+    if remote_size is not None and remote_size != size:
+        return False
+    if entry is not None and entry.get('etag') and remote_etag not in (None, entry['etag']):
+        return False
+    if entry is None:
+        _record(data_dir, filename, {'url': url, 'size': size, 'etag': remote_etag})
+    return True
+
+
+def download_file(session, filename, url, data_dir, retries=3):
+    filepath = os.path.join(data_dir, filename)
+    local_path = _local_path(url)
+    if local_path is not None:
+        entry = _copy_local(local_path, filepath)
+    else:
+        # Eski sürümün yarım bıraktığı dosya .part olarak devam ettirilir
+        if os.path.exists(filepath) and not os.path.exists(f"{filepath}.part"):
+            os.replace(filepath, f"{filepath}.part")
+        entry = _download_http(session, url, filepath, retries=retries)
+    _record(data_dir, filename, entry)
+    return filepath
+
+
+def download_files(urls, data_dir, workers=4, retries=3, verify=False):
+    """Eksik veya yarım dosyaları paralel indirir; {dosya: yol} döndürür."""
+    os.makedirs(data_dir, exist_ok=True)
+    session = make_session(pool_size=workers, retries=retries)
+    paths = {}
+    pending = {}
+    for filename, url in urls.items():
+        if _is_complete(session, filename, url, data_dir, verify):
+            print(f"  ✅ Mevcut: {filename}")
+            paths[filename] = os.path.join(data_dir, filename)
+        else:
+            pending[filename] = url
+
+    if pending:
+        print(f"  İndiriliyor: {len(pending)} dosya, {workers} paralel bağlantı "
+              f"(Bu işlem internet hızınıza göre zaman alabilir)...")
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as pool:
+        futures = {pool.submit(download_file, session, filename, url, data_dir, retries): filename
+                   for filename, url in pending.items()}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                paths[filename] = future.result()
+                print(f"  ✅ İndirildi: {paths[filename]}")
+            except Exception as e:
+                print(f"  ❌ Hata: {filename} indirilemedi. {str(e)}")
+                errors.append(filename)
+    if errors:
+        raise DownloadError(f"İndirilemeyen dosyalar: {', '.join(sorted(errors))}")
+    return paths
@@ -0,0 +1,179 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Feature Store - temizlenmiş & zenginleştirilmiş seyahatlerin kalıcı Parquet önbelleği
+
+Düzen: data/features/source=<kaynak>/year=<yıl>/month=<ay>/part-<anahtar>.parquet
+Anahtar; ham dosyanın boyut/değişiklik zamanı, zone tablosu ve temizleme kurallarının
+kaynak kodundan üretilir. Kurallar ya da girdi değişince önbellek kendiliğinden yenilenir.
+"""
+
+import functools
+import glob
+import hashlib
+import inspect
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import cleaning
+from cleaning import (clean_yellow_taxi, clean_fhvhv, add_zone_columns, add_time_columns, time_features,
+                      epoch_ticks, apply_compact_schema, yellow_cols, fhv_cols, YELLOW_FILTER, FHV_FILTER, TRIP_SCHEMA, REDUNDANT_COLUMNS)
+from tlc import ZONE_LOOKUP_FILE, parse_trip_filename
+from zone_index import ZoneIndex, load_zone_index
+
+FEATURE_VERSION = 1
+STORE_DIRNAME = "features"
+
+CLEANERS = {'yellow': clean_yellow_taxi, 'fhv': clean_fhvhv}
+RAW_COLUMNS = {'yellow': yellow_cols, 'fhv': fhv_cols}
+RAW_FILTERS = {'yellow': YELLOW_FILTER, 'fhv': FHV_FILTER}
+
+def clean_batch(df, source, data_dir):
+    """Ham batch -> temizlenmiş, zone bilgisi eklenmiş, kompakt tipli batch."""
+    df = CLEANERS[source](df)
+    df = add_zone_columns(df, load_zone_index(data_dir))
+    return apply_compact_schema(df)
+
+
+@functools.lru_cache(maxsize=None)
+def rules_hash():
+    code = [inspect.getsource(fn) for fn in (clean_yellow_taxi, clean_fhvhv, add_zone_columns, add_time_columns,
+                                              time_features, epoch_ticks, apply_compact_schema, clean_batch,
+                                              ZoneIndex)]
+    code.append(repr((FEATURE_VERSION, TRIP_SCHEMA, REDUNDANT_COLUMNS, RAW_COLUMNS, RAW_FILTERS,
+                      cleaning.WEEKEND_DAYS, cleaning.RUSH_HOURS, cleaning.NIGHT_HOURS, cleaning.COMPANY_MAP)))
+    return hashlib.sha1("\n".join(code).encode()).hexdigest()
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def cache_key(raw_path):
+    data_dir = os.path.dirname(os.path.abspath(raw_path))
+    parts = [_fingerprint(raw_path), _fingerprint(os.path.join(data_dir, ZONE_LOOKUP_FILE)), rules_hash()]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def partition_dir(raw_path, source):
+    data_dir = os.path.dirname(os.path.abspath(raw_path))
+    parsed = parse_trip_filename(raw_path)
+    if parsed is None:
+        partition = f"file={os.path.splitext(os.path.basename(raw_path))[0]}"
+    else:
+        _, year, month = parsed
+        partition = os.path.join(f"year={year}", f"month={month:02d}")
+    return os.path.join(data_dir, STORE_DIRNAME, f"source={source}", partition)
+
+
+def feature_file(raw_path, source):
+    return os.path.join(partition_dir(raw_path, source), f"part-{cache_key(raw_path)}.parquet")
+
+
+def cached_feature_file(raw_path, source):
+    path = feature_file(raw_path, source)
+    return path if os.path.exists(path) else None
+
+
+class FeatureWriter:
+    """Temizlenmiş batch'leri geçici dosyaya yazar; yalnızca başarıyla biterse yerine taşır."""
+
+    def __init__(self, raw_path, source):
+        self.path = feature_file(raw_path, source)
+        self.tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        self.raw_rows = pq.ParquetFile(raw_path).metadata.num_rows
+        self.writer = None
+
+    def write(self, df):
+        schema = self.writer.schema if self.writer is not None else None
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            metadata = dict(table.schema.metadata or {})
+            metadata[b'raw_rows'] = str(self.raw_rows).encode()
+            self.writer = pq.ParquetWriter(self.tmp_path, table.schema.with_metadata(metadata))
+        self.writer.write_table(table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.writer is not None:
+            self.writer.close()
+        if exc_type is not None or self.writer is None:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.path)
+        # Aynı bölümdeki eski anahtarlı dosyaları temizle
+        for stale in glob.glob(os.path.join(os.path.dirname(self.path), "part-*.parquet")):
+            if stale != self.path:
+                os.remove(stale)
+        return False
+
+
+def raw_format(raw_path):
+    return 'csv' if raw_path.lower().endswith('.csv') else 'parquet'
+
+
+def scan_raw(raw_path, source, batch_size=1_000_000):
+    """Ham dosyayı (Parquet ya da CSV) yalnızca gerekli sütunlar ve sınır filtreleri uygulanmış olarak tarar."""
+    dataset = ds.dataset(raw_path, format=raw_format(raw_path))
+    return dataset.scanner(columns=RAW_COLUMNS[source], filter=RAW_FILTERS[source], batch_size=batch_size)
+
+
+def read_raw(raw_path, source):
+    return scan_raw(raw_path, source).to_table().to_pandas()
+
+
+def iter_raw_batches(raw_path, source, batch_size=1_000_000):
+    data_dir = os.path.dirname(os.path.abspath(raw_path))
+    for batch in scan_raw(raw_path, source, batch_size).to_batches():
+        if batch.num_rows:
+            yield clean_batch(batch.to_pandas(), source, data_dir)
+
+
+def iter_feature_batches(path, batch_size=1_000_000, columns=None):
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def build_features(raw_path, source, batch_size=1_000_000):
+    with FeatureWriter(raw_path, source) as writer:
+        for df in iter_raw_batches(raw_path, source, batch_size):
+            writer.write(df)
+    return writer.path
+
+
+def ensure_features(raw_path, source, batch_size=1_000_000):
+    return cached_feature_file(raw_path, source) or build_features(raw_path, source, batch_size)
+
+
+def raw_rows(path):
+    """Önbellek dosyası için kaynak ham dosyanın satır sayısı (örneklem oranları için)."""
+    metadata = pq.read_schema(path).metadata or {}
+    return int(metadata.get(b'raw_rows', pq.ParquetFile(path).metadata.num_rows))
+
+
+def load_features(path, columns=None, frac=None, random_state=42, positions=False):
+    """Önbelleği memory-map ile okur; frac verilirse yalnızca örneklenen satırlar pandas'a çevrilir.
+
+    Dönen çerçeve kompakt şemadadır (uint8/uint16, float32, kategorik). positions=True ise indeks
+    satırın dosyadaki konumudur (ör. out_of_core.file_holdout ile aynı test satırlarını seçmek için).
+    """
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    rows = np.arange(table.num_rows)
+    if frac is not None and frac < 1:
+        rng = np.random.default_rng(random_state)
+        n = int(round(table.num_rows * frac))
+        rows = np.sort(rng.choice(table.num_rows, size=n, replace=False))
+        table = table.take(rows)
+    df = apply_compact_schema(table.to_pandas())
+    if positions:
+        df.index = rows
+    return df
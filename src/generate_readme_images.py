@@ -1,69 +1,286 @@
 """
-Generate Static Images for README
+NYC Urban Mobility Intelligence Platform
+README Images - analysis_results.json'dan README grafikleri (artımlı, paralel)
+
+Her grafik analysis_results.json'ın belirli bölümlerinden çizilir. O bölümlerin içeriği, çizim
+fonksiyonunun kaynak kodu ve dpi birlikte hash'lenir; hash images/.chart_cache.json'dakiyle
+aynıysa ve PNG diskteyse grafik atlanır. Değişen grafikler süreç havuzunda, etkileşimsiz Agg
+backend'i ile çizilir; dosyalar geçici adla yazılıp yerine taşınır.
+
+    python src/generate_readme_images.py                      # yalnızca girdisi değişen grafikler
+    python src/generate_readme_images.py --force --only borough_trips,airport_hourly
 """
+
+import argparse
+import hashlib
+import inspect
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
-import os
+import seaborn as sns
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = os.path.join(BASE_DIR, "visualizations")
+RESULTS_FILE = os.path.join(OUTPUT_DIR, "analysis_results.json")
+IMG_DIR = os.path.join(OUTPUT_DIR, "images")
+CACHE_FILE = ".chart_cache.json"
+
+YELLOW = '#F7B731'
+FHV = '#2d3436'
+
+
+def _style():
+    sns.set_theme(style="whitegrid")
+    plt.rcParams['figure.figsize'] = (10, 6)
+    plt.rcParams['font.size'] = 12
+
+
+# =============================================================================
+# GRAFİKLER - her biri girdi dilimini ({yol: değer}) alır, Figure döndürür
+# =============================================================================
+def hourly_demand(data):
+    hourly_yellow = pd.DataFrame(data['hourly_demand.yellow_taxi'])
+    hourly_fhv = pd.DataFrame(data['hourly_demand.fhv'])
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(hourly_yellow['hour'], hourly_yellow['trips'], label='Yellow Taxi', marker='o', linewidth=2, color=YELLOW)
+    ax.plot(hourly_fhv['hour'], hourly_fhv['trips'], label='Uber/Lyft (FHV)', marker='o', linewidth=2, color='#000000')
+    ax.set_title('Hourly Demand: Yellow Taxi vs Uber/Lyft', fontsize=16, pad=20)
+    ax.set_xlabel('Hour of Day', fontsize=12)
+    ax.set_ylabel('Number of Trips', fontsize=12)
+    ax.set_xticks(range(0, 24))
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def market_share(data):
+    share = data['market_share.overall']
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.pie([share['yellow_taxi_pct'], share['fhv_pct']], labels=['Yellow Taxi', 'Uber/Lyft (FHV)'],
+           colors=[YELLOW, FHV], autopct='%1.1f%%', startangle=90,
+           textprops={'fontsize': 14, 'weight': 'bold', 'color': 'white'}, pctdistance=0.85)
+    ax.add_artist(plt.Circle((0, 0), 0.70, fc='white'))
+    ax.set_title('NYC Ride Market Share (2024)', fontsize=16)
+    return fig
+
+
+def feature_importance(data):
+    fi_data = pd.DataFrame(data['tip_analysis.feature_importance']).head(10)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x='importance', y='feature', data=fi_data, hue='feature', palette='viridis', legend=False, ax=ax)
+    ax.set_title('Top Factors Influencing Tipping Behavior', fontsize=16)
+    ax.set_xlabel('Importance Score')
+    ax.set_ylabel('Feature')
+    return fig
+
+
+def borough_trips(data):
+    yellow = pd.DataFrame(data['borough_analysis.yellow_taxi']).set_index('PU_Borough')['trips']
+    fhv = pd.DataFrame(data['borough_analysis.fhv']).set_index('PU_Borough')['trips']
+    df = pd.DataFrame({'Yellow Taxi': yellow, 'Uber/Lyft (FHV)': fhv}).fillna(0)
+    df = df.loc[df.sum(axis=1).sort_values(ascending=False).index]
+    fig, ax = plt.subplots(figsize=(11, 6))
+    df.plot.bar(ax=ax, color=[YELLOW, FHV], rot=0)
+    ax.set_title('Pickups by Borough', fontsize=16)
+    ax.set_xlabel('')
+    ax.set_ylabel('Number of Trips')
+    return fig
+
+
+def airport_hourly(data):
+    df = pd.DataFrame(data['airport_analysis.hourly_demand'])
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(df['hour'], df['trip_count'], color=YELLOW, label='Trips')
+    ax.set_xlabel('Hour of Day')
+    ax.set_ylabel('Airport Trips')
+    ax.set_xticks(range(0, 24))
+    fare = ax.twinx()
+    fare.plot(df['hour'], df['avg_fare'], color=FHV, marker='o', linewidth=2, label='Avg Fare ($)')
+    fare.set_ylabel('Average Fare ($)')
+    fare.grid(False)
+    ax.set_title('Airport Pickups by Hour', fontsize=16)
+    return fig
+
+
+def nightlife(data):
+    hours = data['nightlife_analysis.hourly_distribution']
+    order = [h for h in (22, 23, 0, 1, 2, 3, 4) if str(h) in hours]
+    zones = pd.DataFrame(data['nightlife_analysis.top_nightlife_zones']).head(10)
+    fig, (left, right) = plt.subplots(1, 2, figsize=(15, 6), gridspec_kw={'width_ratios': [1, 1.4]})
+    left.bar([f"{h:02d}:00" for h in order], [hours[str(h)] for h in order], color=FHV)
+    left.set_title('Night Trips by Hour', fontsize=14)
+    left.set_ylabel('Number of Trips')
+    right.barh(zones['PU_Zone'][::-1], zones['trips'][::-1], color=YELLOW)
+    right.set_title('Top Nightlife Pickup Zones', fontsize=14)
+    right.set_xlabel('Number of Trips')
+    fig.suptitle('NYC Nightlife (22:00-04:00)', fontsize=16)
+    return fig
+
+
+def congestion_speed(data):
+    df = pd.DataFrame(data['congestion_analysis.hourly_speed'])
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(df['hour'], df['avg_speed_mph'], marker='o', linewidth=2, color=FHV)
+    ax.axhline(data['congestion_analysis.rush_hour_avg_speed'], color='#e74c3c', linestyle='--', label='Rush hour avg')
+    ax.axhline(data['congestion_analysis.off_peak_avg_speed'], color='#27ae60', linestyle='--', label='Off-peak avg')
+    ax.set_title('Average Yellow Taxi Speed by Hour', fontsize=16)
+    ax.set_xlabel('Hour of Day')
+    ax.set_ylabel('Speed (mph)')
+    ax.set_xticks(range(0, 24))
+    ax.legend()
+    return fig
+
+
+def profitable_zones(data):
+    df = pd.DataFrame(data['profitable_locations.top_zones']).head(15)
+    labels = df['PU_Zone'] + ' (' + df['PU_Borough'] + ')'
+    fig, ax = plt.subplots(figsize=(12, 7))
+    ax.barh(labels[::-1], df['avg_fare'][::-1], color=YELLOW)
+    for y, (fare, trips) in enumerate(zip(df['avg_fare'][::-1], df['trip_count'][::-1])):
+        ax.text(fare, y, f" {trips:,} trips", va='center', fontsize=9)
+    ax.set_title('Most Profitable Pickup Zones (Average Fare)', fontsize=16)
+    ax.set_xlabel('Average Fare ($)')
+    return fig
+
+
+# Grafik adı -> (çizim fonksiyonu, analysis_results.json girdi yolları)
+CHARTS = {
+    'hourly_demand': (hourly_demand, ('hourly_demand.yellow_taxi', 'hourly_demand.fhv')),
+    'market_share': (market_share, ('market_share.overall',)),
+    'feature_importance': (feature_importance, ('tip_analysis.feature_importance',)),
+    'borough_trips': (borough_trips, ('borough_analysis.yellow_taxi', 'borough_analysis.fhv')),
+    'airport_hourly': (airport_hourly, ('airport_analysis.hourly_demand',)),
+    'nightlife': (nightlife, ('nightlife_analysis.hourly_distribution', 'nightlife_analysis.top_nightlife_zones')),
+    'congestion_speed': (congestion_speed, ('congestion_analysis.hourly_speed', 'congestion_analysis.rush_hour_avg_speed',
+                                            'congestion_analysis.off_peak_avg_speed')),
+    'profitable_zones': (profitable_zones, ('profitable_locations.top_zones',)),
+}
+
+
+# =============================================================================
+# ÖNBELLEK VE ÇİZİM
+# =============================================================================
+def lookup(results, path):
+    value = results
+    for key in path.split('.'):
+        value = value[key]
+    return value
+
+
+def chart_inputs(results, paths):
+    """Grafiğin girdi dilimi; bölümlerden biri yoksa (ilgili aşama çalışmamış) None."""
+    try:
+        return {path: lookup(results, path) for path in paths}
+    except (KeyError, TypeError):
+        return None
+
+
+def chart_key(name, data, dpi):
+    """Girdi dilimi + çizim kodu + dpi özeti; biri değişince grafik yeniden çizilir."""
+    render = CHARTS[name][0]
+    payload = json.dumps([name, data, inspect.getsource(render), dpi], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def load_cache(img_dir):
+    try:
+        with open(os.path.join(img_dir, CACHE_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(img_dir, cache):
+    path = os.path.join(img_dir, CACHE_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def render_chart(task):
+    """İşçide: grafiği çizer, geçici dosyaya yazar ve yerine taşır; (ad, süre) döndürür."""
+    name, data, path, dpi = task
+    started = time.perf_counter()
+    fig = CHARTS[name][0](data)
+    fig.tight_layout()
+    tmp = f"{path}.tmp.png"
+    fig.savefig(tmp, dpi=dpi)
+    plt.close(fig)
+    os.replace(tmp, path)
+    return name, time.perf_counter() - started
+
+
+def generate(results, img_dir=IMG_DIR, dpi=300, workers=None, force=False, only=None):
+    """Girdisi değişen grafikleri çizer; {'rendered', 'skipped', 'missing'} ad listeleri."""
+    os.makedirs(img_dir, exist_ok=True)
+    cache = load_cache(img_dir)
+    tasks, keys, summary = [], {}, {'rendered': [], 'skipped': [], 'missing': []}
+    for name, (_, paths) in CHARTS.items():
+        if only and name not in only:
+            continue
+        data = chart_inputs(results, paths)
+        if data is None:
+            summary['missing'].append(name)
+            continue
+        path = os.path.join(img_dir, f"{name}.png")
+        keys[name] = chart_key(name, data, dpi)
+        if not force and cache.get(name) == keys[name] and os.path.exists(path):
+            summary['skipped'].append(name)
+            continue
+        tasks.append((name, data, path, dpi))
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        _style()
+        rendered = map(render_chart, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_style)
+        rendered = pool.map(render_chart, tasks)
+    try:
+        for name, elapsed in rendered:
+            # Her grafik biter bitmez kaydedilir; yarıda kesilen çalıştırma bitenleri tekrar çizmez
+            cache[name] = keys[name]
+            save_cache(img_dir, cache)
+            summary['rendered'].append(name)
+            print(f"  ✓ {name}.png ({elapsed:.2f} s)")
+    finally:
+        if workers > 1:
+            pool.shutdown()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="README grafikleri (yalnızca girdisi değişenler)")
+    parser.add_argument('--results', default=RESULTS_FILE, help="analysis_results.json yolu")
+    parser.add_argument('--out', default=IMG_DIR, help="PNG klasörü")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=None, help="süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument('--force', action='store_true', help="önbelleği yok say, hepsini yeniden çiz")
+    parser.add_argument('--only', default=None, help=f"virgülle ayrılmış grafik adları ({','.join(CHARTS)})")
+    args = parser.parse_args(argv)
+
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    unknown = set(only or []) - set(CHARTS)
+    if unknown:
+        parser.error(f"Bilinmeyen grafik: {', '.join(sorted(unknown))}")
+    with open(args.results, 'r') as f:
+        results = json.load(f)
+
+    started = time.perf_counter()
+    summary = generate(results, args.out, args.dpi, args.workers, args.force, only)
+    print(f"{len(summary['rendered'])} grafik çizildi, {len(summary['skipped'])} değişmemiş "
+          f"({time.perf_counter() - started:.1f} s)")
+    if summary['missing']:
+        print(f"  ⚠️ Girdi bölümü olmayan grafikler: {', '.join(summary['missing'])}")
+
 
-# Set style
-sns.set_theme(style="whitegrid")
-plt.rcParams['figure.figsize'] = (10, 6)
-plt.rcParams['font.size'] = 12
-
-OUTPUT_DIR = "/home/ubuntu/nyc_mobility_intelligence/visualizations"
-IMG_DIR = "/home/ubuntu/nyc_mobility_intelligence/visualizations/images"
-os.makedirs(IMG_DIR, exist_ok=True)
-
-# Load results
-with open(f"{OUTPUT_DIR}/analysis_results.json", 'r') as f:
-    results = json.load(f)
-
-# 1. Hourly Demand Comparison
-hourly_yellow = pd.DataFrame(results['hourly_demand']['yellow_taxi'])
-hourly_fhv = pd.DataFrame(results['hourly_demand']['fhv'])
-
-plt.figure(figsize=(12, 6))
-plt.plot(hourly_yellow['hour'], hourly_yellow['trips'], label='Yellow Taxi', marker='o', linewidth=2, color='#F7B731')
-plt.plot(hourly_fhv['hour'], hourly_fhv['trips'], label='Uber/Lyft (FHV)', marker='o', linewidth=2, color='#000000')
-plt.title('Hourly Demand: Yellow Taxi vs Uber/Lyft', fontsize=16, pad=20)
-plt.xlabel('Hour of Day', fontsize=12)
-plt.ylabel('Number of Trips', fontsize=12)
-plt.xticks(range(0, 24))
-plt.legend()
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig(f"{IMG_DIR}/hourly_demand.png", dpi=300)
-plt.close()
-
-# 2. Market Share Pie Chart
-market_share = results['market_share']['overall']
-labels = ['Yellow Taxi', 'Uber/Lyft (FHV)']
-sizes = [market_share['yellow_taxi_pct'], market_share['fhv_pct']]
-colors = ['#F7B731', '#2d3436']
-
-plt.figure(figsize=(8, 8))
-plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90, 
-        textprops={'fontsize': 14, 'weight': 'bold', 'color': 'white'}, pctdistance=0.85)
-# Draw circle
-centre_circle = plt.Circle((0,0),0.70,fc='white')
-fig = plt.gcf()
-fig.gca().add_artist(centre_circle)
-plt.title('NYC Ride Market Share (2024)', fontsize=16)
-plt.tight_layout()
-plt.savefig(f"{IMG_DIR}/market_share.png", dpi=300)
-plt.close()
-
-# 3. Feature Importance (Tip Prediction)
-fi_data = pd.DataFrame(results['tip_analysis']['feature_importance']).head(10)
-plt.figure(figsize=(10, 6))
-sns.barplot(x='importance', y='feature', data=fi_data, palette='viridis')
-plt.title('Top Factors Influencing Tipping Behavior', fontsize=16)
-plt.xlabel('Importance Score')
-plt.ylabel('Feature')
-plt.tight_layout()
-plt.savefig(f"{IMG_DIR}/feature_importance.png", dpi=300)
-plt.close()
-
-print("Images generated successfully!")
+if __name__ == '__main__':
+    main()
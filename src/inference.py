@@ -0,0 +1,391 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Inference - bahşiş, talep ve süre modelleri için düşük gecikmeli çevrimiçi tahmin servisi
+
+    python src/inference.py --port 8001
+
+    POST /predict/tip        {"instances": [{"trip_distance": 2.1, "fare_amount": 14.5,
+                                             "pickup_datetime": "2024-01-15T08:30", "passenger_count": 1}]}
+    POST /predict/duration   {"trip_distance": 3.2, "hour": 18, "day_of_week": 4,
+                              "PULocationID": 161, "DOLocationID": 236}
+    POST /predict/demand     {"instances": [{"hour": 8, "day_of_week": 0}, {"hour": 23, "day_of_week": 5}]}
+    GET  /models             yüklü modeller ve beklenen alanlar
+    GET  /stats              model başına p50 / p99 gecikme, verim ve batch sayaçları
+
+Modeller başlangıçta bir kez yüklenir. hour / day_of_week yerine pickup_datetime verilebilir;
+is_weekend, is_rush_hour ve is_night temizleme kurallarıyla (cleaning.py), od_* özellikleri ise
+modelle birlikte kaydedilen OD matrisinden (od_matrix.py) türetilir. Aynı anda gelen istekler
+model başına tek bir predict çağrısında birleştirilir (micro-batch).
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from advanced_models import DURATION_FEATURES, OD_DIRNAME
+from cleaning import NIGHT_HOURS, RUSH_HOURS, WEEKEND_DAYS
+from local_http import HTTPError, JSONServer, json_body, run
+from main_analysis import DEMAND_FEATURES, MODEL_DIR, TIP_FEATURES
+from od_matrix import OD_FEATURES, ODMatrix
+
+MODELS = {
+    'tip': {'file': 'tip_prediction_model.joblib', 'features': TIP_FEATURES,
+            'source': 'python src/main_analysis.py'},
+    'demand': {'file': 'demand_prediction_model.joblib', 'features': DEMAND_FEATURES,
+               'source': 'python src/main_analysis.py'},
+    'duration': {'file': 'duration_prediction_model.joblib', 'features': DURATION_FEATURES,
+                 'source': 'python src/advanced_models.py'},
+}
+
+# Saat ve günden türetilen özellikler; istekte verilmez
+DERIVED = {
+    'is_weekend': ('day_of_week', WEEKEND_DAYS),
+    'is_rush_hour': ('hour', RUSH_HOURS),
+    'is_night': ('hour', NIGHT_HOURS),
+}
+TIME_FIELDS = ('hour', 'day_of_week')
+OD_FIELDS = ('PULocationID', 'DOLocationID', 'hour')
+
+# Temizleme kurallarıyla aynı aralıklar: (alt, üst, tam sayı mı); ondalıklı alanlarda sınırlar hariç
+BOUNDS = {
+    'trip_distance': (0, 100, False),
+    'fare_amount': (0, 500, False),
+    'passenger_count': (1, 6, True),
+    'hour': (0, 23, True),
+    'day_of_week': (0, 6, True),
+    'PULocationID': (1, 265, True),
+    'DOLocationID': (1, 265, True),
+}
+DEFAULTS = {'passenger_count': 1}
+
+MAX_BATCH = 1024
+MAX_WAIT_MS = 2.0
+MAX_INSTANCES = 100_000  # tek istekteki en fazla kayıt
+
+
+def model_inputs(features):
+    """Özellik listesi -> istekte beklenen alanlar (türetilenler hariç, saat alanları dahil)."""
+    inputs = [f for f in features if f not in DERIVED and f not in OD_FEATURES]
+    sources = [DERIVED[f][0] for f in features if f in DERIVED]
+    if any(f in OD_FEATURES for f in features):
+        sources += OD_FIELDS
+    return inputs + [f for f in dict.fromkeys(sources) if f not in inputs]
+
+
+def _time_fields(value):
+    when = datetime.fromisoformat(str(value))
+    return {'hour': when.hour, 'day_of_week': when.weekday()}
+
+
+def feature_matrix(features, instances, od=None):
+    """İstek kayıtları -> eğitimdeki sırayla (n, özellik) float32 matrisi; hatalar ValueError.
+
+    od_* özellikleri için modelin OD matrisi (ODMatrix) verilmelidir.
+    """
+    inputs = model_inputs(features)
+    needs_time = any(f in TIME_FIELDS for f in inputs)
+    values = np.empty((len(instances), len(inputs)), dtype=np.float64)
+    for i, instance in enumerate(instances):
+        if not isinstance(instance, dict):
+            raise ValueError(f"{i}. kayıt bir nesne değil")
+        if needs_time and 'pickup_datetime' in instance and not all(f in instance for f in TIME_FIELDS):
+            try:
+                instance = {**_time_fields(instance['pickup_datetime']), **instance}
+            except ValueError:
+                raise ValueError(f"{i}. kayıtta geçersiz pickup_datetime: {instance['pickup_datetime']!r}") from None
+        try:
+            values[i] = [instance[f] if f in instance else DEFAULTS[f] for f in inputs]
+        except KeyError as e:
+            raise ValueError(f"{i}. kayıtta eksik alan: {e.args[0]}") from None
+        except (TypeError, ValueError):
+            raise ValueError(f"{i}. kayıtta sayısal olmayan değer") from None
+
+    # Aralık kontrolü sütun bazında, vektörel
+    for j, name in enumerate(inputs):
+        low, high, integer = BOUNDS[name]
+        column = values[:, j]
+        if integer:
+            bad = ~((column >= low) & (column <= high) & (column == np.round(column)))
+        else:
+            bad = ~((column > low) & (column < high))
+        if bad.any():
+            i = int(np.argmax(bad))
+            kind = "tam sayı " if integer else ""
+            raise ValueError(f"{i}. kayıtta {name} aralık dışında: {column[i]} ({kind}{low}-{high})")
+
+    lookup = {}
+    if any(f in OD_FEATURES for f in features):
+        lookup = od.features(*(values[:, inputs.index(f)] for f in OD_FIELDS))
+    X = np.empty((len(instances), len(features)), dtype=np.float32)
+    for j, name in enumerate(features):
+        if name in lookup:
+            X[:, j] = lookup[name]
+        elif name in DERIVED:
+            source, members = DERIVED[name]
+            X[:, j] = np.isin(values[:, inputs.index(source)], members)
+        else:
+            X[:, j] = values[:, inputs.index(name)]
+    return X
+
+
+class Model:
+    """Yüklü model; predict (n, özellik) float32 matrisi alır."""
+
+    def __init__(self, name, estimator, features, threads=None, od=None):
+        self.name = name
+        self.features = list(features)
+        self.od = od
+        self.inputs = model_inputs(self.features)
+        self._table = None
+        if hasattr(estimator, 'get_booster'):
+            # Ara DataFrame / DMatrix olmadan doğrudan booster üzerinde tahmin
+            self._booster = estimator.get_booster()
+            if threads:
+                self._booster.set_param({'nthread': threads})
+            self._predict = lambda X: self._booster.inplace_predict(X, validate_features=False)
+        else:
+            if threads and hasattr(estimator, 'n_jobs'):
+                estimator.set_params(n_jobs=threads)
+            self._predict = lambda X: estimator.predict(pd.DataFrame(X, columns=self.features))
+        if set(self.inputs) <= set(TIME_FIELDS):
+            # Girdi yalnızca saat × gün ise (talep modeli) 24 x 7 sonuç bir kez hesaplanır
+            hours, days = np.meshgrid(np.arange(24), np.arange(7), indexing='ij')
+            grid = [{'hour': h, 'day_of_week': d} for h, d in zip(hours.ravel(), days.ravel())]
+            self._table = self._predict(self.matrix(grid)).reshape(24, 7)
+
+    @classmethod
+    def load(cls, name, model_dir=MODEL_DIR, threads=None):
+        spec = MODELS[name]
+        od = None
+        if any(f in OD_FEATURES for f in spec['features']):
+            od = ODMatrix.open(os.path.join(model_dir, OD_DIRNAME))
+        return cls(name, joblib.load(os.path.join(model_dir, spec['file'])), spec['features'], threads, od)
+
+    def matrix(self, instances):
+        return feature_matrix(self.features, instances, self.od)
+
+    def predict(self, X):
+        if self._table is not None:
+            return self._table[X[:, self.features.index('hour')].astype(np.intp),
+                               X[:, self.features.index('day_of_week')].astype(np.intp)]
+        return np.asarray(self._predict(X), dtype=np.float32)
+
+
+def load_models(model_dir=MODEL_DIR, names=None, threads=None):
+    """Dizindeki modeller; eksik dosyalar atlanır."""
+    models = {}
+    for name in names or MODELS:
+        if not os.path.exists(os.path.join(model_dir, MODELS[name]['file'])):
+            print(f"⚠️ {name} modeli yok: {MODELS[name]['file']} ({MODELS[name]['source']} ile eğitin)")
+            continue
+        try:
+            models[name] = Model.load(name, model_dir, threads)
+        except FileNotFoundError as e:
+            print(f"⚠️ {name} modeli yüklenemedi: {e} ({MODELS[name]['source']} ile yeniden eğitin)")
+    return models
+
+
+class LatencyStats:
+    """Son `window` isteğin gecikmesi (p50 / p99) ve toplam verim / batch sayaçları."""
+
+    def __init__(self, window=10_000):
+        self.recent = collections.deque(maxlen=window)  # (bitiş zamanı, gecikme sn, satır)
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.predict_s = 0.0
+
+    def request(self, latency, rows):
+        self.requests += 1
+        self.rows += rows
+        self.recent.append((time.monotonic(), latency, rows))
+
+    def batch(self, rows, elapsed):
+        self.batches += 1
+        self.batch_rows += rows
+        self.predict_s += elapsed
+
+    def summary(self):
+        result = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rows': self.rows,
+            'batches': self.batches,
+            'mean_batch_rows': round(self.batch_rows / self.batches, 1) if self.batches else None,
+            'predict_us_per_row': round(self.predict_s / self.batch_rows * 1e6, 2) if self.batch_rows else None,
+        }
+        if self.recent:
+            ended, latency, rows = (np.array(c) for c in zip(*self.recent))
+            p50, p99 = np.percentile(latency, [50, 99]) * 1000
+            span = ended[-1] - (ended[0] - latency[0])
+            result.update({
+                'latency_ms': {'p50': round(float(p50), 3), 'p99': round(float(p99), 3),
+                               'max': round(float(latency.max() * 1000), 3)},
+                'window_requests': len(latency),
+                'requests_per_s': round(len(latency) / span, 1) if span > 0 else None,
+                'rows_per_s': round(float(rows.sum()) / span, 1) if span > 0 else None,
+            })
+        return result
+
+
+class MicroBatcher:
+    """Kuyruktaki istekleri `max_batch` satıra ya da `max_wait_ms` süreye kadar biriktirip
+    tek predict çağrısıyla hesaplar; sonuç satırları isteklere geri bölünür."""
+
+    def __init__(self, model, executor, stats, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.executor = executor
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+
+    async def predict(self, X):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((X, future))
+        return await future
+
+    async def _collect(self):
+        items = [await self.queue.get()]
+        rows = len(items[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            items.append(item)
+            rows += len(item[0])
+        return items, rows
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items, rows = await self._collect()
+            X = items[0][0] if len(items) == 1 else np.concatenate([x for x, _ in items])
+            started = time.perf_counter()
+            try:
+                y = await loop.run_in_executor(self.executor, self.model.predict, X)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.batch(rows, time.perf_counter() - started)
+            offset = 0
+            for x, future in items:
+                if not future.done():
+                    future.set_result(y[offset:offset + len(x)])
+                offset += len(x)
+
+
+class InferenceService(JSONServer):
+    name = "Inference API"
+    methods = ('GET', 'HEAD', 'POST')
+
+    def __init__(self, models, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        super().__init__()
+        self.models = models
+        self.executor = ThreadPoolExecutor(max_workers=max(len(models), 1), thread_name_prefix="inference")
+        self.stats = {name: LatencyStats() for name in models}
+        self.batchers = {name: MicroBatcher(model, self.executor, self.stats[name], max_batch, max_wait_ms)
+                         for name, model in models.items()}
+        self.started = time.monotonic()
+        self._tasks = []
+
+    def summary(self):
+        return {'uptime_s': round(time.monotonic() - self.started, 1), 'requests': self.requests,
+                'models': {name: stats.summary() for name, stats in self.stats.items()}}
+
+    async def predict(self, name, payload):
+        """İstek gövdesi (tek kayıt, kayıt listesi ya da {"instances": [...]}) -> yanıt dict'i."""
+        if name in MODELS and name not in self.models:
+            raise HTTPError(503, f"Model yüklenmedi: {name} (önce {MODELS[name]['source']})")
+        if name not in self.models:
+            raise HTTPError(404, f"Bilinmeyen model: {name} (geçerli: {', '.join(self.models)})")
+        single = isinstance(payload, dict) and 'instances' not in payload
+        instances = [payload] if single else payload.get('instances') if isinstance(payload, dict) else payload
+        if not isinstance(instances, list) or not instances:
+            raise HTTPError(400, "Gövde bir kayıt, kayıt listesi ya da {\"instances\": [...]} olmalı")
+        if len(instances) > MAX_INSTANCES:
+            raise HTTPError(413, f"Çok fazla kayıt ({len(instances):,}, sınır {MAX_INSTANCES:,})")
+        started = time.perf_counter()
+        stats = self.stats[name]
+        try:
+            X = self.models[name].matrix(instances)
+        except ValueError as e:
+            stats.errors += 1
+            raise HTTPError(400, str(e)) from None
+        y = await self.batchers[name].predict(X)
+        stats.request(time.perf_counter() - started, len(instances))
+        if single:
+            return {'model': name, 'prediction': round(float(y[0]), 3)}
+        return {'model': name, 'predictions': np.round(y.astype(np.float64), 3).tolist()}
+
+    async def route(self, method, path, params, headers, body):
+        no_store = {'Cache-Control': 'no-store'}
+        if path == '/models':
+            return 200, no_store, json_body({name: {'file': MODELS[name]['file'], 'features': model.features,
+                                                    'inputs': model.inputs}
+                                             for name, model in self.models.items()})
+        if path == '/stats':
+            return 200, no_store, json_body(self.summary())
+        if path.startswith('/predict/'):
+            if method != 'POST':
+                raise HTTPError(405, "Tahmin için POST kullanın")
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "Gövde geçerli JSON değil") from None
+            return 200, no_store, json_body(await self.predict(path[len('/predict/'):], payload))
+        raise HTTPError(404, f"Bilinmeyen yol: {path}")
+
+    async def serve(self, host='127.0.0.1', port=8001, path='/models'):
+        self._tasks = [asyncio.create_task(batcher.run()) for batcher in self.batchers.values()]
+        await super().serve(host, port, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NYC Mobility çevrimiçi tahmin servisi (yerel)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--models', default=','.join(MODELS),
+                        help=f"yüklenecek modeller, virgülle ({', '.join(MODELS)})")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="tek predict çağrısındaki en fazla satır")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help="batch dolmadan önce beklenecek en uzun süre (ms)")
+    parser.add_argument('--threads', type=int, default=None, help="model başına predict iş parçacığı")
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.models.split(',') if n]
+    unknown = set(names) - set(MODELS)
+    if unknown:
+        parser.error(f"Bilinmeyen model: {', '.join(sorted(unknown))}")
+    models = load_models(args.model_dir, names, args.threads)
+    if not models:
+        parser.error(f"{args.model_dir} içinde model bulunamadı")
+    print(f"✅ Yüklenen modeller: {', '.join(models)}")
+    run(InferenceService(models, args.max_batch, args.max_wait_ms), args.host, args.port, '/models')
+
+
+if __name__ == '__main__':
+    main()
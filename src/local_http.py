@@ -0,0 +1,138 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Local HTTP - yerel JSON servisleri için asyncio HTTP/1.1 sunucusu (yalnızca standart kütüphane)
+
+Alt sınıflar `route` ile (durum, ek başlıklar, gövde) döndürür; keep-alive, CORS, HEAD,
+OPTIONS ve hata gövdeleri burada ele alınır. analytics_service.py ve inference.py kullanır.
+"""
+
+import asyncio
+import json
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+MAX_HEADER_LINES = 100
+MAX_BODY = 16 * 1024 * 1024
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def json_body(value):
+    return json.dumps(value, default=_json_default, ensure_ascii=False).encode()
+
+
+class JSONServer:
+    """İstek döngüsü; `methods` dışındaki metotlar 405 döner."""
+
+    name = "API"
+    methods = ('GET', 'HEAD')
+
+    def __init__(self):
+        self.requests = 0
+
+    async def route(self, method, path, params, headers, body):
+        """(durum, ek başlıklar, gövde baytları); HTTPError JSON hata gövdesine, diğer hatalar 500'e çevrilir."""
+        raise NotImplementedError
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.requests += 1
+                status, extra, payload = await self._dispatch(method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write(writer, status, extra, b'' if method == 'HEAD' else payload, len(payload), keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY:
+            return None
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method, target, headers, body):
+        if method == 'OPTIONS':
+            return 200, {'Access-Control-Allow-Methods': ', '.join(self.methods + ('OPTIONS',)),
+                         'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'}, b''
+        if method not in self.methods:
+            return 405, {}, json_body({'error': f"Desteklenmeyen metot: {method}"})
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        try:
+            return await self.route(method, path, parse_qs(url.query), headers, body)
+        except HTTPError as e:
+            return e.status, {}, json_body({'error': str(e)})
+        except Exception as e:
+            # Beklenmeyen hata bağlantıyı düşürmez: istemci JSON 500 alır, ayrıntı sunucu çıktısındadır
+            traceback.print_exc()
+            return 500, {}, json_body({'error': f"Sunucu hatası: {type(e).__name__}: {e}"})
+
+    def _write(self, writer, status, extra, body, length, keep_alive):
+        headers = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Content-Length': str(length if status != 304 else 0),
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **extra,
+        }
+        head = f"HTTP/1.1 {status} {STATUS[status]}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        # Gövde (ör. önbellekteki bayt nesnesi) başlıkla birleştirilip kopyalanmaz
+        writer.write(head.encode('latin-1') + b"\r\n")
+        if body:
+            writer.write(body)
+
+    async def serve(self, host='127.0.0.1', port=8000, path='/'):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"📡 {self.name}: http://{host}:{port}{path}")
+        async with server:
+            await server.serve_forever()
+
+
+def run(server, host, port, path='/'):
+    try:
+        asyncio.run(server.serve(host, port, path))
+    except KeyboardInterrupt:
+        pass
@@ -3,14 +3,16 @@ NYC Urban Mobility Intelligence Platform
 =========================================
 Kapsamlı NYC Taksi ve Rideshare Veri Analizi & Tahmin Sistemi
 (Otomatik Veri İndirme Özellikli)
+
+Analiz aşamaları (load, clean, aggregate, train_tip, train_demand, zone_demand, segments, save)
+import edilebilir fonksiyonlardır; modül import edildiğinde hiçbir iş yapılmaz.
+Aşamaları tek tek ya da alt kümeler halinde çalıştırmak için: python src/pipeline.py
 """
 
 import pandas as pd
 import numpy as np
 import pyarrow.parquet as pq
-from datetime import datetime
 import warnings
-import requests
 import os
 import gc
 import joblib
@@ -20,6 +22,21 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import xgboost as xgb
 
+from cleaning import (clean_yellow_taxi, clean_fhvhv, add_zone_columns,
+                      apply_compact_schema, memory_report, time_features)
+from feature_store import cached_feature_file, ensure_features, iter_feature_batches, load_features, raw_rows, read_raw
+from aggregates import TripAggregates, aggregate_files, aggregate_frames, segment_sections, summary_sections
+from sketches import SKETCH_FILE
+from downloader import download_files
+from model_manifest import data_months, file_month, record, resume, timestamp_months
+from out_of_core import evaluate_streaming, train_streaming, training_report
+from pricing import NEUTRAL, pricing_section
+from profiling import MemoryTracker, measure
+from tlc import tlc_urls, trip_files
+from zone_demand import (HORIZON, TEST_DAYS, ZoneDemandForecaster, forecast_section,
+                         zone_hour_counts)
+from zone_index import load_zone_index
+
 warnings.filterwarnings('ignore')
 
 # Paths
@@ -27,407 +44,450 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 OUTPUT_DIR = os.path.join(BASE_DIR, "visualizations")
 MODEL_DIR = os.path.join(BASE_DIR, "models")
+ZONE_DEMAND_DIRNAME = "zone_demand"
 
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(MODEL_DIR, exist_ok=True)
+SAMPLE_SIZE = 500000
 
-# Data URLs (Official NYC TLC Data)
-URLS = {
-    "yellow_2024_01.parquet": "https://d37ci6vzurychx.cloudfront.net/trip-data/yellow_tripdata_2024-01.parquet",
-    "fhvhv_2024_01.parquet": "https://d37ci6vzurychx.cloudfront.net/trip-data/fhvhv_tripdata_2024-01.parquet",
-    "taxi_zone_lookup.csv": "https://d37ci6vzurychx.cloudfront.net/misc/taxi+_zone_lookup.csv"
-}
+# Model girdileri; inference.py aynı sırayla özellik vektörü kurar
+TIP_FEATURES = ['trip_distance', 'fare_amount', 'hour', 'day_of_week',
+                'is_weekend', 'is_rush_hour', 'is_night', 'passenger_count']
+DEMAND_FEATURES = ['hour', 'day_of_week', 'is_weekend', 'is_rush_hour']
+TIP_PARAMS = dict(n_estimators=50, max_depth=5, learning_rate=0.1, random_state=42, n_jobs=-1)
+DEMAND_PARAMS = dict(n_estimators=50, max_depth=8, random_state=42, n_jobs=-1)
 
-def download_data_if_not_exists():
-    print("\n[0/8] Veri kontrolü ve indirme...")
-    for filename, url in URLS.items():
-        filepath = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(filepath):
-            print(f"  İndiriliyor: {filename} (Bu işlem internet hızınıza göre zaman alabilir)...")
-            try:
-                response = requests.get(url, stream=True)
-                response.raise_for_status()
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"  ✅ İndirildi: {filepath}")
-            except Exception as e:
-                print(f"  ❌ Hata: {filename} indirilemedi. {str(e)}")
-                raise
-        else:
-            print(f"  ✅ Mevcut: {filename}")
+# main_analysis.py doğrudan çalıştırıldığında koşan aşamalar (süre modeli advanced_models.py'de)
+ANALYSIS_STAGES = ['load', 'clean', 'aggregate', 'train_tip', 'train_demand', 'zone_demand', 'segments', 'save']
 
-print("=" * 60)
-print("NYC Urban Mobility Intelligence Platform")
-print("=" * 60)
+# analysis_results.json bölüm sırası
+RESULT_KEYS = ['summary_stats', 'hourly_demand', 'daily_demand', 'borough_analysis', 'market_share',
+               'profitable_locations', 'tip_analysis', 'airport_analysis', 'nightlife_analysis', 'ml_results']
+
+# Birden fazla aşamanın katkı verdiği bölümler birleştirilir, diğerleri üzerine yazılır
+MERGED_KEYS = ('tip_analysis', 'ml_results')
 
-# 0. DOWNLOAD DATA
-download_data_if_not_exists()
 
 # =============================================================================
-# 1. DATA LOADING (Optimized - Only needed columns)
+# 0. DOWNLOAD DATA
 # =============================================================================
-print("\n[1/8] Veriler yükleniyor (optimize edilmiş)...")
-
-# Yellow Taxi - sadece gerekli sütunlar
-yellow_cols = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'passenger_count',
-               'trip_distance', 'PULocationID', 'DOLocationID', 'fare_amount', 
-               'tip_amount', 'tolls_amount', 'payment_type']
-
-yellow_jan = pq.read_table(f"{DATA_DIR}/yellow_2024_01.parquet", columns=yellow_cols).to_pandas()
-print(f"  Ocak verisi yüklendi: {len(yellow_jan):,} kayıt")
-
-# Sample for memory efficiency
-yellow_df = yellow_jan.sample(n=min(500000, len(yellow_jan)), random_state=42)
-del yellow_jan
-gc.collect()
-
-# FHV - sadece gerekli sütunlar ve sample
-fhv_cols = ['hvfhs_license_num', 'pickup_datetime', 'dropoff_datetime', 
-            'PULocationID', 'DOLocationID', 'trip_miles', 'trip_time']
-
-fhvhv_full = pq.read_table(f"{DATA_DIR}/fhvhv_2024_01.parquet", columns=fhv_cols).to_pandas()
-fhvhv_df = fhvhv_full.sample(n=min(500000, len(fhvhv_full)), random_state=42)
-fhv_total_count = len(fhvhv_full)
-del fhvhv_full
-gc.collect()
-
-# Taxi Zone Lookup
-zones_df = pd.read_csv(f"{DATA_DIR}/taxi_zone_lookup.csv")
+def load(months, data_dir=DATA_DIR, base_url=None, download_workers=4, verify=False):
+    """Eksik TLC dosyalarını indirir; ayların [(yol, kaynak)] listesini döndürür."""
+    print("\n[0/8] Veri kontrolü ve indirme...")
+    download_files(tlc_urls(months, base_url), data_dir, workers=download_workers, verify=verify)
+    return trip_files(data_dir, months)
 
-print(f"  Yellow Taxi sample: {len(yellow_df):,}")
-print(f"  FHV sample: {len(fhvhv_df):,}")
 
 # =============================================================================
+# 1. DATA LOADING (Optimized - Only needed columns)
 # 2. DATA CLEANING & FEATURE ENGINEERING
 # =============================================================================
-print("\n[2/8] Veri temizleme ve özellik mühendisliği...")
-
-def clean_yellow_taxi(df):
-    df = df.copy()
-    df = df[(df['fare_amount'] > 0) & (df['fare_amount'] < 500)]
-    df = df[(df['trip_distance'] > 0) & (df['trip_distance'] < 100)]
-    df = df[(df['passenger_count'] > 0) & (df['passenger_count'] <= 6)]
-    df = df[df['tip_amount'] >= 0]
-    
-    df['pickup_datetime'] = pd.to_datetime(df['tpep_pickup_datetime'])
-    df['dropoff_datetime'] = pd.to_datetime(df['tpep_dropoff_datetime'])
-    df['hour'] = df['pickup_datetime'].dt.hour
-    df['day_of_week'] = df['pickup_datetime'].dt.dayofweek
-    df['day_name'] = df['pickup_datetime'].dt.day_name()
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    df['is_rush_hour'] = df['hour'].isin([7, 8, 9, 17, 18, 19]).astype(int)
-    df['is_night'] = df['hour'].isin([22, 23, 0, 1, 2, 3, 4]).astype(int)
-    
-    df['trip_duration'] = (df['dropoff_datetime'] - df['pickup_datetime']).dt.total_seconds() / 60
-    df = df[(df['trip_duration'] > 1) & (df['trip_duration'] < 180)]
-    
-    df['avg_speed'] = df['trip_distance'] / (df['trip_duration'] / 60)
-    df = df[(df['avg_speed'] > 0) & (df['avg_speed'] < 60)]
-    
-    df['tip_percentage'] = (df['tip_amount'] / df['fare_amount'] * 100).clip(0, 100)
-    df['total_fare'] = df['fare_amount'] + df['tip_amount'] + df['tolls_amount']
-    
-    return df
-
-def clean_fhvhv(df):
-    df = df.copy()
-    df = df[df['trip_miles'] > 0]
-    df = df[df['trip_time'] > 0]
-    
-    df['pickup_datetime'] = pd.to_datetime(df['pickup_datetime'])
-    df['hour'] = df['pickup_datetime'].dt.hour
-    df['day_of_week'] = df['pickup_datetime'].dt.dayofweek
-    df['day_name'] = df['pickup_datetime'].dt.day_name()
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-    df['is_rush_hour'] = df['hour'].isin([7, 8, 9, 17, 18, 19]).astype(int)
-    df['is_night'] = df['hour'].isin([22, 23, 0, 1, 2, 3, 4]).astype(int)
-    
-    df['company'] = df['hvfhs_license_num'].map({
-        'HV0003': 'Uber', 'HV0005': 'Lyft', 'HV0004': 'Via', 'HV0002': 'Juno'
-    }).fillna('Other')
-    
-    return df
-
-yellow_clean = clean_yellow_taxi(yellow_df)
-fhvhv_clean = clean_fhvhv(fhvhv_df)
-
-del yellow_df, fhvhv_df
-gc.collect()
-
-print(f"  Temizlenmiş Yellow Taxi: {len(yellow_clean):,}")
-print(f"  Temizlenmiş FHV: {len(fhvhv_clean):,}")
-
-# Zone bilgilerini ekle
-yellow_clean = yellow_clean.merge(
-    zones_df[['LocationID', 'Borough', 'Zone']], 
-    left_on='PULocationID', right_on='LocationID', how='left'
-).rename(columns={'Borough': 'PU_Borough', 'Zone': 'PU_Zone'})
-
-fhvhv_clean = fhvhv_clean.merge(
-    zones_df[['LocationID', 'Borough', 'Zone']], 
-    left_on='PULocationID', right_on='LocationID', how='left'
-).rename(columns={'Borough': 'PU_Borough', 'Zone': 'PU_Zone'})
+def _first_month(files):
+    raw = {}
+    for path, source in files:
+        raw.setdefault(source, path)
+    return raw['yellow'], raw['fhv']
+
+
+def clean(files, stream=False, use_cache=True, batch_size=1_000_000, workers=None, sample_size=SAMPLE_SIZE):
+    """Temizlenmiş örneklemler, OLAP küpü ve quantile özetleri: {'yellow', 'fhv', 'cube', 'sketches'}.
+
+    'cube' bir TripCube, 'sketches' bir TripSketches'tir. İkisi de akış modunda tüm dosyalardan,
+    diğer modlarda ilk ayın örnekleminden oluşturulur.
+    """
+    cube = sketches = None
+    if stream:
+        print(f"\n[1/8] Veriler akışla işleniyor ({len(files) // 2} ay, row group bazında, paralel)...")
+
+        # Tablolar %100 veriden, modeller ise dosya/batch başına alınan örneklemden beslenir
+        with measure('clean.aggregate_files') as m:
+            builder, sketches, samples = aggregate_files(files, batch_size=batch_size, sample_size=sample_size,
+                                                         workers=workers, use_cache=use_cache)
+            yellow_clean, fhvhv_clean = samples['yellow'], samples['fhv']
+            cube = builder.finish(load_zone_index(os.path.dirname(os.path.abspath(files[0][0]))))
+            m.rows_out = cube.total
+        yellow_total = int(cube.query(provider='Yellow', measures=['trips'])['trips'].iloc[0])
+
+        print("\n[2/8] Veri temizleme ve özellik mühendisliği (batch başına)...")
+        print(f"  Temizlenmiş Yellow Taxi: {yellow_total:,} (model örneklemi: {len(yellow_clean):,})")
+        print(f"  Temizlenmiş FHV: {cube.total - yellow_total:,} (model örneklemi: {len(fhvhv_clean):,})")
+    elif use_cache:
+        print("\n[1/8] Veriler yükleniyor (temizlenmiş özellik önbelleği)...")
+
+        yellow_raw, fhv_raw = _first_month(files)
+        for raw_path, source in [(yellow_raw, 'yellow'), (fhv_raw, 'fhv')]:
+            status = "önbellekte" if cached_feature_file(raw_path, source) else "oluşturuluyor"
+            print(f"  {os.path.basename(raw_path)}: {status}")
+        with measure('clean.ensure_features'):
+            yellow_features = ensure_features(yellow_raw, 'yellow', batch_size)
+            fhv_features = ensure_features(fhv_raw, 'fhv', batch_size)
+
+        # Sample for memory efficiency - ham satır sayısına göre aynı oran
+        yellow_rows = raw_rows(yellow_features)
+        fhv_total_count = raw_rows(fhv_features)
+        with measure('clean.load_features', rows_in=yellow_rows + fhv_total_count) as m:
+            yellow_clean = load_features(yellow_features, frac=sample_size / max(yellow_rows, 1), random_state=42)
+            fhvhv_clean = load_features(fhv_features, frac=sample_size / max(fhv_total_count, 1), random_state=42)
+            m.rows_out = len(yellow_clean) + len(fhvhv_clean)
+        print(f"  {os.path.basename(yellow_raw)} / {os.path.basename(fhv_raw)}: "
+              f"{yellow_rows:,} Yellow / {fhv_total_count:,} FHV kayıt")
+
+        print("\n[2/8] Veri temizleme ve özellik mühendisliği (önbellekten)...")
+        print(f"  Temizlenmiş Yellow Taxi: {len(yellow_clean):,}")
+        print(f"  Temizlenmiş FHV: {len(fhvhv_clean):,}")
+    else:
+        print("\n[1/8] Veriler yükleniyor (optimize edilmiş)...")
+
+        yellow_raw, fhv_raw = _first_month(files)
+        yellow_rows = pq.ParquetFile(yellow_raw).metadata.num_rows
+        fhv_total_count = pq.ParquetFile(fhv_raw).metadata.num_rows
+
+        # Sınır filtreleri Parquet okuyucusuna iletilir; pandas'a yalnızca geçen satırlar çevrilir
+        with measure('clean.read_raw.yellow', rows_in=yellow_rows) as m:
+            yellow_jan = read_raw(yellow_raw, 'yellow')
+            m.rows_out = len(yellow_jan)
+        print(f"  {os.path.basename(yellow_raw)} yüklendi: {len(yellow_jan):,} / {yellow_rows:,} kayıt filtreden geçti")
+
+        # Sample for memory efficiency - ham satır sayısına göre aynı oran
+        yellow_df = yellow_jan.sample(frac=min(sample_size / max(yellow_rows, 1), 1.0), random_state=42)
+        del yellow_jan
+        gc.collect()
+
+        # FHV - sadece gerekli sütunlar ve sample
+        with measure('clean.read_raw.fhv', rows_in=fhv_total_count) as m:
+            fhvhv_full = read_raw(fhv_raw, 'fhv')
+            m.rows_out = len(fhvhv_full)
+        fhvhv_df = fhvhv_full.sample(frac=min(sample_size / max(fhv_total_count, 1), 1.0), random_state=42)
+        del fhvhv_full
+        gc.collect()
+
+        print(f"  Yellow Taxi sample: {len(yellow_df):,}")
+        print(f"  FHV sample: {len(fhvhv_df):,}")
+
+        print("\n[2/8] Veri temizleme ve özellik mühendisliği...")
+
+        with measure('clean.clean_yellow_taxi', rows_in=len(yellow_df)) as m:
+            yellow_clean = clean_yellow_taxi(yellow_df)
+            m.rows_out = len(yellow_clean)
+        with measure('clean.clean_fhvhv', rows_in=len(fhvhv_df)) as m:
+            fhvhv_clean = clean_fhvhv(fhvhv_df)
+            m.rows_out = len(fhvhv_clean)
+
+        # Zone bilgilerini ekle
+        with measure('clean.zone_columns', rows_in=len(yellow_clean) + len(fhvhv_clean)) as m:
+            zone_index = load_zone_index(os.path.dirname(os.path.abspath(yellow_raw)))
+            yellow_clean = apply_compact_schema(add_zone_columns(yellow_clean, zone_index))
+            fhvhv_clean = apply_compact_schema(add_zone_columns(fhvhv_clean, zone_index))
+            m.rows_out = len(yellow_clean) + len(fhvhv_clean)
+
+        del yellow_df, fhvhv_df
+        gc.collect()
+
+        print(f"  Temizlenmiş Yellow Taxi: {len(yellow_clean):,}")
+        print(f"  Temizlenmiş FHV: {len(fhvhv_clean):,}")
+
+    if cube is None:
+        # Tüm tablo bölümleri için tek geçişte küp ve özetler (akış modunda batch'lerle birlikte oluşur)
+        # Birden çok işçide çerçeveler paylaşılan bellekteki TripStore üzerinden dilimlenir
+        with measure('clean.cube', rows_in=len(yellow_clean) + len(fhvhv_clean)) as m:
+            builder, sketches = aggregate_frames({'yellow': yellow_clean, 'fhv': fhvhv_clean}, workers)
+            cube = builder.finish(load_zone_index(os.path.dirname(os.path.abspath(files[0][0]))))
+            m.rows_out = len(cube)
+
+    # Kompakt şema sonrası bellek kullanımı (pandas varsayılan tiplerine göre)
+    memory_report('yellow_clean', yellow_clean)
+    memory_report('fhvhv_clean', fhvhv_clean)
+
+    return {'yellow': yellow_clean, 'fhv': fhvhv_clean, 'cube': cube, 'sketches': sketches}
 
-# =============================================================================
-# 3. ANALYSIS
-# =============================================================================
-print("\n[3/8] Keşifsel Veri Analizi (EDA)...")
-
-results = {
-    'summary_stats': {},
-    'hourly_demand': {},
-    'daily_demand': {},
-    'borough_analysis': {},
-    'market_share': {},
-    'profitable_locations': {},
-    'tip_analysis': {},
-    'airport_analysis': {},
-    'nightlife_analysis': {},
-    'ml_results': {}
-}
-
-# Özet istatistikler
-results['summary_stats'] = {
-    'yellow_taxi': {
-        'total_trips': int(len(yellow_clean)),
-        'avg_fare': round(float(yellow_clean['fare_amount'].mean()), 2),
-        'avg_distance': round(float(yellow_clean['trip_distance'].mean()), 2),
-        'avg_duration': round(float(yellow_clean['trip_duration'].mean()), 2),
-        'avg_tip_pct': round(float(yellow_clean['tip_percentage'].mean()), 2),
-        'total_revenue': round(float(yellow_clean['total_fare'].sum()), 2)
-    },
-    'fhv': {
-        'total_trips': int(len(fhvhv_clean)),
-        'uber_trips': int((fhvhv_clean['company'] == 'Uber').sum()),
-        'lyft_trips': int((fhvhv_clean['company'] == 'Lyft').sum()),
-        'avg_distance': round(float(fhvhv_clean['trip_miles'].mean()), 2),
-        'avg_duration': round(float(fhvhv_clean['trip_time'].mean() / 60), 2)
-    }
-}
-
-# Saatlik talep
-hourly_yellow = yellow_clean.groupby('hour').size().reset_index(name='trips')
-hourly_fhv = fhvhv_clean.groupby('hour').size().reset_index(name='trips')
-
-results['hourly_demand'] = {
-    'yellow_taxi': hourly_yellow.to_dict('records'),
-    'fhv': hourly_fhv.to_dict('records')
-}
-
-# Günlük talep
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-daily_yellow = yellow_clean.groupby('day_name').size()
-daily_yellow = daily_yellow.reindex(day_order).reset_index(name='trips')
-daily_fhv = fhvhv_clean.groupby('day_name').size()
-daily_fhv = daily_fhv.reindex(day_order).reset_index(name='trips')
-
-results['daily_demand'] = {
-    'yellow_taxi': daily_yellow.to_dict('records'),
-    'fhv': daily_fhv.to_dict('records')
-}
-
-# Borough analizi
-borough_yellow = yellow_clean.groupby('PU_Borough').agg({
-    'fare_amount': ['count', 'mean', 'sum'],
-    'tip_percentage': 'mean',
-    'trip_distance': 'mean'
-}).round(2)
-borough_yellow.columns = ['trips', 'avg_fare', 'total_revenue', 'avg_tip_pct', 'avg_distance']
-borough_yellow = borough_yellow.reset_index()
-
-borough_fhv = fhvhv_clean.groupby('PU_Borough').size().reset_index(name='trips')
-
-results['borough_analysis'] = {
-    'yellow_taxi': borough_yellow.to_dict('records'),
-    'fhv': borough_fhv.to_dict('records')
-}
 
 # =============================================================================
+# 3. ANALYSIS
 # 4. MARKET SHARE
-# =============================================================================
-print("\n[4/8] Pazar payı analizi...")
-
-hourly_market = pd.DataFrame({
-    'hour': range(24),
-    'yellow_taxi': hourly_yellow['trips'].values,
-    'fhv': hourly_fhv['trips'].values
-})
-hourly_market['yellow_pct'] = (hourly_market['yellow_taxi'] / 
-    (hourly_market['yellow_taxi'] + hourly_market['fhv']) * 100).round(1)
-hourly_market['fhv_pct'] = (hourly_market['fhv'] / 
-    (hourly_market['yellow_taxi'] + hourly_market['fhv']) * 100).round(1)
-
-total_yellow = len(yellow_clean)
-total_fhv = len(fhvhv_clean)
-
-results['market_share'] = {
-    'hourly': hourly_market.to_dict('records'),
-    'overall': {
-        'yellow_taxi_pct': round(total_yellow / (total_yellow + total_fhv) * 100, 1),
-        'fhv_pct': round(total_fhv / (total_yellow + total_fhv) * 100, 1)
-    },
-    'uber_vs_lyft': {
-        'uber_pct': round((fhvhv_clean['company'] == 'Uber').mean() * 100, 1),
-        'lyft_pct': round((fhvhv_clean['company'] == 'Lyft').mean() * 100, 1)
-    }
-}
-
-# =============================================================================
 # 5. PROFITABLE LOCATIONS
 # =============================================================================
-print("\n[5/8] Karlı lokasyonlar analizi...")
-
-profitable_zones = yellow_clean.groupby(['PU_Borough', 'PU_Zone']).agg({
-    'total_fare': ['mean', 'sum', 'count'],
-    'tip_percentage': 'mean',
-    'trip_distance': 'mean'
-}).round(2)
-profitable_zones.columns = ['avg_fare', 'total_revenue', 'trip_count', 'avg_tip_pct', 'avg_distance']
-profitable_zones = profitable_zones.reset_index()
-profitable_zones = profitable_zones[profitable_zones['trip_count'] >= 50]
-profitable_zones = profitable_zones.sort_values('avg_fare', ascending=False)
-
-profitable_hours = yellow_clean.groupby('hour').agg({
-    'total_fare': 'mean',
-    'tip_percentage': 'mean'
-}).round(2).reset_index()
-
-results['profitable_locations'] = {
-    'top_zones': profitable_zones.head(20).to_dict('records'),
-    'profitable_hours': profitable_hours.to_dict('records')
-}
+def aggregate(cleaned, zone_index):
+    """Özet, talep, borough, pazar payı, karlı lokasyon ve ortalama bahşiş bölümleri.
+
+    Hepsi clean aşamasının OLAP küpüne karşı sabit sorgulardır; veri yeniden taranmaz.
+    Quantile ve tekil rota alanları aynı aşamanın özetlerinden (sketches) okunur.
+    """
+    print("\n[3/8] Keşifsel Veri Analizi (EDA)...")
+    print("\n[4/8] Pazar payı analizi...")
+    print("\n[5/8] Karlı lokasyonlar analizi...")
+    cube = cleaned['cube']
+    with measure('aggregate.rollup', rows_in=len(cube)):
+        yellow, fhv = TripAggregates.from_cube(cube, 'yellow'), TripAggregates.from_cube(cube, 'fhv')
+    with measure('aggregate.summary_sections', rows_in=len(cube)):
+        return summary_sections(yellow, fhv, zone_index, cleaned.get('sketches'))
+
 
 # =============================================================================
 # 6. TIP PREDICTION MODEL
 # =============================================================================
-print("\n[6/8] Bahşiş tahmin modeli...")
-
-tip_features = ['trip_distance', 'fare_amount', 'hour', 'day_of_week', 
-                'is_weekend', 'is_rush_hour', 'is_night', 'passenger_count']
-
-tip_df = yellow_clean[tip_features + ['tip_percentage']].dropna()
-tip_df = tip_df[tip_df['tip_percentage'] > 0]
-tip_sample = tip_df.sample(n=min(50000, len(tip_df)), random_state=42)
-
-X_tip = tip_sample[tip_features]
-y_tip = tip_sample['tip_percentage']
-
-X_train, X_test, y_train, y_test = train_test_split(X_tip, y_tip, test_size=0.2, random_state=42)
-
-tip_model = xgb.XGBRegressor(n_estimators=50, max_depth=5, learning_rate=0.1, random_state=42, n_jobs=-1)
-tip_model.fit(X_train, y_train)
-
-tip_pred = tip_model.predict(X_test)
-tip_mae = mean_absolute_error(y_test, tip_pred)
-tip_r2 = r2_score(y_test, tip_pred)
-
-tip_importance = pd.DataFrame({
-    'feature': tip_features,
-    'importance': tip_model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-results['tip_analysis'] = {
-    'model_performance': {'mae': round(tip_mae, 2), 'r2_score': round(tip_r2, 3)},
-    'feature_importance': tip_importance.to_dict('records'),
-    'avg_tip_by_hour': {int(k): round(v, 2) for k, v in yellow_clean.groupby('hour')['tip_percentage'].mean().to_dict().items()},
-    'avg_tip_by_day': {k: round(v, 2) for k, v in yellow_clean.groupby('day_name')['tip_percentage'].mean().to_dict().items()}
-}
+def tip_rows(df):
+    """Bahşiş modelinin satırları: özellikleri eksiksiz ve bahşişi pozitif seyahatler -> (X, y)."""
+    df = df[TIP_FEATURES + ['tip_percentage']].dropna()
+    df = df[df['tip_percentage'] > 0]
+    return df[TIP_FEATURES], df['tip_percentage']
+
+
+def train_tip(yellow_clean, model_dir=MODEL_DIR, months=None, incremental=False, files=None, out_of_core=None):
+    """Bahşiş modeli; artımlı modda kayıtlı booster'a yalnızca yeni ayların satırlarıyla ağaç eklenir.
+
+    out_of_core ('external' / 'quantile') verilirse örneklem yerine files'daki ayların özellik
+    önbelleğinin tamamıyla, akışla eğitilir (out_of_core.py).
+    """
+    print("\n[6/8] Bahşiş tahmin modeli...")
+
+    tip_features = TIP_FEATURES
+    model_path = f"{model_dir}/tip_prediction_model.joblib"
+    if out_of_core:
+        yellow = {file_month(path) or path: path for path, source in files if source == 'yellow'}
+        months = list(yellow)
+    months = months or data_months(yellow_clean['pickup_datetime'])
+    previous, manifest, fit_months = resume(model_path, tip_features, months, incremental)
+    up_to_date = previous is not None and not fit_months
+    training = None
+
+    if out_of_core:
+        paths = [ensure_features(yellow[month], 'yellow') for month in (months if up_to_date else fit_months)]
+        tip_model = previous
+        if not up_to_date:
+            tip_model, training = train_streaming('train_tip', TIP_PARAMS, paths, TIP_FEATURES + ['tip_percentage'],
+                                                  tip_rows, tip_features, out_of_core, previous)
+        scores = evaluate_streaming('train_tip', {'model': tip_model.predict}, paths,
+                                    TIP_FEATURES + ['tip_percentage'], tip_rows)['model']
+        tip_mae, tip_r2 = scores['mae'], scores['r2']
+        train_rows = training['rows'] if training else 0
+    else:
+        if previous is not None and fit_months:
+            yellow_clean = yellow_clean[np.isin(timestamp_months(yellow_clean['pickup_datetime']), fit_months)]
+        X_tip, y_tip = tip_rows(yellow_clean)
+        sample = X_tip.sample(n=min(50000, len(X_tip)), random_state=42).index
+
+        X_train, X_test, y_train, y_test = train_test_split(X_tip.loc[sample], y_tip.loc[sample],
+                                                            test_size=0.2, random_state=42)
+
+        if up_to_date:
+            # Model bu ayları zaten görmüş; yalnızca değerlendirilir
+            tip_model = previous
+        else:
+            tip_model = xgb.XGBRegressor(**TIP_PARAMS)
+            with measure('train_tip.fit', rows_in=len(X_train)) as m, MemoryTracker() as tracker:
+                tip_model.fit(X_train, y_train, xgb_model=previous.get_booster() if previous is not None else None)
+            training = training_report('in_memory', len(X_train), m, tracker)
+
+        with measure('train_tip.predict', rows_in=len(X_test)):
+            tip_pred = tip_model.predict(X_test)
+        tip_mae = mean_absolute_error(y_test, tip_pred)
+        tip_r2 = r2_score(y_test, tip_pred)
+        train_rows = len(X_train)
+
+    tip_importance = pd.DataFrame({
+        'feature': tip_features,
+        'importance': tip_model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    if not up_to_date:
+        os.makedirs(model_dir, exist_ok=True)
+        joblib.dump(tip_model, model_path)
+        manifest = record(model_path, 'tip', tip_features, fit_months, train_rows,
+                          tip_model.get_booster().num_boosted_rounds(), manifest, previous is not None)
+    print(f"  Bahşiş modeli - MAE: {tip_mae:.2f}%, R²: {tip_r2:.3f} (v{manifest['version']}, {len(manifest['months'])} ay)")
+    if training:
+        print(f"  Eğitim ({training['mode']}): {training['rows']:,} satır, {training['rows_per_s']:,.0f} satır/sn, "
+              f"tepe RSS {training['peak_rss_mb']} MB")
+
+    return {
+        'tip_analysis': {
+            'model_performance': {'mae': round(tip_mae, 2), 'r2_score': round(tip_r2, 3)},
+            'feature_importance': tip_importance.to_dict('records')
+        },
+        'ml_results': {
+            'tip_prediction': {
+                'mae': round(tip_mae, 2),
+                'r2_score': round(tip_r2, 3),
+                'training': training
+            }
+        }
+    }
 
-joblib.dump(tip_model, f"{MODEL_DIR}/tip_prediction_model.joblib")
-print(f"  Bahşiş modeli - MAE: {tip_mae:.2f}%, R²: {tip_r2:.3f}")
 
 # =============================================================================
 # 7. DEMAND PREDICTION
 # =============================================================================
-print("\n[7/8] Talep tahmin modeli...")
-
-demand_df = yellow_clean.groupby([
-    yellow_clean['pickup_datetime'].dt.date, 'hour'
-]).agg({'fare_amount': 'count', 'is_weekend': 'first', 'is_rush_hour': 'first'}).reset_index()
-demand_df.columns = ['date', 'hour', 'trip_count', 'is_weekend', 'is_rush_hour']
-demand_df['day_of_week'] = pd.to_datetime(demand_df['date']).dt.dayofweek
-
-demand_features = ['hour', 'day_of_week', 'is_weekend', 'is_rush_hour']
-X_d = demand_df[demand_features]
-y_d = demand_df['trip_count']
-
-X_train_d, X_test_d, y_train_d, y_test_d = train_test_split(X_d, y_d, test_size=0.2, random_state=42)
-
-demand_model = RandomForestRegressor(n_estimators=50, max_depth=8, random_state=42, n_jobs=-1)
-demand_model.fit(X_train_d, y_train_d)
+def hourly_demand(yellow_path):
+    """Ayın tamamından (örneklem değil) tarih × saat seyahat sayıları; yalnızca pickup_datetime okunur.
+
+    Dosyanın kendi ayı dışındaki başıboş tarihler atılır; böylece farklı çalıştırmalardaki aylar
+    aynı ölçekte (gerçek seyahat sayısı) birleşir.
+    """
+    month = np.datetime64(file_month(yellow_path) or 'NaT', 'M')
+    counts = None
+    for df in iter_feature_batches(ensure_features(yellow_path, 'yellow'), columns=['pickup_datetime']):
+        pickup = df['pickup_datetime'].to_numpy().astype('datetime64[h]')
+        if not np.isnat(month):
+            pickup = pickup[pickup.astype('datetime64[M]') == month]
+        hours, batch_counts = np.unique(pickup, return_counts=True)
+        batch = pd.Series(batch_counts, index=hours)
+        counts = batch if counts is None else counts.add(batch, fill_value=0)
+    counts = counts if counts is not None else pd.Series(dtype=np.int64)
+    stamps = pd.DatetimeIndex(counts.index)
+    features = time_features(stamps)
+    return pd.DataFrame({'date': stamps.date, 'hour': features['hour'], 'trip_count': counts.to_numpy(np.int64),
+                         'day_of_week': features['day_of_week'], 'is_weekend': features['is_weekend'],
+                         'is_rush_hour': features['is_rush_hour']})
+
+
+def train_demand(files, model_dir=MODEL_DIR, incremental=False):
+    """Tarih × saat talep modeli; artımlı modda kayıtlı ormana yalnızca yeni aylardan ağaç eklenir."""
+    print("\n[7/8] Talep tahmin modeli...")
+
+    demand_features = DEMAND_FEATURES
+    model_path = f"{model_dir}/demand_prediction_model.joblib"
+    yellow = {file_month(path) or path: path for path, source in files if source == 'yellow'}
+    previous, manifest, fit_months = resume(model_path, demand_features, list(yellow), incremental)
+    up_to_date = previous is not None and not fit_months
+
+    paths = list(yellow.values()) if up_to_date else [yellow[month] for month in fit_months]
+    with measure('train_demand.counts', rows_in=sum(raw_rows(ensure_features(path, 'yellow')) for path in paths)) as m:
+        demand_df = pd.concat([hourly_demand(path) for path in paths], ignore_index=True)
+        m.rows_out = len(demand_df)
+
+    X_d = demand_df[demand_features]
+    y_d = demand_df['trip_count']
+
+    X_train_d, X_test_d, y_train_d, y_test_d = train_test_split(X_d, y_d, test_size=0.2, random_state=42)
+
+    if up_to_date:
+        demand_model = previous
+    elif previous is not None:
+        # warm_start: mevcut ağaçlar korunur, yeni ayların verisiyle 50 ağaç eklenir
+        demand_model = previous
+        demand_model.set_params(warm_start=True, n_estimators=previous.n_estimators + 50)
+    else:
+        demand_model = RandomForestRegressor(**DEMAND_PARAMS, warm_start=True)
+    if not up_to_date:
+        with measure('train_demand.fit', rows_in=len(X_train_d)):
+            demand_model.fit(X_train_d, y_train_d)
+
+    with measure('train_demand.predict', rows_in=len(X_test_d)):
+        demand_pred = demand_model.predict(X_test_d)
+    demand_mae = mean_absolute_error(y_test_d, demand_pred)
+    demand_r2 = r2_score(y_test_d, demand_pred)
+
+    if not up_to_date:
+        os.makedirs(model_dir, exist_ok=True)
+        joblib.dump(demand_model, model_path)
+        manifest = record(model_path, 'demand', demand_features, fit_months, len(X_train_d),
+                          len(demand_model.estimators_), manifest, previous is not None)
+    print(f"  Talep modeli - MAE: {demand_mae:.0f}, R²: {demand_r2:.3f} (v{manifest['version']}, {len(manifest['months'])} ay)")
+
+    return {
+        'ml_results': {
+            'demand_prediction': {
+                'mae': round(demand_mae, 0),
+                'r2_score': round(demand_r2, 3),
+                'feature_importance': {f: round(v, 3) for f, v in zip(demand_features, demand_model.feature_importances_)}
+            }
+        }
+    }
 
-demand_pred = demand_model.predict(X_test_d)
-demand_mae = mean_absolute_error(y_test_d, demand_pred)
-demand_r2 = r2_score(y_test_d, demand_pred)
 
-results['ml_results']['demand_prediction'] = {
-    'mae': round(demand_mae, 0),
-    'r2_score': round(demand_r2, 3),
-    'feature_importance': {f: round(v, 3) for f, v in zip(demand_features, demand_model.feature_importances_)}
-}
+def zone_demand(files, zone_index=None, model_dir=MODEL_DIR):
+    """Alış zone'u × saat talep tahmini (zone_demand.py); ayların tamamından, Yellow ve FHV birlikte."""
+    print("\n[zone_demand] Zone bazında saatlik talep tahmini (Yellow + FHV)...")
+    with measure('zone_demand.counts', rows_in=sum(raw_rows(ensure_features(path, source))
+                                                   for path, source in files)) as m:
+        counts, start = zone_hour_counts(files)
+        m.rows_out = counts.size
+    with measure('zone_demand.fit', rows_in=counts.size) as m:
+        forecaster = ZoneDemandForecaster.train(counts, start)
+        m.rows_in = forecaster.meta['train_rows']
+    forecaster.save(os.path.join(model_dir, ZONE_DEMAND_DIRNAME))
+    with measure('zone_demand.predict', rows_in=forecaster.history.shape[0] * forecaster.history.shape[1] * HORIZON):
+        section = forecast_section(forecaster, zone_index)
+
+    evaluation = section['evaluation']
+    print(f"  {section['train_rows']:,} eğitim satırı, {section['fit_s']:.1f} s")
+    print(f"  Son {TEST_DAYS} gün - MAE: {evaluation['model']['mae']:.2f} seyahat/saat "
+          f"(dün aynı saat: {evaluation['naive_lag_24h']['mae']:.2f}, "
+          f"geçen hafta: {evaluation['naive_lag_168h']['mae']:.2f}), WMAPE: {evaluation['model']['wmape']:.1%}")
+    print(f"  Sonraki 24 saat (tüm zone'lar): {section['next_24h']['forecast_ms']:.1f} ms")
+    return {'ml_results': {'zone_demand': section}}
+
+
+def pricing(cleaned, zone_index):
+    """Surge ve congestion pricing senaryo taraması (pricing.py); clean aşamasının küpünden."""
+    print("\n[pricing] Dinamik fiyatlama ve congestion pricing simülasyonu...")
+    cube = cleaned['cube']
+    with measure('pricing.simulate', rows_in=len(cube)) as m:
+        section = pricing_section(cube, zone_index)
+        m.rows_out = section['pricing_simulation']['scenarios']
+
+    result = section['pricing_simulation']
+    print(f"  {result['scenarios']:,} senaryo, {result['simulate_s']:.2f} s ({result['scenarios_per_s']:,} senaryo/s)")
+    fee = next((row for row in result['congestion_fee']
+                if row['congestion_fee'] == 1.5 and row['elasticity'] == NEUTRAL['elasticity']), None)
+    if fee is not None:
+        print(f"  1.50$ congestion fee: ücret bölgesinde {fee['fee_zone_change_pct']:+.1f}% seyahat, "
+              f"günlük {fee['fee_revenue']:,.0f}$ gelir")
+    return section
 
-joblib.dump(demand_model, f"{MODEL_DIR}/demand_prediction_model.joblib")
-print(f"  Talep modeli - MAE: {demand_mae:.0f}, R²: {demand_r2:.3f}")
 
 # =============================================================================
 # 8. SPECIAL SEGMENTS
 # =============================================================================
-print("\n[8/8] Özel segment analizleri...")
-
-# Havalimanı
-airport_zones = [1, 132, 138]
-airport_trips = yellow_clean[
-    (yellow_clean['PULocationID'].isin(airport_zones)) | 
-    (yellow_clean['DOLocationID'].isin(airport_zones))
-]
-
-airport_hourly = airport_trips.groupby('hour').agg({
-    'fare_amount': ['count', 'mean'], 'tip_percentage': 'mean'
-}).round(2)
-airport_hourly.columns = ['trip_count', 'avg_fare', 'avg_tip']
-airport_hourly = airport_hourly.reset_index()
-
-results['airport_analysis'] = {
-    'total_trips': int(len(airport_trips)),
-    'avg_fare': round(float(airport_trips['fare_amount'].mean()), 2),
-    'avg_tip_pct': round(float(airport_trips['tip_percentage'].mean()), 2),
-    'hourly_demand': airport_hourly.to_dict('records'),
-    'pct_of_total': round(len(airport_trips) / len(yellow_clean) * 100, 2)
-}
-
-# Gece hayatı
-nightlife_trips = yellow_clean[yellow_clean['is_night'] == 1]
-nightlife_zones = nightlife_trips.groupby(['PU_Borough', 'PU_Zone']).size().reset_index(name='trips')
-nightlife_zones = nightlife_zones.sort_values('trips', ascending=False)
-
-weekend_night = nightlife_trips[nightlife_trips['is_weekend'] == 1]
-weekday_night = nightlife_trips[nightlife_trips['is_weekend'] == 0]
-
-results['nightlife_analysis'] = {
-    'total_night_trips': int(len(nightlife_trips)),
-    'pct_of_total': round(len(nightlife_trips) / len(yellow_clean) * 100, 2),
-    'top_nightlife_zones': nightlife_zones.head(15).to_dict('records'),
-    'weekend_vs_weekday': {
-        'weekend_trips': int(len(weekend_night)),
-        'weekday_trips': int(len(weekday_night)),
-        'weekend_avg_fare': round(float(weekend_night['fare_amount'].mean()), 2) if len(weekend_night) > 0 else 0,
-        'weekday_avg_fare': round(float(weekday_night['fare_amount'].mean()), 2) if len(weekday_night) > 0 else 0
-    },
-    'hourly_distribution': {int(k): int(v) for k, v in nightlife_trips.groupby('hour').size().to_dict().items()}
-}
+def segments(cleaned, zone_index):
+    """Havalimanı ve gece hayatı bölümleri (küpün segment ve saat dilimleri)."""
+    print("\n[8/8] Özel segment analizleri...")
+    cube = cleaned['cube']
+    with measure('segments.rollup', rows_in=len(cube)):
+        yellow = TripAggregates.from_cube(cube, 'yellow')
+    with measure('segments.segment_sections', rows_in=len(cube)):
+        return segment_sections(yellow, zone_index, cleaned.get('sketches'))
+
 
 # =============================================================================
 # SAVE
 # =============================================================================
-print("\n" + "=" * 60)
-print("Sonuçlar kaydediliyor...")
-
-with open(f"{OUTPUT_DIR}/analysis_results.json", 'w') as f:
-    json.dump(results, f, indent=2, default=str)
-
-print(f"\n✅ Analiz tamamlandı!")
-print(f"📁 Sonuçlar: {OUTPUT_DIR}/analysis_results.json")
-print(f"🤖 Modeller: {MODEL_DIR}/")
-print("=" * 60)
+def save(sections, output_dir=OUTPUT_DIR, sketches=None):
+    """Aşama çıktılarını (bölüm sözlükleri) analysis_results.json'a yazar.
+
+    Mevcut dosya okunur ve yalnızca bu çalıştırmada üretilen bölümler değiştirilir; böylece
+    main_analysis.py ve advanced_models.py (ya da --stages ile kısmi çalıştırmalar) art arda
+    çalıştırıldığında birbirinin bölümlerini silmez. tip_analysis ve ml_results birden fazla
+    aşamadan gelir ve anahtar bazında birleştirilir. sketches verilirse yanına sketches.npz
+    olarak yazılır (sonraki aylarla birleştirilebilir).
+    """
+    print("\n" + "=" * 60)
+    print("Sonuçlar kaydediliyor...")
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = f"{output_dir}/analysis_results.json"
+    results = {key: {} for key in RESULT_KEYS}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            results.update(json.load(f))
+
+    for section in sections:
+        # JSON'dan okunan bölümlerle aynı anahtar tipleri (ör. saatler str) için normalize et
+        section = json.loads(json.dumps(section, default=str))
+        for key, value in section.items():
+            if key in MERGED_KEYS:
+                results[key] = {**results[key], **value}
+            else:
+                results[key] = value
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+    if sketches is not None:
+        print(f"📁 Quantile özetleri: {sketches.save(os.path.join(output_dir, SKETCH_FILE))}")
+
+    return path
+
+
+if __name__ == '__main__':
+    from pipeline import main
+    main(default_stages=ANALYSIS_STAGES)
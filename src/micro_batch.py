@@ -0,0 +1,302 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Micro-Batch Ingestion - iniş klasöründeki yeni seyahat dosyalarıyla özetleri artımlı güncelleyen canlı mod
+
+    python src/micro_batch.py data/landing --interval 5                    # klasörü izle
+    python src/micro_batch.py data/landing --once                          # yeni dosyaları işle ve çık
+    python src/micro_batch.py data/landing --bootstrap data/stages/clean   # aylık çalışmanın küpünden başla
+    python src/synthetic.py --rows 20000 --months 2024-05 --output data/landing   # yerel deneme
+
+İniş klasörüne düşen her Parquet / CSV dosyası (yazan taraf geçici adla yazıp yeniden adlandırmalıdır;
+.tmp / .part içeren adlar beklenir) pipeline ile aynı kurallarla temizlenir (feature_store.clean_batch).
+Yalnızca bu batch kalıcı TripAggregates sayaçlarına (saat × gün × PU zone × segment; count / sum /
+sum-of-squares) ve TripSketches özetlerine eklenir, yani güncelleme maliyeti batch boyutuyla orantılıdır.
+Özet, talep, borough, pazar payı, karlı lokasyon, havalimanı ve gece hayatı bölümleri sabit boyutlu
+sayaçlardan yeniden türetilir ve analysis_results.json'daki karşılıklarının yerine atomik olarak yazılır;
+model bölümleri korunur.
+
+Durum dizini (varsayılan data/live/):
+
+    state.npz               sayaçlar + işlenen dosyaların listesi (meta); yazımın tamamlandığı nokta
+    sketches-<nesil>.npz    state.npz'nin işaret ettiği özetler
+
+state.npz en son yazılır; yarıda kalan bir güncellemede dosya bir sonraki turda yeniden işlenir,
+iki kez sayılmaz. İşlenen dosyalar değişmez kabul edilir: aynı adla farklı içerik uyarıyla atlanır.
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pyarrow.dataset as ds
+
+from aggregates import SOURCES, TripAggregates, aggregate_sections
+from feature_store import clean_batch, raw_format, scan_raw
+from main_analysis import DATA_DIR, MERGED_KEYS, OUTPUT_DIR
+from profiling import measure
+from sketches import SKETCH_FILE, TripSketches
+from tlc import FILE_PREFIX, ZONE_LOOKUP_FILE
+from trip_cube import TripCube
+from zone_index import load_zone_index
+
+STATE_VERSION = 1
+STATE_FILE = "state.npz"
+LIVE_DIRNAME = "live"
+RESULTS_FILE = "analysis_results.json"
+
+EXTENSIONS = ('.parquet', '.csv')
+# Yazımı süren dosyalar: yazan taraf bitince yeniden adlandırır
+PARTIAL_MARKERS = ('.tmp', '.part')
+# Kaynağı ayırt eden ham sütunlar (dosya adı tanınmazsa)
+SOURCE_COLUMNS = {'yellow': 'tpep_pickup_datetime', 'fhv': 'hvfhs_license_num'}
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def detect_source(path):
+    """Dosya adı önekinden (yellow_ / fhvhv_), yoksa sütunlardan kaynak; tanınmazsa None."""
+    name = os.path.basename(path)
+    for source, prefix in FILE_PREFIX.items():
+        if name.startswith(f"{prefix}_"):
+            return source
+    columns = set(ds.dataset(path, format=raw_format(path)).schema.names)
+    return next((source for source, column in SOURCE_COLUMNS.items() if column in columns), None)
+
+
+def landed_files(landing_dir, settle=1.0):
+    """İniş klasöründeki tamamlanmış trip dosyaları (son değişiklikten en az settle saniye geçmiş)."""
+    now = time.time()
+    paths = []
+    for path in sorted(glob.glob(os.path.join(landing_dir, '*'))):
+        name = os.path.basename(path)
+        if (not os.path.isfile(path) or name.startswith(('.', '_')) or name == ZONE_LOOKUP_FILE
+                or not name.lower().endswith(EXTENSIONS) or any(marker in name for marker in PARTIAL_MARKERS)):
+            continue
+        if now - os.path.getmtime(path) >= settle:
+            paths.append(path)
+    return paths
+
+
+class LiveAggregates:
+    """Kalıcı çalışan özetler: kaynak başına TripAggregates, TripSketches ve işlenen dosyalar."""
+
+    def __init__(self, aggregates=None, sketches=None, files=None, origin=None):
+        self.aggregates = aggregates or {source: TripAggregates(source) for source in SOURCES}
+        self.sketches = sketches or TripSketches()
+        self.files = files or {}
+        self.origin = origin
+
+    @property
+    def rows(self):
+        return sum(agg.total for agg in self.aggregates.values())
+
+    @classmethod
+    def from_stage(cls, clean_dir, zone_index):
+        """Aylık çalışmanın clean aşamasından (küp + özetler) başlangıç durumu."""
+        cube = TripCube.open(os.path.join(clean_dir, 'cube'), zone_index)
+        return cls({source: TripAggregates.from_cube(cube, source) for source in SOURCES},
+                   TripSketches.open(os.path.join(clean_dir, SKETCH_FILE)),
+                   origin={'path': os.path.abspath(clean_dir), 'rows': cube.total})
+
+    # ------------------------------------------------------------------ güncelleme
+    def update(self, df, source):
+        self.aggregates[source].update(df)
+        self.sketches.update(df, source)
+        return self
+
+    def ingest(self, path, data_dir, batch_size=1_000_000):
+        """Tek dosyanın temizlenmiş satırlarını sayaçlara ekler; dosya kaydını döndürür.
+
+        Dosya önce ayrı bir delta'ya (TripAggregates + TripSketches) okunur ve yalnızca tamamı
+        okunduğunda kalıcı sayaçlarla birleştirilir: yarıda hata veren dosya durumu değiştirmez.
+        """
+        source = detect_source(path)
+        record = {'source': source, **fingerprint(path), 'rows_out': 0, 'ingested': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        if source is None:
+            record['ignored'] = "kaynak tanınmadı"
+            return record
+        started = time.perf_counter()
+        delta = LiveAggregates()
+        for batch in scan_raw(path, source, batch_size).to_batches():
+            if batch.num_rows:
+                df = clean_batch(batch.to_pandas(), source, data_dir)
+                delta.update(df, source)
+                record['rows_out'] += len(df)
+        self.aggregates[source].merge(delta.aggregates[source])
+        self.sketches.merge(delta.sketches)
+        record['ingest_s'] = round(time.perf_counter() - started, 3)
+        return record
+
+    def pending(self, paths):
+        """Henüz işlenmemiş dosyalar; aynı adla değişmiş içerik bir kez uyarılıp atlanır.
+
+        Okunamayan (kaydında 'error' olan) dosya değişmedikçe yeniden denenmez, değişirse denenir.
+        """
+        new = []
+        for path in paths:
+            name = os.path.basename(path)
+            seen = self.files.get(name)
+            if seen is None:
+                new.append(path)
+            elif 'error' in seen:
+                if {key: seen.get(key) for key in ('size', 'mtime_ns')} != fingerprint(path):
+                    new.append(path)
+            elif {key: seen.get(key) for key in ('size', 'mtime_ns')} != fingerprint(path) and not seen.get('changed'):
+                print(f"  ⚠️ {name}: daha önce işlenmiş dosya değişmiş, atlandı (yeni veriyi yeni adla bırakın)")
+                seen['changed'] = True
+        return new
+
+    # ------------------------------------------------------------------ kalıcılık
+    def save(self, state_dir):
+        """Önce yeni nesil özetler, sonra onları işaret eden state.npz (atomik); eski nesil silinir."""
+        os.makedirs(state_dir, exist_ok=True)
+        sketch_file = f"sketches-{uuid.uuid4().hex[:12]}.npz"
+        # Her turda yeniden yazıldığı için sıkıştırılmaz (sıkıştırma yazımın büyük kısmını alır)
+        self.sketches.save(os.path.join(state_dir, sketch_file), compressed=False)
+        meta = {'version': STATE_VERSION, 'sketches': sketch_file, 'files': self.files, 'origin': self.origin,
+                'updated': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        arrays = {}
+        for source, agg in self.aggregates.items():
+            arrays[f"{source}_count"], arrays[f"{source}_sums"] = agg.count, agg.sums
+            if agg.sumsq is not None:
+                # Küpten başlatılan durumda kareler toplamı bilinmez; sıfır diye kaydedilmez
+                arrays[f"{source}_sumsq"] = agg.sumsq
+        tmp = os.path.join(state_dir, f"{STATE_FILE}.tmp.npz")
+        np.savez(tmp, meta=json.dumps(meta), **arrays)
+        os.replace(tmp, os.path.join(state_dir, STATE_FILE))
+        for stale in glob.glob(os.path.join(state_dir, "sketches-*.npz")):
+            if os.path.basename(stale) != sketch_file:
+                os.remove(stale)
+        return state_dir
+
+    @classmethod
+    def open(cls, state_dir):
+        with np.load(os.path.join(state_dir, STATE_FILE)) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['version'] != STATE_VERSION:
+                raise ValueError(f"Canlı durum sürümü desteklenmiyor: {meta['version']} ({state_dir})")
+            aggregates = {}
+            for source in SOURCES:
+                agg = TripAggregates(source)
+                agg.count, agg.sums = data[f"{source}_count"], data[f"{source}_sums"]
+                agg.sumsq = data[f"{source}_sumsq"] if f"{source}_sumsq" in data.files else None
+                aggregates[source] = agg
+        return cls(aggregates, TripSketches.open(os.path.join(state_dir, meta['sketches'])), meta['files'],
+                   meta.get('origin'))
+
+    # ------------------------------------------------------------------ sonuçlar
+    def sections(self, zone_index):
+        """Tablo bölümleri + live_ingestion; bölümler iki kaynak da veri içerdiğinde türetilir (pay / oranlar)."""
+        sections = {}
+        if all(agg.total > 0 for agg in self.aggregates.values()):
+            sections = aggregate_sections(self.aggregates['yellow'], self.aggregates['fhv'], zone_index, self.sketches)
+        ingested = [{'file': name, **record} for name, record in self.files.items()
+                    if 'ignored' not in record and 'error' not in record]
+        sections['live_ingestion'] = {
+            'files': len(ingested),
+            'errors': [{'file': name, 'error': record['error']} for name, record in self.files.items()
+                       if 'error' in record],
+            'rows': self.rows,
+            'rows_by_source': {source: agg.total for source, agg in self.aggregates.items()},
+            'bootstrap': self.origin,
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'last_files': sorted(ingested, key=lambda r: r['ingested'])[-5:],
+        }
+        return sections
+
+
+def write_results(path, sections):
+    """analysis_results.json'daki bölümleri günceller (model bölümleri korunur); .tmp + os.replace."""
+    results = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            results = json.load(f)
+    section = json.loads(json.dumps(sections, default=str))
+    for key, value in section.items():
+        results[key] = {**results.get(key, {}), **value} if key in MERGED_KEYS else value
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(tmp, path)
+    return path
+
+
+def run_once(live, landing_dir, state_dir, output, data_dir, batch_size=1_000_000, settle=1.0):
+    """Yeni dosyaları işler; en az biri geldiyse durumu ve sonuç dosyasını yazar. İşlenen dosya sayısı."""
+    paths = live.pending(landed_files(landing_dir, settle))
+    if not paths:
+        return 0
+    zone_index = load_zone_index(data_dir)
+    started = time.perf_counter()
+    for path in paths:
+        try:
+            with measure('live.ingest') as m:
+                record = live.ingest(path, data_dir, batch_size)
+                m.rows_out = record['rows_out']
+        except Exception as e:
+            # Okunamayan tek dosya izlemeyi durdurmaz; kaydedilir ve değişmedikçe yeniden denenmez
+            record = {'source': None, **fingerprint(path), 'rows_out': 0,
+                      'ingested': time.strftime('%Y-%m-%dT%H:%M:%S'), 'error': f"{type(e).__name__}: {e}"}
+        live.files[os.path.basename(path)] = record
+        if 'error' in record:
+            print(f"  ❌ {os.path.basename(path)}: okunamadı ({record['error']}), atlandı")
+        elif 'ignored' in record:
+            print(f"  ⚠️ {os.path.basename(path)}: {record['ignored']}, atlandı")
+        else:
+            print(f"  + {os.path.basename(path)} ({record['source']}): {record['rows_out']:,} satır, "
+                  f"{record['ingest_s']:.2f} s")
+    with measure('live.publish', rows_in=live.rows):
+        write_results(output, live.sections(zone_index))
+        live.save(state_dir)
+    print(f"  ⏱ {len(paths)} dosya, toplam {live.rows:,} seyahat; güncelleme {time.perf_counter() - started:.2f} s "
+          f"-> {output}")
+    return len(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="İniş klasöründeki yeni seyahat dosyalarıyla özetleri artımlı güncelle")
+    parser.add_argument('landing', help="izlenecek iniş klasörü (Parquet / CSV)")
+    parser.add_argument('--state', default=os.path.join(DATA_DIR, LIVE_DIRNAME), help="kalıcı durum dizini")
+    parser.add_argument('--output', default=os.path.join(OUTPUT_DIR, RESULTS_FILE), help="güncellenecek sonuç dosyası")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="taxi_zone_lookup.csv'nin bulunduğu dizin")
+    parser.add_argument('--bootstrap', default=None,
+                        help="durum yoksa aylık çalışmanın clean aşamasından başla (ör. data/stages/clean)")
+    parser.add_argument('--interval', type=float, default=5.0, help="klasör tarama aralığı (saniye)")
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help="dosyanın işlenmesi için son değişiklikten sonra beklenecek süre (saniye)")
+    parser.add_argument('--batch-size', type=int, default=1_000_000, help="dosya içi Arrow batch boyutu (satır)")
+    parser.add_argument('--once', action='store_true', help="bekleyen dosyaları işle ve çık")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(os.path.join(args.state, STATE_FILE)):
+        live = LiveAggregates.open(args.state)
+        print(f"↺ Canlı durum: {args.state} ({live.rows:,} seyahat, {len(live.files)} dosya)")
+    elif args.bootstrap:
+        live = LiveAggregates.from_stage(args.bootstrap, load_zone_index(args.data_dir))
+        print(f"↺ Başlangıç: {args.bootstrap} ({live.rows:,} seyahat)")
+    else:
+        live = LiveAggregates()
+
+    os.makedirs(args.landing, exist_ok=True)
+    print(f"👀 {args.landing} izleniyor" + ("" if args.once else f" ({args.interval:g} s aralıkla, Ctrl+C ile çıkış)"))
+    try:
+        while True:
+            run_once(live, args.landing, args.state, args.output, args.data_dir, args.batch_size,
+                     0.0 if args.once else args.settle)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nDurduruldu.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Model Manifest - her model dosyasının hangi aylarla eğitildiğini tutan sürümlü manifest
+
+    models/tip_prediction_model.manifest.json
+    {"manifest_version": 1, "model": "tip", "file": "tip_prediction_model.joblib", "version": 3,
+     "features": [...], "months": ["2024-01", "2024-02", "2024-03"], "rows": 1200000,
+     "updates": [{"version": 1, "mode": "full", "months": ["2024-01"], "rows": 400000, "size": 50, ...}, ...]}
+
+Artımlı modda (pipeline.py --incremental) yalnızca manifestte olmayan aylarla eğitilir ve model
+kaydedilen halinden devam eder (XGBoost: ek boosting turları, Random Forest: ek ağaçlar).
+Manifest ya da model yoksa veya özellik listesi değiştiyse tam eğitime düşülür.
+"""
+
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from tlc import parse_trip_filename
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(model_path):
+    return f"{os.path.splitext(model_path)[0]}.manifest.json"
+
+
+def file_month(path):
+    """'yellow_2024_01.parquet' -> '2024-01'; tanınmayan adlar için None."""
+    parsed = parse_trip_filename(path)
+    return None if parsed is None else f"{parsed[1]}-{parsed[2]:02d}"
+
+
+def timestamp_months(timestamps):
+    """Zaman damgası dizisinin ayları ('YYYY-MM' dizisi)."""
+    return np.datetime_as_string(np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[M]'))
+
+
+def data_months(timestamps, min_share=0.01):
+    """Örneklemin kapsadığı aylar; TLC dosyalarındaki birkaç başıboş tarih (ör. 2008-12) sayılmaz."""
+    months, counts = np.unique(timestamp_months(timestamps), return_counts=True)
+    return [str(month) for month, count in zip(months, counts) if count >= min_share * counts.sum()]
+
+
+def load_manifest(model_path):
+    path = manifest_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('manifest_version') == MANIFEST_VERSION else None
+
+
+def resume(model_path, features, months, incremental):
+    """(önceki model ya da None, manifest, eğitilecek aylar).
+
+    Önceki model yalnızca artımlı modda ve manifest modelle uyumluysa döner; eğitilecek aylar
+    o durumda manifestte olmayanlardır (boş olabilir: model güncel).
+    """
+    manifest = load_manifest(model_path)
+    if not incremental:
+        return None, manifest, list(months)
+    name = os.path.basename(model_path)
+    if manifest is None or not os.path.exists(model_path):
+        print(f"  {name}: manifest yok, tam eğitim")
+        return None, manifest, list(months)
+    if manifest['features'] != list(features):
+        print(f"  {name}: özellik listesi değişmiş, tam eğitim")
+        return None, manifest, list(months)
+    new_months = [month for month in months if month not in manifest['months']]
+    print(f"  {name}: v{manifest['version']} ({len(manifest['months'])} ay) + yeni aylar: "
+          f"{', '.join(new_months) or 'yok'}")
+    return joblib.load(model_path), manifest, new_months
+
+
+def record(model_path, name, features, months, rows, size, previous=None, incremental=False):
+    """Model kaydedildikten sonra manifesti günceller; tam eğitim ay listesini sıfırlar."""
+    version = (previous['version'] if previous else 0) + 1
+    seen = list(previous['months']) if previous and incremental else []
+    seen += [month for month in months if month not in seen]
+    update = {'version': version, 'mode': 'incremental' if incremental else 'full', 'months': list(months),
+              'rows': int(rows), 'size': int(size), 'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    manifest = {
+        'manifest_version': MANIFEST_VERSION,
+        'model': name,
+        'file': os.path.basename(model_path),
+        'version': version,
+        'features': list(features),
+        'months': sorted(seen),
+        'rows': int(rows) + (previous['rows'] if previous and incremental else 0),
+        'updates': (previous['updates'] if previous else []) + [update],
+    }
+    path = manifest_path(model_path)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return manifest
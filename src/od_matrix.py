@@ -0,0 +1,304 @@
+"""
+NYC Urban Mobility Intelligence Platform
+OD Matrix - zone'dan zone'a (alış, bırakış, saat) süre / mesafe / hız matrisi
+
+Her (alış zone'u, bırakış zone'u, saat) hücresi seyahat sayısını ve süre (p50, p90, dakika),
+mesafe (p50, mil) ve hız (p50, mph) yüzdeliklerini tutar; son saat dilimi (ALL_HOURS) çiftin
+saatten bağımsız değerleridir. Matris ayın bütün Yellow Taxi seyahatlerinden örneklem olmadan
+kurulur: her batch hücre başına sabit kutulu histogramlara eklenir ve atılır (ODBuilder), yani
+bellek seyahat sayısıyla değil dolu (hücre, kutu) sayısıyla sınırlıdır; aylar histogramlar
+toplanarak birleşir. Sonuç .npy sütunları olarak yazılır ve mmap ile açılır.
+Arama tabanlı ETA ve süre modelinin özellikleri (od_*) buradan gelir.
+
+    python src/od_matrix.py data/stages/od_matrix/od --pu 132 --do 230 --hour 17 --distance 14.2
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from feature_store import iter_feature_batches
+from zone_index import N_ZONES
+
+OD_VERSION = 3
+OD_META = "od.json"
+
+HOURS = 24
+ALL_HOURS = HOURS  # saatten bağımsız (tüm gün) dilimi
+SHAPE = (N_ZONES, N_ZONES, HOURS + 1)
+SIZE = int(np.prod(SHAPE))
+GROUPS = SIZE + HOURS  # hücreler + saatin şehir geneli
+
+# Yüzdelikler ölçü başına sabit, geometrik aralıklı histogramlardan okunur (kutu genişliği
+# süre ~%2, mesafe ~%3.7, hız ~%3); aralık temizleme kurallarını kapsar, dışı uç kutulara düşer
+BINS = 256
+RANGES = {'duration': (1.0, 180.0), 'distance': (0.01, 100.0), 'speed': (0.1, 200.0)}
+EDGES = {source: np.geomspace(lo, hi, BINS + 1) for source, (lo, hi) in RANGES.items()}
+COMPACT_KEYS = 4_000_000  # bekleyen anahtar sayısı bunu geçince birleştirilir
+
+# Ölçü -> (kaynak değer, yüzdelik)
+MEASURES = {
+    'duration_p50': ('duration', 0.5),
+    'duration_p90': ('duration', 0.9),
+    'distance_p50': ('distance', 0.5),
+    'speed_p50': ('speed', 0.5),
+}
+COLUMNS = ['PULocationID', 'DOLocationID', 'hour', 'trip_distance', 'trip_duration']
+
+# Bundan az seyahatli hücrelerde değer bir üst düzeyden alınır: tüm gün çift değeri, o da
+# yetersizse saatin şehir geneli değeri
+MIN_TRIPS = 5
+
+# Süre modeline eklenen arama özellikleri
+OD_FEATURES = ['od_duration_p50', 'od_speed_p50']
+
+
+def zone_ids(values):
+    """LocationID -> matris indeksi; aralık dışı kimlikler 0 (bilinmeyen) hücresine düşer."""
+    ids = np.asarray(values).astype(np.intp)
+    return np.where((ids > 0) & (ids < N_ZONES), ids, 0)
+
+
+def trip_values(df):
+    """Çerçeve -> (saatlik hücre kodu, {'duration', 'distance', 'speed'}) dizileri."""
+    pu = zone_ids(df['PULocationID'])
+    do = zone_ids(df['DOLocationID'])
+    hour = df['hour'].to_numpy(np.int64)
+    duration = df['trip_duration'].to_numpy(np.float32)
+    distance = df['trip_distance'].to_numpy(np.float32)
+    codes = ((pu * N_ZONES + do) * SHAPE[2] + hour).astype(np.int32)
+    return codes, {'duration': duration, 'distance': distance,
+                   'speed': (distance / (duration / np.float32(60))).astype(np.float32)}
+
+
+def value_bins(source, values):
+    """Değer -> RANGES aralığında geometrik kutu indeksi; aralık dışı değerler uç kutulara düşer."""
+    lo, hi = RANGES[source]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = np.log(np.asarray(values, dtype=np.float64) / lo) / np.log(hi / lo) * BINS
+    return np.clip(np.nan_to_num(position, nan=0, posinf=BINS - 1, neginf=0), 0, BINS - 1).astype(np.int64)
+
+
+def _reduce(keys, counts=None):
+    """(grup × kutu) anahtarlarını sıralı tekil anahtarlar ve toplam sayılarına indirger."""
+    if counts is None:
+        keys, counts = np.unique(keys, return_counts=True)
+        return keys, counts.astype(np.int64)
+    if len(keys) == 0:
+        return keys, counts
+    order = np.argsort(keys, kind='stable')
+    keys, counts = keys[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts, starts)
+
+
+def histogram_quantiles(source, keys, counts, quantiles):
+    """Sıralı (grup × kutu) histogramından grup başına yüzdelikler (np.percentile 'linear' tanımı).
+
+    Grup içinde k. sıradaki değer, bulunduğu kutuda sırasına göre geometrik olarak yerleştirilir;
+    hata kutu genişliğiyle sınırlıdır.
+    """
+    if len(keys) == 0:
+        return keys, counts, [np.empty(0, dtype=np.float32) for _ in quantiles]
+    groups, bins = keys // BINS, keys % BINS
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    cum = np.cumsum(counts)
+    before = cum[starts] - counts[starts]
+    totals = cum[ends - 1] - before
+    edges = EDGES[source]
+
+    def ranked(rank):
+        i = np.clip(np.searchsorted(cum, before + rank, side='right'), starts, ends - 1)
+        within = np.clip((before + rank - (cum[i] - counts[i]) + 0.5) / counts[i], 0, 1)
+        low, high = edges[bins[i]], edges[bins[i] + 1]
+        return low * (high / low) ** within
+
+    result = []
+    for q in quantiles:
+        position = q * (totals - 1)
+        below = np.floor(position)
+        lower, upper = ranked(below), ranked(np.minimum(below + 1, totals - 1))
+        result.append((lower + (upper - lower) * (position - below)).astype(np.float32))
+    return groups[starts], totals, result
+
+
+class ODBuilder:
+    """Batch'lerden OD matrisi derler; `merge` ile aylar / süreçler arasında birleştirilebilir.
+
+    Ölçü başına durum (grup × kutu) anahtarları ve sayılarıdır; gruplar saatlik hücreler, tüm gün
+    çiftleri (ALL_HOURS) ve saatin şehir geneli (GROUPS'un son HOURS grubu) düzeyleridir. Durum
+    seyahat sayısıyla değil dolu kutu sayısıyla büyür (grup başına en fazla BINS).
+    """
+
+    def __init__(self):
+        self.keys = {source: np.empty(0, dtype=np.int64) for source in RANGES}
+        self.counts = {source: np.empty(0, dtype=np.int64) for source in RANGES}
+        self.rows = 0
+        self._pending = {source: [] for source in RANGES}
+        self._pending_keys = 0
+
+    def update(self, df):
+        if len(df) == 0:
+            return self
+        codes, values = trip_values(df)
+        codes = codes.astype(np.int64)
+        hours = codes % SHAPE[2]
+        groups = np.concatenate([codes, codes - hours + ALL_HOURS, SIZE + hours]) * BINS
+        for source in RANGES:
+            self._add(source, *_reduce(groups + np.tile(value_bins(source, values[source]), 3)))
+        self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        other.compact()
+        for source in RANGES:
+            self._add(source, other.keys[source], other.counts[source])
+        self.rows += other.rows
+        return self
+
+    def _add(self, source, keys, counts):
+        self._pending[source].append((keys, counts))
+        self._pending_keys += len(keys)
+        if self._pending_keys > COMPACT_KEYS:
+            self.compact()
+
+    def compact(self):
+        for source, parts in self._pending.items():
+            if parts:
+                parts = [(self.keys[source], self.counts[source])] + parts
+                self.keys[source], self.counts[source] = _reduce(np.concatenate([k for k, _ in parts]),
+                                                                 np.concatenate([c for _, c in parts]))
+        self._pending = {source: [] for source in RANGES}
+        self._pending_keys = 0
+        return self
+
+    def matrix(self):
+        """Histogramlardan yoğun SHAPE dizileri ve saatlik şehir geneli değerleri."""
+        self.compact()
+        trips = np.bincount(self.keys['duration'] // BINS, weights=self.counts['duration'], minlength=GROUPS)
+        arrays = {'trips': trips[:SIZE].astype(np.uint32).reshape(SHAPE)}
+        hourly = {}
+        for source in RANGES:
+            names = [name for name, (src, _) in MEASURES.items() if src == source]
+            groups, _, results = histogram_quantiles(source, self.keys[source], self.counts[source],
+                                                     [MEASURES[name][1] for name in names])
+            cells = groups < SIZE
+            for name, result in zip(names, results):
+                values = np.full(SIZE, np.nan, dtype=np.float32)
+                values[groups[cells]] = result[cells]
+                arrays[name] = values.reshape(SHAPE)
+                column = np.full(HOURS, np.nan, dtype=np.float32)
+                column[groups[~cells] - SIZE] = result[~cells]
+                hourly[name] = [None if np.isnan(v) else round(float(v), 4) for v in column]
+
+        meta = {'version': OD_VERSION, 'shape': list(SHAPE), 'trips': int(self.rows),
+                'cells': int(np.count_nonzero(arrays['trips'][:, :, :HOURS])),
+                'measures': list(MEASURES), 'bins': BINS, 'min_trips': MIN_TRIPS, 'hourly': hourly}
+        return ODMatrix(arrays, meta)
+
+
+class ODMatrix:
+    """SHAPE boyutlu yoğun diziler: 'trips' ve MEASURES; indeksler doğrudan LocationID ve saattir."""
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        # Saatin şehir geneli değerleri (son düzey yedek)
+        self.hourly = {name: np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+                       for name, values in meta['hourly'].items()}
+
+    @classmethod
+    def build(cls, frames):
+        """Çerçevelerden (ör. özellik önbelleği batch'leri) matris; batch'ler histogramlara eklenip atılır."""
+        builder = ODBuilder()
+        for df in frames:
+            builder.update(df)
+        return builder.matrix()
+
+    @classmethod
+    def from_files(cls, paths, batch_size=1_000_000):
+        """Temizlenmiş özellik dosyalarının (ör. aylar) tamamından; yalnızca gereken sütunlar okunur."""
+        return cls.build(df for path in paths for df in iter_feature_batches(path, batch_size, COLUMNS))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ['trips'] + list(MEASURES):
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(self.arrays[name]))
+        # Meta en son yazılır; yarıda kalan bir matris açılmaz
+        with open(os.path.join(path, OD_META), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        return path
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, OD_META), 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != OD_VERSION:
+            raise ValueError(f"OD matris sürümü desteklenmiyor: {meta['version']} ({path})")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ['trips'] + list(MEASURES)}
+        return cls(arrays, meta)
+
+    # ------------------------------------------------------------------ arama
+    def _index(self, pu, do, hour):
+        hour = np.asarray(hour).astype(np.intp)
+        if ((hour < 0) | (hour >= HOURS)).any():
+            raise ValueError(f"Saat 0-{HOURS - 1} aralığında olmalı")
+        return zone_ids(pu), zone_ids(do), hour
+
+    def _levels(self, pu, do, hour, min_trips):
+        """Hücre, tüm gün çifti ya da (ikisi de seyrekse) saat düzeyi maskeleri."""
+        trips = self.arrays['trips']
+        cell = trips[pu, do, hour] >= min_trips
+        pair = ~cell & (trips[pu, do, ALL_HOURS] >= min_trips)
+        return cell, pair, ~(cell | pair)
+
+    def lookup(self, measure, pu, do, hour, min_trips=MIN_TRIPS):
+        """Ölçünün değerleri; seyrek hücreler tüm gün çiftine, o da seyrekse saatin genel değerine düşer."""
+        pu, do, hour = self._index(pu, do, hour)
+        values = self.arrays[measure]
+        cell, pair, city = self._levels(pu, do, hour, min_trips)
+        result = np.where(cell, values[pu, do, hour], values[pu, do, ALL_HOURS]).astype(np.float32)
+        result[city] = self.hourly[measure][hour[city]]
+        return result
+
+    def eta(self, pu, do, hour, distance=None, min_trips=MIN_TRIPS):
+        """Arama tabanlı süre tahmini (dakika); seyrek çiftlerde mesafe / saatlik medyan hız."""
+        result = self.lookup('duration_p50', pu, do, hour, min_trips)
+        if distance is not None:
+            pu, do, hour = self._index(pu, do, hour)
+            city = self._levels(pu, do, hour, min_trips)[2]
+            distance = np.broadcast_to(np.asarray(distance, dtype=np.float32), result.shape)
+            result[city] = distance[city] / self.hourly['speed_p50'][hour[city]] * 60
+        return result
+
+    def features(self, pu, do, hour, min_trips=MIN_TRIPS):
+        """Süre modeli için {OD_FEATURES adı: dizi}."""
+        return {name: self.lookup(name[len('od_'):], pu, do, hour, min_trips) for name in OD_FEATURES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OD matris araması")
+    parser.add_argument('path', help="matris dizini (ör. data/stages/od_matrix/od)")
+    parser.add_argument('--pu', type=int, required=True, help="alış LocationID")
+    parser.add_argument('--do', type=int, required=True, help="bırakış LocationID")
+    parser.add_argument('--hour', type=int, nargs='+', default=list(range(HOURS)))
+    parser.add_argument('--distance', type=float, default=None, help="mil; seyrek çiftlerde ETA için")
+    args = parser.parse_args(argv)
+
+    od = ODMatrix.open(args.path)
+    hours = np.asarray(args.hour)
+    pu, do = np.full(len(hours), args.pu), np.full(len(hours), args.do)
+    print(f"{'saat':>4} {'seyahat':>8} {'p50 dk':>7} {'p90 dk':>7} {'mil':>6} {'mph':>6} {'ETA dk':>7}")
+    eta = od.eta(pu, do, hours, args.distance)
+    trips = od.arrays['trips'][pu, do, hours]
+    values = {name: od.lookup(name, pu, do, hours) for name in MEASURES}
+    for i, hour in enumerate(hours):
+        print(f"{hour:>4} {trips[i]:>8,} {values['duration_p50'][i]:>7.1f} {values['duration_p90'][i]:>7.1f} "
+              f"{values['distance_p50'][i]:>6.2f} {values['speed_p50'][i]:>6.1f} {eta[i]:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Out-of-Core Training - XGBoost modellerini Parquet özellik önbelleğinden akışla eğitme
+
+Eğitim verisi pandas'a tek seferde alınmaz. ParquetBatches (xgb.DataIter) önbellek dosyalarını
+record batch'ler halinde okur, modelin satır filtresini ve türetilmiş özelliklerini batch başına
+uygular ve XGBoost'a verir:
+
+    external   ExtMemQuantileDMatrix - nicelenmiş sayfalar geçici dizinde diskte tutulur
+    quantile   QuantileDMatrix       - aynı iterator bellekte ~1 bayt/özellik/satır matris kurar
+
+Test satırları satırın dosyadaki konumundan hash ile seçilir (batch boyutundan bağımsız,
+her geçişte aynı); değerlendirme de akışla, toplamlar üzerinden yapılır.
+"""
+
+import os
+import tempfile
+import zlib
+
+import numpy as np
+import xgboost as xgb
+
+from feature_store import iter_feature_batches
+from profiling import MemoryTracker, measure
+
+MEMORY_MODES = ('external', 'quantile')
+TEST_FRACTION = 0.2
+MAX_BIN = 256
+BATCH_SIZE = 1_000_000
+
+
+def holdout_rows(positions, seed, fraction=TEST_FRACTION):
+    """Satır konumu -> test kümesinde mi; çarpımsal hash ile deterministik."""
+    hashed = (positions.astype(np.uint64) * np.uint64(0x9E3779B1) + np.uint64(seed)) & np.uint64(0xFFFFFFFF)
+    return hashed < np.uint64(int(fraction * 2 ** 32))
+
+
+def file_holdout(path, positions, fraction=TEST_FRACTION):
+    """Önbellek dosyasındaki satır konumları -> test kümesinde mi (tohum dosya adından)."""
+    return holdout_rows(np.asarray(positions), zlib.crc32(os.path.basename(path).encode()), fraction)
+
+
+def split_batches(paths, columns, part=None, batch_size=BATCH_SIZE):
+    """Özellik önbelleği batch'leri; part 'train' / 'test' ise yalnızca o kısım, indeks dosyadaki konum."""
+    for path in paths:
+        offset = 0
+        for df in iter_feature_batches(path, batch_size, columns):
+            df.index = np.arange(offset, offset + len(df))
+            offset += len(df)
+            if part is not None:
+                df = df[file_holdout(path, df.index) == (part == 'test')]
+            if len(df):
+                yield df
+
+
+def batches(paths, columns, prepare, part, batch_size=BATCH_SIZE):
+    """(X, y) batch'leri; prepare(df) filtrelenmiş (X DataFrame, y Series) döndürür, indeks korunur."""
+    for df in split_batches(paths, columns, part, batch_size):
+        X, y = prepare(df)
+        if len(X):
+            yield X, y
+
+
+class ParquetBatches(xgb.DataIter):
+    """Özellik önbelleği dosyaları üzerinde XGBoost veri iterator'ı (eğitim kısmı)."""
+
+    def __init__(self, paths, columns, prepare, features, cache_prefix=None, batch_size=BATCH_SIZE):
+        super().__init__(cache_prefix=cache_prefix)
+        self.paths = paths
+        self.columns = columns
+        self.prepare = prepare
+        self.features = list(features)
+        self.batch_size = batch_size
+        self.rows = 0
+        self._batches = None
+
+    def reset(self):
+        self._batches = None
+
+    def next(self, input_data):
+        if self._batches is None:
+            # XGBoost veriyi birden çok kez geçer; satır sayısı her geçişte yeniden sayılır
+            self._batches = batches(self.paths, self.columns, self.prepare, 'train', self.batch_size)
+            self.rows = 0
+        for X, y in self._batches:
+            self.rows += len(X)
+            input_data(data=X[self.features].to_numpy(np.float32), label=y.to_numpy(np.float32),
+                       feature_names=self.features)
+            return True
+        return False
+
+
+def booster_params(params):
+    """XGBRegressor parametreleri -> (xgb.train parametreleri, tur sayısı); hist ve tüm çekirdekler."""
+    params = dict(params)
+    rounds = params.pop('n_estimators', 100)
+    names = {'learning_rate': 'eta', 'random_state': 'seed', 'n_jobs': 'nthread'}
+    native = {names.get(key, key): value for key, value in params.items()}
+    if native.get('nthread', -1) in (None, -1):
+        native['nthread'] = os.cpu_count()
+    native.update(tree_method='hist', max_bin=MAX_BIN)
+    native.setdefault('objective', 'reg:squarederror')
+    return native, rounds
+
+
+def training_report(mode, rows, measurement, tracker):
+    """ml_results'a yazılan eğitim ölçümleri: satır/sn ve eğitim sırasındaki tepe bellek."""
+    wall = measurement.wall
+    return {
+        'mode': mode,
+        'rows': int(rows),
+        'wall_s': round(wall, 3),
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None,
+        'peak_rss_mb': None if tracker.peak is None else round(tracker.peak / 1024 / 1024, 1),
+        'rss_growth_mb': None if tracker.growth is None else round(tracker.growth / 1024 / 1024, 1),
+    }
+
+
+def train_streaming(name, params, paths, columns, prepare, features, memory='external', previous=None,
+                    batch_size=BATCH_SIZE):
+    """Akışla eğitilmiş XGBRegressor ve eğitim ölçümleri; previous verilirse boosting ondan devam eder."""
+    if memory not in MEMORY_MODES:
+        raise ValueError(f"Bilinmeyen bellek modu: {memory} (seçenekler: {', '.join(MEMORY_MODES)})")
+    native, rounds = booster_params(params)
+    with tempfile.TemporaryDirectory(prefix="nyc-xgb-") as cache_dir:
+        with measure(f"{name}.out_of_core.fit") as m, MemoryTracker() as tracker:
+            iterator = ParquetBatches(paths, columns, prepare, features,
+                                      os.path.join(cache_dir, 'cache') if memory == 'external' else None,
+                                      batch_size)
+            if memory == 'external':
+                dtrain = xgb.ExtMemQuantileDMatrix(iterator, max_bin=MAX_BIN, nthread=native['nthread'])
+            else:
+                dtrain = xgb.QuantileDMatrix(iterator, max_bin=MAX_BIN, nthread=native['nthread'])
+            booster = xgb.train(native, dtrain, num_boost_round=rounds,
+                                xgb_model=previous.get_booster() if previous is not None else None)
+            m.rows_in = iterator.rows
+            del dtrain
+    model = xgb.XGBRegressor(**params)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model, training_report(f"out_of_core.{memory}", iterator.rows, m, tracker)
+
+
+def evaluate_streaming(name, predictors, paths, columns, prepare, batch_size=BATCH_SIZE):
+    """Test kısmında akışla MAE / RMSE / R²; predictors {ad: X -> tahmin} (ör. model ve taban çizgisi)."""
+    totals = {key: np.zeros(3) for key in predictors}  # mutlak hata, kare hata toplamı, satır
+    n, sum_y, sum_y2 = 0, 0.0, 0.0
+    with measure(f"{name}.out_of_core.predict") as m:
+        for X, y in batches(paths, columns, prepare, 'test', batch_size):
+            y = y.to_numpy(np.float64)
+            n += len(y)
+            sum_y += y.sum()
+            sum_y2 += np.square(y).sum()
+            for key, predict in predictors.items():
+                error = np.asarray(predict(X), dtype=np.float64) - y
+                totals[key] += (np.abs(error).sum(), np.square(error).sum(), len(y))
+        m.rows_in = n
+    total_ss = sum_y2 - sum_y ** 2 / n if n else 0.0
+    return {key: {'mae': abs_err / n if n else float('nan'),
+                  'rmse': float(np.sqrt(sq_err / n)) if n else float('nan'),
+                  'r2': 1 - sq_err / total_ss if total_ss > 0 else float('nan'),
+                  'rows': int(rows)}
+            for key, (abs_err, sq_err, rows) in totals.items()}
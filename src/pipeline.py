@@ -0,0 +1,402 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Pipeline - analiz aşamalarını tek tek ya da alt kümeler halinde çalıştıran komut satırı aracı
+
+Aşamalar: load, clean, aggregate, train_tip, train_demand, zone_demand, od_matrix, train_duration, tune,
+segments, pricing, save (tune yalnızca --stages ile istendiğinde çalışır).
+Her aşamanın çıktısı data/stages/<aşama>/ altına yazılır. İstenen bir aşamanın girdisi
+diskte güncelse oradan okunur; yoksa, farklı parametrelerle üretildiyse ya da kendi girdisi
+sonradan değiştiyse önce o aşama çalıştırılır.
+
+    python src/pipeline.py                                # tüm aşamalar
+    python src/pipeline.py --stages train_tip,save        # yalnızca bahşiş modeli + kayıt
+    python src/pipeline.py --stages segments,save --stream
+    python src/pipeline.py --months 2024-04 --incremental   # modelleri yeni ayla güncelle
+    python src/pipeline.py --months 2024-01:2024-06 --out-of-core   # modeller altı ayın tamamıyla
+    python src/pipeline.py --stages tune,save --tune-deadline 21600   # gece hiperparametre araması
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import pyarrow.parquet as pq
+
+import advanced_models
+import main_analysis
+import tuning
+from od_matrix import OD_META, OD_VERSION, ODMatrix
+from out_of_core import MEMORY_MODES
+from profiling import PROFILER, PROFILERS, format_measurement, performance_section, profile_to
+from sketches import SKETCH_FILE, TripSketches
+from tlc import DEFAULT_MONTHS, month_range
+from trip_cube import CUBE_META, TripCube
+from trip_store import STORE_SUFFIX, TripStore
+from zone_index import load_zone_index
+
+STAGES = ['load', 'clean', 'aggregate', 'train_tip', 'train_demand', 'zone_demand', 'od_matrix', 'train_duration',
+          'tune', 'segments', 'pricing', 'save']
+
+# Yalnızca --stages ile açıkça istendiğinde çalışan aşamalar (gece işi)
+OPTIONAL_STAGES = ('tune',)
+
+DEPENDENCIES = {
+    'load': [],
+    'clean': ['load'],
+    'aggregate': ['clean'],
+    'train_tip': ['clean', 'load'],
+    'train_demand': ['load'],
+    'zone_demand': ['load'],
+    'od_matrix': ['load'],
+    'train_duration': ['load', 'od_matrix'],
+    'tune': ['load'],
+    'segments': ['clean'],
+    'pricing': ['clean'],
+    'save': [],
+}
+
+# Aşamanın çıktısını etkileyen çalıştırma parametreleri (girdiler ayrıca izlenir)
+STAGE_PARAMS = {
+    'load': ('months',),
+    'clean': ('months', 'stream', 'no_cache', 'batch_size'),
+    'train_tip': ('incremental', 'out_of_core'),
+    'train_demand': ('incremental',),
+    'od_matrix': ('od_version',),
+    'train_duration': ('incremental', 'out_of_core'),
+    'tune': ('tune_models', 'tune_search', 'tune_trials', 'tune_rows'),
+}
+
+# Aşamanın diskteki çıktı dosyaları; biri eksikse (ör. eski sürümden kalan çıktı) aşama güncel sayılmaz
+STAGE_OUTPUTS = {
+    'load': ('files.json',),
+    'clean': ('yellow' + STORE_SUFFIX, 'fhv' + STORE_SUFFIX, os.path.join('cube', CUBE_META), SKETCH_FILE),
+    'od_matrix': (os.path.join('od', OD_META),),
+}
+
+# save'in birleştirdiği aşamalar; model bölümleri önce gelir (tip_analysis anahtar sırası)
+SECTION_STAGES = ['train_tip', 'train_demand', 'aggregate', 'segments', 'zone_demand', 'train_duration', 'tune',
+                  'pricing']
+
+STAGE_DIRNAME = "stages"
+META_FILE = "meta.json"
+
+
+class StageStore:
+    """data/stages/<aşama>/ altında aşama çıktıları ve meta.json (parametreler, sürüm, girdi sürümleri).
+
+    meta.json en son yazılır; yarıda kalan bir aşamanın çıktısı hiçbir zaman güncel sayılmaz.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, stage, name=''):
+        return os.path.join(self.root, stage, name)
+
+    def meta(self, stage):
+        path = self.path(stage, META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def begin(self, stage):
+        shutil.rmtree(self.path(stage), ignore_errors=True)
+        os.makedirs(self.path(stage))
+
+    def commit(self, stage, params, inputs, version=None, performance=None):
+        meta = {
+            'params': params,
+            'version': version or uuid.uuid4().hex,
+            'inputs': inputs,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'performance': performance or [],
+        }
+        tmp_path = self.path(stage, f"{META_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self.path(stage, META_FILE))
+        return meta
+
+    def is_fresh(self, stage, params):
+        meta = self.meta(stage)
+        if meta is None or meta['params'] != params[stage]:
+            return False
+        if not all(os.path.exists(self.path(stage, name)) for name in STAGE_OUTPUTS.get(stage, ('sections.json',))):
+            return False
+        for dep in DEPENDENCIES[stage]:
+            dep_meta = self.meta(dep)
+            if (dep_meta is None or meta['inputs'].get(dep) != dep_meta['version']
+                    or not self.is_fresh(dep, params)):
+                return False
+        return True
+
+
+def _files_version(files):
+    """load çıktısının sürümü ham dosyaların boyut/değişiklik zamanından üretilir; dosyalar
+    değişmedikçe load'u yeniden çalıştırmak sonraki aşamaları geçersiz kılmaz."""
+    parts = []
+    for path, source in files:
+        stat = os.stat(path)
+        parts.append(f"{path}:{source}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def _rows(stage, output):
+    """Aşama çıktısındaki satır sayısı (load: ham satırlar, clean: temizlenmiş örneklemler)."""
+    if stage == 'load':
+        return sum(pq.ParquetFile(path).metadata.num_rows for path, _ in output if os.path.exists(path))
+    if stage == 'clean':
+        return len(output['yellow']) + len(output['fhv'])
+    return None
+
+
+class Pipeline:
+    def __init__(self, args, data_dir=main_analysis.DATA_DIR):
+        self.args = args
+        self.data_dir = data_dir
+        self.store = StageStore(os.path.join(data_dir, STAGE_DIRNAME))
+        months = [f"{year}-{month:02d}" for year, month in args.months]
+        run_params = {
+            'months': months,
+            'stream': args.stream,
+            'no_cache': args.no_cache,
+            # Batch boyutu yalnızca akış modunda örneklemi etkiler
+            'batch_size': args.batch_size if args.stream else None,
+            'incremental': args.incremental,
+            'out_of_core': args.out_of_core,
+            'tune_models': args.tune_models,
+            'tune_search': args.tune_search,
+            'tune_trials': args.tune_trials,
+            'tune_rows': args.tune_rows,
+            # Matris biçimi / kapsamı değişince diskteki od_matrix çıktısı eskir
+            'od_version': OD_VERSION,
+        }
+        self.params = {stage: {key: run_params[key] for key in STAGE_PARAMS.get(stage, ())}
+                       for stage in STAGES}
+        self.outputs = {}
+
+    # ------------------------------------------------------------------ çalıştırma
+    def output(self, stage):
+        """Aşama çıktısı: bu çalıştırmada üretildiyse bellekten, diskte güncelse diskten, değilse çalıştırarak."""
+        if stage not in self.outputs:
+            if self.store.is_fresh(stage, self.params):
+                print(f"\n  ↺ {stage}: diskteki çıktı kullanılıyor ({self.store.path(stage)})")
+                self.outputs[stage] = self.read(stage)
+            else:
+                self.run_stage(stage)
+        return self.outputs[stage]
+
+    def run_stage(self, stage):
+        if stage == 'save':
+            self.outputs[stage] = main_analysis.save(self.sections() + [{'performance': self.performance()}],
+                                                     sketches=self.sketches())
+            return self.outputs[stage]
+
+        inputs = [self.output(dep) for dep in DEPENDENCIES[stage]]
+        rows_in = [_rows(dep, output) for dep, output in zip(DEPENDENCIES[stage], inputs)]
+        rows_in = sum(rows_in) if rows_in and None not in rows_in else None
+        with PROFILER.measure(stage, rows_in) as m, self.profile(stage):
+            result = self.call(stage, inputs)
+            m.rows_out = _rows(stage, result)
+        records = PROFILER.stage_records(stage)
+        print(f"  ⏱ {stage}: {format_measurement(records[-1])}")
+
+        self.write(stage, result, records)
+        self.outputs[stage] = result
+        return result
+
+    def profile(self, stage):
+        if self.args.profile_dir is None:
+            return contextlib.nullcontext()
+        extension = 'html' if self.args.profiler == 'pyinstrument' else 'prof'
+        return profile_to(os.path.join(self.args.profile_dir, f"{stage}.{extension}"), self.args.profiler)
+
+    def call(self, stage, inputs):
+        args = self.args
+        if stage == 'load':
+            result = main_analysis.load(args.months, self.data_dir, base_url=args.base_url,
+                                        download_workers=args.download_workers, verify=args.verify_downloads)
+        elif stage == 'clean':
+            result = main_analysis.clean(inputs[0], stream=args.stream, use_cache=not args.no_cache,
+                                         batch_size=args.batch_size, workers=args.workers)
+        elif stage == 'aggregate':
+            result = main_analysis.aggregate(inputs[0], load_zone_index(self.data_dir))
+        elif stage == 'train_tip':
+            months = [f"{year}-{month:02d}" for year, month in args.months]
+            result = main_analysis.train_tip(inputs[0]['yellow'], months=months, incremental=args.incremental,
+                                             files=inputs[1], out_of_core=args.out_of_core)
+        elif stage == 'train_demand':
+            result = main_analysis.train_demand(inputs[0], incremental=args.incremental)
+        elif stage == 'zone_demand':
+            result = main_analysis.zone_demand(inputs[0], load_zone_index(self.data_dir))
+        elif stage == 'od_matrix':
+            result = advanced_models.od_matrix(inputs[0])
+        elif stage == 'train_duration':
+            result = advanced_models.train_duration(inputs[0], inputs[1], incremental=args.incremental,
+                                                    out_of_core=args.out_of_core)
+        elif stage == 'tune':
+            result = tuning.tune(inputs[0], args.tune_models, args.tune_search, args.tune_trials,
+                                 args.tune_rows, args.workers, deadline=args.tune_deadline)
+        elif stage == 'pricing':
+            result = main_analysis.pricing(inputs[0], load_zone_index(self.data_dir))
+        else:
+            result = main_analysis.segments(inputs[0], load_zone_index(self.data_dir))
+        return result
+
+    def sections(self):
+        sections = []
+        for stage in SECTION_STAGES:
+            if stage in self.outputs or self.store.is_fresh(stage, self.params):
+                sections.append(self.output(stage))
+            elif self.store.meta(stage) is not None:
+                print(f"  ⚠️ {stage}: diskteki çıktı güncel değil, atlandı (--stages {stage},save ile yenileyin)")
+        return sections
+
+    def sketches(self):
+        """clean aşamasının quantile özetleri (bu çalıştırmada üretildiyse bellekten, güncelse diskten)."""
+        if 'clean' in self.outputs:
+            return self.outputs['clean']['sketches']
+        if self.store.is_fresh('clean', self.params):
+            return TripSketches.open(self.store.path('clean', SKETCH_FILE))
+        return None
+
+    def performance(self):
+        """Güncel aşamaların ölçümleri; diskten kullanılan aşamalar kendi çalıştırıldıkları andaki değerlerle."""
+        records = {}
+        for stage in STAGES:
+            if stage in self.outputs or self.store.is_fresh(stage, self.params):
+                meta = self.store.meta(stage)
+                if meta is not None:
+                    records[stage] = [dict(record, run_at=meta['created']) for record in meta['performance']]
+        return performance_section(records)
+
+    # ------------------------------------------------------------------ kalıcılık
+    def write(self, stage, result, performance=None):
+        store = self.store
+        store.begin(stage)
+        version = None
+        if stage == 'load':
+            with open(store.path(stage, 'files.json'), 'w') as f:
+                json.dump(result, f, indent=2)
+            version = _files_version(result)
+        elif stage == 'clean':
+            # Temizlenmiş sütunlar belleğe eşlenen Arrow IPC; sonraki aşamalar ve işçiler kopyasız bağlanır
+            TripStore.write(store.path(stage), {source: result[source] for source in ('yellow', 'fhv')})
+            result['cube'].save(store.path(stage, 'cube'))
+            result['sketches'].save(store.path(stage, SKETCH_FILE))
+        elif stage == 'od_matrix':
+            result.save(store.path(stage, 'od'))
+        else:
+            with open(store.path(stage, 'sections.json'), 'w') as f:
+                json.dump(result, f, indent=2, default=str)
+        inputs = {dep: store.meta(dep)['version'] for dep in DEPENDENCIES[stage]}
+        store.commit(stage, self.params[stage], inputs, version, performance)
+
+    def read(self, stage):
+        store = self.store
+        if stage == 'load':
+            with open(store.path(stage, 'files.json'), 'r') as f:
+                return [tuple(item) for item in json.load(f)]
+        if stage == 'clean':
+            cleaned = TripStore.open(store.path(stage)).frames()
+            cleaned['cube'] = TripCube.open(store.path(stage, 'cube'), load_zone_index(self.data_dir))
+            cleaned['sketches'] = TripSketches.open(store.path(stage, SKETCH_FILE))
+            return cleaned
+        if stage == 'od_matrix':
+            return ODMatrix.open(store.path(stage, 'od'))
+        with open(store.path(stage, 'sections.json'), 'r') as f:
+            return json.load(f)
+
+    def run(self, stages):
+        for stage in STAGES:
+            if stage in stages:
+                self.run_stage(stage)
+
+
+def parse_stages(spec):
+    stages = [stage.strip() for stage in spec.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Bilinmeyen aşama: {', '.join(unknown)} (seçenekler: {', '.join(STAGES)})")
+    return stages
+
+
+def parse_tune_models(spec):
+    models = [name.strip() for name in spec.split(',') if name.strip()]
+    unknown = [name for name in models if name not in tuning.MODELS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Bilinmeyen model: {', '.join(unknown)} (seçenekler: {', '.join(tuning.MODELS)})")
+    return models
+
+
+def build_parser(default_stages=None):
+    parser = argparse.ArgumentParser(description="NYC Urban Mobility Intelligence Platform")
+    parser.add_argument('--stages', type=parse_stages,
+                        default=list(default_stages or [stage for stage in STAGES if stage not in OPTIONAL_STAGES]),
+                        help=f"Çalıştırılacak aşamalar, virgülle ayrılmış ({','.join(STAGES)}); "
+                             "girdileri diskte güncelse yeniden hesaplanmaz, tune yalnızca açıkça istenirse çalışır")
+    parser.add_argument('--stream', action='store_true',
+                        help="Parquet dosyalarını row group bazında akışla işle; tablolar ayın tamamından hesaplanır")
+    parser.add_argument('--batch-size', type=int, default=1_000_000,
+                        help="Akış modunda Arrow record batch boyutu (satır)")
+    parser.add_argument('--months', default=DEFAULT_MONTHS,
+                        help="Analiz edilecek ay veya aralık, örn. 2024-01 ya da 2023-01:2024-12")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Akış modunda ve tune aşamasında paralel işçi süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument('--base-url', default=None,
+                        help="TLC veri adresi; yerel ayna klasörü veya yerel HTTP sunucusu olabilir (varsayılan: TLC_BASE_URL / CloudFront)")
+    parser.add_argument('--download-workers', type=int, default=4,
+                        help="Eşzamanlı indirme sayısı")
+    parser.add_argument('--verify-downloads', action='store_true',
+                        help="Mevcut dosyaları kaynaktaki boyut/ETag ile yeniden doğrula")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Temizlenmiş özellik önbelleğini (data/features) kullanma, her şeyi yeniden hesapla")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Modelleri sıfırdan eğitmek yerine kayıtlı halinden yalnızca yeni aylarla güncelle "
+                             "(models/*.manifest.json)")
+    parser.add_argument('--out-of-core', nargs='?', const='external', choices=MEMORY_MODES, default=None,
+                        help="Bahşiş ve süre modellerini örneklem yerine ayların tamamıyla, özellik önbelleğinden "
+                             "akışla eğit (external: diskte sayfalı, quantile: bellekte nicelenmiş matris)")
+    parser.add_argument('--tune-models', type=parse_tune_models, default=list(tuning.MODELS),
+                        help=f"tune aşamasında aranacak modeller ({','.join(tuning.MODELS)})")
+    parser.add_argument('--tune-search', choices=tuning.SEARCHES, default='halving',
+                        help="tune arama yöntemi: rastgele ya da ardışık yarılama")
+    parser.add_argument('--tune-trials', type=int, default=27, help="model başına aday sayısı (mevcut parametreler dahil)")
+    parser.add_argument('--tune-rows', type=int, default=300_000, help="tune'da bahşiş / süre örneklemi (satır)")
+    parser.add_argument('--tune-deadline', type=float, default=None,
+                        help="tune için toplam süre sınırı (saniye); aşılınca yeni deneme başlatılmaz")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Her aşamanın profilini bu klasöre yaz (<aşama>.prof ya da <aşama>.html)")
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile',
+                        help="--profile-dir için profiler (pyinstrument ayrıca kurulmalıdır)")
+    return parser
+
+
+def main(argv=None, default_stages=None):
+    args = build_parser(default_stages).parse_args(argv)
+    args.months = month_range(args.months)
+    if len(args.months) > 1 and not args.stream:
+        # Birden fazla ay yalnızca akış (map-reduce) modunda sınırlı bellekle işlenebilir
+        args.stream = True
+
+    print("=" * 60)
+    print("NYC Urban Mobility Intelligence Platform")
+    print(f"Aşamalar: {', '.join(stage for stage in STAGES if stage in args.stages)}")
+    print("=" * 60)
+
+    Pipeline(args).run(args.stages)
+
+    print(f"\n✅ Analiz tamamlandı!")
+    print(f"📁 Sonuçlar: {main_analysis.OUTPUT_DIR}/analysis_results.json")
+    print(f"🤖 Modeller: {main_analysis.MODEL_DIR}/")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
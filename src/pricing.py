@@ -0,0 +1,269 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Pricing Simulation - zone × saat talep ve arzı üzerinde vektörel surge ve congestion pricing senaryoları
+
+Taban pazar clean aşamasının küpünden kurulur: (sağlayıcı grubu, zone, saat) hücresi başına günlük
+ortalama alış sayısı (talep), bırakış sayısı (o zone'da boşa çıkan araç; arz) ve ortalama ücret.
+Her senaryo altı parametrenin bir kombinasyonudur:
+
+    surge_sensitivity   çarpan = 1 + duyarlılık × (talep / arz - 1), [1, surge_cap] aralığında (yalnızca FHV)
+    surge_cap           çarpan üst sınırı
+    elasticity          talebin fiyat esnekliği: talep × (yeni fiyat / eski fiyat) ^ esneklik
+    supply_elasticity   arzın çarpana tepkisi: kapasite × çarpan ^ esneklik
+    demand_shock        talep şoku (yağmur, etkinlik): talep × şok
+    congestion_fee      Manhattan'da 05-21 arası alışlara eklenen ücret (FHV; Yellow yarısı)
+
+Gerçekleşen seyahat min(talep, kapasite)'dir; kapasite taban durumda max(talep, arz) olduğundan
+şoksuz ve ücretsiz senaryo geçmiş veriyi aynen verir. Bütün senaryolar (senaryo × grup × zone × saat)
+dizileri üzerinde parça parça NumPy işlemleriyle hesaplanır; binlerce senaryo saniyeler içinde taranır.
+
+    python src/pricing.py data/stages/clean/cube --data-dir data --output pricing.parquet
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from trip_cube import TripCube
+from zone_index import N_ZONES, load_zone_index
+
+N_HOURS = 24
+GROUPS = ['Yellow', 'FHV']
+
+# Yellow taksimetrelidir: surge yalnızca FHV'de uygulanır
+SURGE_GROUPS = np.array([0.0, 1.0], dtype=np.float32)
+# 2025 merkez bölge ek ücreti taksi için 0.75$, FHV için 1.50$: Yellow FHV ücretinin yarısını öder
+FEE_SHARE = np.array([0.5, 1.0], dtype=np.float32)
+# Ücret bölgesi 60. cadde güneyidir; zone tablosunda karşılığı olmadığından borough ile yaklaşıklanır
+FEE_BOROUGHS = ('Manhattan',)
+FEE_HOURS = list(range(5, 21))
+
+PARAMS = ('surge_sensitivity', 'surge_cap', 'elasticity', 'supply_elasticity', 'demand_shock', 'congestion_fee')
+ASSUMPTIONS = ('elasticity', 'supply_elasticity', 'demand_shock')
+
+GRID = {
+    'surge_sensitivity': (0.0, 0.25, 0.5, 0.75, 1.0, 1.5),
+    'surge_cap': (1.5, 2.0, 3.0),
+    'elasticity': (-0.2, -0.4, -0.6, -0.8, -1.0),
+    'supply_elasticity': (0.0, 0.3, 0.6),
+    'demand_shock': (1.0, 1.15, 1.3),
+    'congestion_fee': (0.0, 0.75, 1.5, 2.5, 5.0),
+}
+# Grid'de verilmeyen parametreler ve congestion fee tablosunun sabit varsayımları
+NEUTRAL = {'surge_sensitivity': 0.0, 'surge_cap': 1.0, 'elasticity': -0.4, 'supply_elasticity': 0.0,
+           'demand_shock': 1.0, 'congestion_fee': 0.0}
+
+METRICS = ('trips', 'revenue', 'fee_revenue', 'unserved', 'fee_zone_trips', 'yellow_trips', 'surged_trips',
+           'multiplier')
+
+MAX_PRESSURE = 10.0  # arzı olmayan zone-saatlerde talep / arz
+MAX_TRIP_LOSS = 0.05  # önerilen surge politikası surge'süz duruma göre en fazla bu kadar seyahat kaybettirir
+CHUNK_CELLS = 4_000_000  # parça başına (senaryo × hücre) eleman sayısı
+
+
+def scenario_grid(**values):
+    """Parametre listelerinin kartezyen çarpımı: {parametre: (N,) float32}.
+
+    Verilmeyen parametreler NEUTRAL değerinde kalır. Surge'süz ve ücretsiz karşılıklar her zaman
+    grid'de bulunur (öneriler bunlara göre hesaplanır).
+    """
+    lists = {name: sorted(set(values.get(name, (NEUTRAL[name],)))) for name in PARAMS}
+    lists['surge_sensitivity'] = sorted(set(lists['surge_sensitivity']) | {0.0})
+    lists['congestion_fee'] = sorted(set(lists['congestion_fee']) | {0.0})
+    combos = np.array(list(itertools.product(*(lists[name] for name in PARAMS))), dtype=np.float32)
+    return {name: combos[:, j] for j, name in enumerate(PARAMS)}
+
+
+class Market:
+    """(grup, zone, saat) günlük talep / arz / ücret dizileri ve senaryo değerlendirmesi."""
+
+    def __init__(self, demand, supply, fare, fee_mask, days=1):
+        self.demand = demand.astype(np.float32)
+        self.supply = supply.astype(np.float32)
+        self.fare = fare.astype(np.float32)
+        self.fee_mask = fee_mask.astype(np.float32)
+        self.days = days
+        self.capacity = np.maximum(self.demand, self.supply)
+        pressure = np.full(self.demand.shape, MAX_PRESSURE, dtype=np.float32)
+        pressure[self.demand == 0] = 1.0
+        np.divide(self.demand, self.supply, out=pressure, where=self.supply > 0)
+        self.pressure = np.minimum(pressure, MAX_PRESSURE)
+
+    @classmethod
+    def from_cube(cls, cube, zone_index, fee_boroughs=FEE_BOROUGHS):
+        days = max(len(cube.query(by=['date'], measures=['trips'])), 1)
+        shape = (len(GROUPS), N_ZONES, N_HOURS)
+
+        def dense(table, zone, measure):
+            group = (table['provider'].to_numpy() != 'Yellow').astype(np.int64)
+            cells = np.ravel_multi_index((group, table[zone].to_numpy().astype(np.int64),
+                                          table['hour'].to_numpy().astype(np.int64)), shape)
+            return np.bincount(cells, weights=table[measure].to_numpy(), minlength=int(np.prod(shape))).reshape(shape)
+
+        pickups = cube.query(by=['provider', 'pu', 'hour'], measures=['trips', 'fare'])
+        dropoffs = cube.query(by=['provider', 'do', 'hour'], measures=['trips'])
+        trips, fares = dense(pickups, 'pu', 'trips'), dense(pickups, 'pu', 'fare')
+        # Boş hücrelerde ücret grubun şehir ortalamasıdır (talep sıfır olduğundan sonucu etkilemez)
+        city = fares.sum(axis=(1, 2)) / np.maximum(trips.sum(axis=(1, 2)), 1)
+        fare = np.where(trips > 0, fares / np.maximum(trips, 1), np.maximum(city, 1.0)[:, None, None])
+
+        boroughs = zone_index.names('Borough', np.arange(N_ZONES))
+        fee_mask = np.isin(boroughs, list(fee_boroughs))[:, None] & np.isin(np.arange(N_HOURS), FEE_HOURS)[None, :]
+        return cls(trips / days, dense(dropoffs, 'do', 'trips') / days, fare, fee_mask, days)
+
+    def evaluate(self, scenarios):
+        """Senaryo parçası için hücre dizileri (n × grup × zone × saat): çarpan, ek ücret, talep, seyahat."""
+        p = {name: np.asarray(scenarios[name], dtype=np.float32)[:, None, None, None] for name in PARAMS}
+        demand = self.demand * p['demand_shock']
+        multiplier = np.clip(1 + p['surge_sensitivity'] * (self.pressure * p['demand_shock'] - 1), 1, p['surge_cap'])
+        multiplier = 1 + (multiplier - 1) * SURGE_GROUPS[:, None, None]
+        fee = p['congestion_fee'] * FEE_SHARE[:, None, None] * self.fee_mask
+        demand = demand * ((multiplier + fee / self.fare) ** p['elasticity'])
+        trips = np.minimum(demand, self.capacity * multiplier ** p['supply_elasticity'])
+        return multiplier, fee, demand, trips
+
+    def simulate(self, scenarios):
+        """Her senaryo için günlük toplamlar (DataFrame: parametreler + METRICS)."""
+        n = len(scenarios[PARAMS[0]])
+        chunk = max(CHUNK_CELLS // self.demand.size, 1)
+        out = {name: np.empty(n) for name in METRICS}
+        for lo in range(0, n, chunk):
+            part = {name: values[lo:lo + chunk] for name, values in scenarios.items()}
+            multiplier, fee, demand, trips = self.evaluate(part)
+            rows = slice(lo, lo + len(part[PARAMS[0]]))
+            cells = (1, 2, 3)
+            out['trips'][rows] = trips.sum(axis=cells, dtype=np.float64)
+            out['revenue'][rows] = (trips * self.fare * multiplier).sum(axis=cells, dtype=np.float64)
+            out['fee_revenue'][rows] = (trips * fee).sum(axis=cells, dtype=np.float64)
+            out['unserved'][rows] = (demand - trips).sum(axis=cells, dtype=np.float64)
+            out['fee_zone_trips'][rows] = (trips * self.fee_mask).sum(axis=cells, dtype=np.float64)
+            out['yellow_trips'][rows] = trips[:, 0].sum(axis=(1, 2), dtype=np.float64)
+            fhv = trips[:, 1]
+            out['surged_trips'][rows] = (fhv * (multiplier[:, 1] > 1)).sum(axis=(1, 2), dtype=np.float64)
+            out['multiplier'][rows] = ((fhv * multiplier[:, 1]).sum(axis=(1, 2), dtype=np.float64)
+                                       / np.maximum(fhv.sum(axis=(1, 2), dtype=np.float64), 1e-9))
+        table = pd.DataFrame({name: np.round(np.asarray(values, dtype=np.float64), 4) for name, values in scenarios.items()})
+        for name in METRICS:
+            table[name] = out[name]
+        return table
+
+
+# =============================================================================
+# SONUÇ BÖLÜMÜ
+# =============================================================================
+def _record(row, fields):
+    return {name: round(float(row[name]), 4 if name in PARAMS else 2) for name in fields}
+
+
+def _with_reference(table):
+    """Her senaryoya aynı varsayım ve ücretle surge'süz karşılığının seyahat ve gelir değişimini ekler."""
+    keys = list(ASSUMPTIONS) + ['congestion_fee']
+    reference = (table[table['surge_sensitivity'] == 0].drop_duplicates(keys)
+                 .set_index(keys)[['trips', 'revenue']].add_prefix('reference_'))
+    table = table.join(reference, on=keys)
+    table['trips_change_pct'] = (table['trips'] / table['reference_trips'] - 1) * 100
+    table['revenue_change_pct'] = (table['revenue'] / table['reference_revenue'] - 1) * 100
+    return table.drop(columns=['reference_trips', 'reference_revenue'])
+
+
+def surge_policies(table):
+    """Her varsayım kombinasyonu için seyahat kaybı MAX_TRIP_LOSS'u aşmayan en yüksek gelirli surge."""
+    table = _with_reference(table[table['congestion_fee'] == 0])
+    allowed = table[table['trips_change_pct'] >= -MAX_TRIP_LOSS * 100]
+    # Gelir farkı yuvarlamada kayboluyorsa (ör. birim esneklik) daha çok seyahat bırakan politika seçilir
+    ranked = allowed.assign(gain=allowed['revenue_change_pct'].round(2)).sort_values(
+        list(ASSUMPTIONS) + ['gain', 'trips'], ascending=[True] * len(ASSUMPTIONS) + [False, False])
+    return ranked.groupby(list(ASSUMPTIONS)).head(1).drop(columns='gain').reset_index(drop=True)
+
+
+def hourly_profile(market, scenario, zone_index=None, top=10):
+    """Tek senaryonun FHV saatlik ortalama çarpanı ve en yüksek çarpanlı zone'ları."""
+    multiplier, _, _, trips = market.evaluate({name: [scenario[name]] for name in PARAMS})
+    multiplier, trips = multiplier[0, 1], trips[0, 1]
+    hourly = (trips * multiplier).sum(axis=0) / np.maximum(trips.sum(axis=0), 1e-9)
+    zone_trips = trips.sum(axis=1)
+    zone_multiplier = (trips * multiplier).sum(axis=1) / np.maximum(zone_trips, 1e-9)
+    # Çok küçük zone'lar listeyi doldurmasın: günde en az 1 seyahat
+    order = [z for z in np.argsort(zone_multiplier)[::-1] if z > 0 and zone_trips[z] >= 1][:top]
+    names = zone_index.names('Zone', order) if zone_index is not None else [None] * len(order)
+    return ([round(float(v), 3) for v in hourly],
+            [{'PULocationID': int(z), 'zone': name, 'multiplier': round(float(zone_multiplier[z]), 3),
+              'peak_hour': int(np.argmax(multiplier[z])), 'trips_per_day': round(float(zone_trips[z]), 1)}
+             for z, name in zip(order, names)])
+
+
+def pricing_section(cube, zone_index, grid=None):
+    """pricing_simulation: taban, surge politikaları, congestion fee tablosu ve örnek senaryonun profili."""
+    grid = grid or GRID
+    market = Market.from_cube(cube, zone_index)
+    scenarios = scenario_grid(**grid)
+    started = time.perf_counter()
+    table = market.simulate(scenarios)
+    elapsed = time.perf_counter() - started
+
+    baseline = market.simulate(scenario_grid()).iloc[0]
+    fees = market.simulate(scenario_grid(congestion_fee=grid['congestion_fee'], elasticity=grid['elasticity']))
+    fees['fee_zone_change_pct'] = (fees['fee_zone_trips'] / baseline['fee_zone_trips'] - 1) * 100
+    fees['yellow_share_pct'] = fees['yellow_trips'] / fees['trips'] * 100
+
+    policies = surge_policies(table)
+    reference = policies[(policies['demand_shock'] == max(grid['demand_shock']))
+                         & np.isclose(policies['elasticity'], NEUTRAL['elasticity'])]
+    example = (reference if len(reference) else policies).iloc[0]
+    hourly, zones = hourly_profile(market, example, zone_index)
+    return {'pricing_simulation': {
+        'scenarios': len(table),
+        'simulate_s': round(elapsed, 3),
+        'scenarios_per_s': round(len(table) / max(elapsed, 1e-9)),
+        'grid': {name: [float(v) for v in values] for name, values in grid.items()},
+        'assumptions': {'days': market.days, 'surge_providers': ['FHV'], 'fee_boroughs': list(FEE_BOROUGHS),
+                        'fee_hours': [FEE_HOURS[0], FEE_HOURS[-1] + 1],
+                        'fee_share': dict(zip(GROUPS, FEE_SHARE.tolist())), 'max_trip_loss_pct': MAX_TRIP_LOSS * 100},
+        'baseline': _record(baseline, METRICS),
+        'surge_policies': [_record(row, PARAMS + METRICS + ('trips_change_pct', 'revenue_change_pct'))
+                           for _, row in policies.iterrows()],
+        'congestion_fee': [_record(row, ('congestion_fee', 'elasticity', 'trips', 'fee_zone_trips', 'fee_zone_change_pct',
+                                         'fee_revenue', 'yellow_share_pct'))
+                           for _, row in fees.iterrows()],
+        'example': {'scenario': _record(example, PARAMS), 'fhv_hourly_multiplier': hourly, 'top_surge_zones': zones},
+    }}
+
+
+# =============================================================================
+# CLI: python src/pricing.py data/stages/clean/cube --data-dir data --elasticity -0.3 -0.5
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Küp üzerinde surge ve congestion pricing senaryo taraması")
+    parser.add_argument('path', help="küp dizini (ör. data/stages/clean/cube)")
+    parser.add_argument('--data-dir', default='data', help="taxi_zone_lookup.csv'nin bulunduğu dizin")
+    for name in PARAMS:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs='+', default=list(GRID[name]),
+                            help=f"{name} değerleri (varsayılan: {' '.join(map(str, GRID[name]))})")
+    parser.add_argument('--output', default=None, help="bütün senaryo tablosunu Parquet/CSV olarak yaz")
+    parser.add_argument('--top', type=int, default=10, help="en yüksek gelirli kaç senaryo listelensin")
+    args = parser.parse_args(argv)
+
+    zone_index = load_zone_index(args.data_dir)
+    market = Market.from_cube(TripCube.open(args.path, zone_index), zone_index)
+    scenarios = scenario_grid(**{name: getattr(args, name) for name in PARAMS})
+    started = time.perf_counter()
+    table = market.simulate(scenarios)
+    elapsed = time.perf_counter() - started
+    print(f"{len(table):,} senaryo × {market.demand.size:,} hücre: {elapsed:.2f} s "
+          f"({len(table) / max(elapsed, 1e-9):,.0f} senaryo/s)")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.nlargest(args.top, 'revenue').to_string(index=False))
+    if args.output:
+        if args.output.endswith('.csv'):
+            table.to_csv(args.output, index=False)
+        else:
+            table.to_parquet(args.output, index=False)
+        print(f"📁 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Profiling - aşama ve sıcak işlem bazında süre, CPU, bellek ve satır sayısı ölçümü
+
+    with measure('clean.read_raw', rows_in=n) as m:
+        df = read_raw(...)
+        m.rows_out = len(df)
+
+Ölçümler süreç genelindeki PROFILER'da toplanır; pipeline.py her aşamanın kayıtlarını
+aşama çıktısıyla birlikte saklar ve analysis_results.json'daki `performance` bölümüne yazar.
+"""
+
+import contextlib
+import cProfile
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def current_rss():
+    """Anlık RSS (bayt); ölçülemiyorsa None."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Sürecin ve tamamlanmış alt süreçlerin (ör. akış işçileri) en yüksek RSS değeri (bayt)."""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+
+
+def cpu_time():
+    """Kullanıcı + sistem CPU süresi; tamamlanmış alt süreçler dahil."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _mb(value):
+    return None if value is None else round(value / MB, 1)
+
+
+class MemoryTracker:
+    """Blok süresince RSS'yi arka planda örnekler (Arrow / XGBoost gibi yerel bellek dahil).
+
+    ru_maxrss süreç ömrü boyunca tek bir tepe değeridir; bu sınıf yalnızca bloğun tepesini verir.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        if self.baseline is not None:
+            self._done = threading.Event()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.baseline is not None:
+            self._done.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth(self):
+        """Başlangıca göre en yüksek RSS artışı (bayt); ölçülemiyorsa None."""
+        return None if self.baseline is None else self.peak - self.baseline
+
+
+class Measurement:
+    def __init__(self, name, stage, depth, rows_in=None):
+        self.name = name
+        self.stage = stage
+        self.depth = depth
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def start(self):
+        self.rss_start = current_rss()
+        self.peak_start = peak_rss()
+        self.cpu_start = cpu_time()
+        self.wall_start = time.perf_counter()
+
+    def stop(self):
+        self.wall = time.perf_counter() - self.wall_start
+        self.cpu = cpu_time() - self.cpu_start
+        self.rss_end = current_rss()
+        self.peak_end = peak_rss()
+
+    def as_dict(self):
+        rss_delta = None if self.rss_start is None or self.rss_end is None else self.rss_end - self.rss_start
+        peak_delta = None if self.peak_start is None or self.peak_end is None else self.peak_end - self.peak_start
+        return {
+            'name': self.name,
+            'stage': self.stage,
+            'wall_s': round(self.wall, 3),
+            'cpu_s': round(self.cpu, 3),
+            'rss_mb': _mb(self.rss_end),
+            'rss_delta_mb': _mb(rss_delta),
+            'peak_rss_mb': _mb(self.peak_end),
+            'peak_delta_mb': _mb(peak_delta),
+            'rows_in': None if self.rows_in is None else int(self.rows_in),
+            'rows_out': None if self.rows_out is None else int(self.rows_out),
+        }
+
+
+class Profiler:
+    """İç içe ölçümler; en dıştaki ölçüm aşamadır, içtekiler o aşamanın işlemleri olarak kaydedilir."""
+
+    def __init__(self):
+        self.records = []
+        self._stack = []
+
+    @contextlib.contextmanager
+    def measure(self, name, rows_in=None):
+        stage = self._stack[0].stage if self._stack else name
+        measurement = Measurement(name, stage, len(self._stack), rows_in)
+        self._stack.append(measurement)
+        measurement.start()
+        try:
+            yield measurement
+        finally:
+            measurement.stop()
+            self._stack.pop()
+            self.records.append(measurement.as_dict())
+
+    def stage_records(self, stage):
+        return [record for record in self.records if record['stage'] == stage]
+
+
+PROFILER = Profiler()
+
+
+def measure(name, rows_in=None):
+    return PROFILER.measure(name, rows_in)
+
+
+@contextlib.contextmanager
+def profile_to(path, profiler='cprofile'):
+    """Bloğu cProfile (.prof) ya da pyinstrument (.html) ile profiller ve dosyaya döker."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler as InstrumentProfiler
+        except ImportError:
+            raise ImportError("pyinstrument kurulu değil: pip install pyinstrument") from None
+        instrument = InstrumentProfiler()
+        instrument.start()
+        try:
+            yield
+        finally:
+            instrument.stop()
+            with open(path, 'w') as f:
+                f.write(instrument.output_html())
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+def performance_section(stage_records):
+    """Aşama kayıtlarından analysis_results.json `performance` bölümü."""
+    records = [record for stage in stage_records for record in stage_records[stage]]
+    stages = [record for record in records if record['name'] == record['stage']]
+    peaks = [record['peak_rss_mb'] for record in records if record['peak_rss_mb'] is not None]
+    return {
+        'stages': stages,
+        'operations': [record for record in records if record['name'] != record['stage']],
+        'total_wall_s': round(sum(record['wall_s'] for record in stages), 3),
+        'total_cpu_s': round(sum(record['cpu_s'] for record in stages), 3),
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def format_measurement(record):
+    parts = [f"{record['wall_s']:.2f} s", f"CPU {record['cpu_s']:.2f} s"]
+    if record['rss_delta_mb'] is not None:
+        parts.append(f"RSS {record['rss_delta_mb']:+.1f} MB")
+    if record['peak_rss_mb'] is not None:
+        parts.append(f"tepe {record['peak_rss_mb']:.0f} MB")
+    if record['rows_out'] is not None:
+        parts.append(f"{record['rows_out']:,} satır")
+    return ", ".join(parts)
@@ -0,0 +1,451 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Sketches - birleştirilebilir, tek geçişli yaklaşık quantile (t-digest) ve tekil sayım (HyperLogLog) özetleri
+
+Küp yalnızca toplam tuttuğu için medyan / p90 / p99 veremez; bunları tam hesaplamak aylar
+boyunca milyarlarca değeri sıralamak demektir. TripSketches aynı batch'lerden beslenir:
+
+  * QuantileDigest - (ölçü × segment × saat × PU zone) gruplarının her biri için t-digest.
+    Bütün gruplar tek bir (grup, ortalama, ağırlık) centroid dizisinde tutulur; bir batch
+    eklemek ya da iki özeti birleştirmek tek bir sıralama + bincount'tur.
+  * DistinctCounter - (segment × PU zone) başına HyperLogLog kayıtları; OD rotası sayar.
+
+İki özet `merge` ile toplanır (işçiler, aylar); `save` / `open` sıkıştırılmış .npz kullanır.
+
+    python src/sketches.py visualizations/sketches.npz --metric fare --by borough
+    python src/sketches.py 2024-01.npz 2024-02.npz --metric speed --by hour --segment yellow
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from zone_index import AIRPORT_ZONES, N_ZONES, load_zone_index
+
+SKETCH_VERSION = 1
+SKETCH_FILE = "sketches.npz"
+
+N_HOURS = 24
+QUANTILES = (0.5, 0.9, 0.99)
+COMPRESSION = 100     # t-digest δ: grup başına en fazla ~δ/2 centroid
+HLL_PRECISION = 10    # 2^10 kayıt: ~%3 standart hata, grup başına 1 KB
+
+SEGMENTS = ['yellow', 'yellow_airport', 'fhv']
+METRICS = ['fare', 'duration', 'speed', 'tip_pct']
+DIMENSIONS = ('segment', 'hour', 'zone', 'borough', 'zone_name')
+# zone_index alanlarından türetilen boyutlar (aynı isimli zone'lar tek grupta birleşir)
+ZONE_FIELDS = {'borough': 'Borough', 'zone_name': 'Zone'}
+
+
+def sketch_values(df, source):
+    """(seyahat × ölçü) matrisi: ücret ($), süre (dk), hız (mph), bahşiş (% ücret)."""
+    if source == 'yellow':
+        fare = df['fare_amount'].to_numpy(dtype=np.float64)
+        duration = df['trip_duration'].to_numpy(dtype=np.float64)
+        speed = df['avg_speed'].to_numpy(dtype=np.float64)
+        tip_pct = df['tip_percentage'].to_numpy(dtype=np.float64)
+    else:
+        fare = df['base_passenger_fare'].to_numpy(dtype=np.float64)
+        duration = df['trip_time'].to_numpy(dtype=np.float64) / 60
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed = df['trip_miles'].to_numpy(dtype=np.float64) / (duration / 60)
+            tip_pct = np.where(fare > 0, np.clip(df['tips'].to_numpy(dtype=np.float64) / fare * 100, 0, 100), np.nan)
+    return np.column_stack([fare, duration, speed, tip_pct])
+
+
+def _zones(df, column):
+    ids = df[column].to_numpy().astype(np.int64)
+    return np.where((ids > 0) & (ids < N_ZONES), ids, 0)
+
+
+def _sort_keys(groups, values):
+    """(grup, değer) sırasını koruyan tek uint64 anahtar: üst 32 bit grup, alt 32 bit float32 değer.
+
+    IEEE float32 bitleri pozitiflerde işaret biti çevrilerek, negatiflerde tümü çevrilerek
+    tamsayı sırasına getirilir; iki sütunlu lexsort yerine tek bir tamsayı sıralaması yeterli olur.
+    """
+    bits = np.asarray(values, dtype=np.float32).view(np.uint32)
+    bits = np.where(bits >> np.uint32(31), ~bits, bits | np.uint32(0x80000000))
+    return np.asarray(groups, dtype=np.uint64) << np.uint64(32) | bits.astype(np.uint64)
+
+
+def _unpack(keys):
+    bits = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    bits = np.where(bits >> np.uint32(31), bits & np.uint32(0x7FFFFFFF), ~bits)
+    return (keys >> np.uint64(32)).astype(np.int64), bits.view(np.float32).astype(np.float64)
+
+
+def _boundaries(group):
+    """Sıralı grup dizisinde her grubun ilk ve son elemanı (boolean maskeler)."""
+    first = np.empty(len(group), dtype=bool)
+    last = np.empty(len(group), dtype=bool)
+    first[0] = last[-1] = True
+    np.not_equal(group[1:], group[:-1], out=first[1:])
+    last[:-1] = first[1:]
+    return first, last
+
+
+# =============================================================================
+# T-DIGEST
+# =============================================================================
+class QuantileDigest:
+    """Gruplanmış t-digest: her grup için (ortalama, ağırlık) centroid'leri, min ve max.
+
+    Centroid'ler (grup, ortalama) sırasında tutulur. Sıkıştırma k1 ölçek fonksiyonunu
+    (k = δ/2π · asin(2q - 1)) kullanır: grup içi kümülatif ağırlığın orta noktası aynı tamsayı
+    k dilimine düşen komşu centroid'ler birleşir. Uçlarda dilimler dar olduğundan p99 gibi
+    kuyruk quantile'ları medyandan daha hassastır.
+    """
+
+    def __init__(self, n_groups, compression=COMPRESSION):
+        self.n_groups = int(n_groups)
+        self.compression = compression
+        self.group = np.empty(0, dtype=np.int64)
+        self.mean = np.empty(0)
+        self.weight = np.empty(0)
+        self.min = np.full(self.n_groups, np.inf)
+        self.max = np.full(self.n_groups, -np.inf)
+
+    def __len__(self):
+        return len(self.group)
+
+    def update(self, groups, values):
+        groups = np.asarray(groups, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = np.isfinite(values)
+        if not keep.all():
+            groups, values = groups[keep], values[keep]
+        if len(values) == 0:
+            return self
+        # Ham değerler ağırlıksızdır: argsort yerine paketlenmiş anahtarın kendisi sıralanır
+        # ve tekrar eden (grup, değer) çiftleri ağırlıklı tek noktaya iner (ücretler çoğunlukla tekrar eder)
+        keys = np.sort(_sort_keys(groups, values))
+        distinct = np.empty(len(keys), dtype=bool)
+        distinct[0] = True
+        np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+        positions = np.flatnonzero(distinct)
+        weight = np.diff(np.append(positions, len(keys))).astype(np.float64)
+        group, mean = _unpack(keys[positions])
+        first, last = _boundaries(group)
+        np.minimum.at(self.min, group[first], mean[first])
+        np.maximum.at(self.max, group[last], mean[last])
+        return self._compress(*self._reduce(group, mean, weight))
+
+    def merge(self, other):
+        if other.n_groups != self.n_groups:
+            raise ValueError(f"Farklı grup sayıları birleştirilemez: {self.n_groups} / {other.n_groups}")
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self._compress(other.group, other.mean, other.weight)
+
+    def _compress(self, group, mean, weight):
+        """Mevcut centroid'lere (grup, ortalama, ağırlık) ekler ve yeniden sıkıştırır."""
+        if len(group) == 0:
+            return self
+        group = np.concatenate([self.group, group])
+        mean = np.concatenate([self.mean, mean])
+        weight = np.concatenate([self.weight, weight])
+        order = np.argsort(_sort_keys(group, mean))
+        self.group, self.mean, self.weight = self._reduce(group[order], mean[order], weight[order])
+        return self
+
+    def _reduce(self, group, mean, weight):
+        """(grup, ortalama) sıralı centroid'lerden aynı k dilimine düşen komşuları birleştirir."""
+        cum = np.cumsum(weight)
+        first, _ = _boundaries(group)
+        # Grup başlangıcındaki kümülatif ağırlık; cum artan olduğundan maximum.accumulate yayar
+        start = np.maximum.accumulate(np.where(first, cum - weight, 0))
+        total = np.bincount(group, weights=weight, minlength=self.n_groups)[group]
+        q = np.clip((cum - weight / 2 - start) / total, 0, 1)
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)).astype(np.int64)
+
+        new = first.copy()
+        np.not_equal(k[1:], k[:-1], out=new[1:], where=~first[1:])
+        ids = np.cumsum(new) - 1
+        merged_weight = np.bincount(ids, weights=weight)
+        return group[new], np.bincount(ids, weights=weight * mean) / merged_weight, merged_weight
+
+    def regroup(self, mapping, n_groups):
+        """Grupları mapping[grup] altında toplar (-1 atılır); ör. zone -> borough roll-up'ı."""
+        mapping = np.asarray(mapping, dtype=np.int64)
+        result = QuantileDigest(n_groups, self.compression)
+        keep = mapping[self.group] >= 0
+        valid = mapping >= 0
+        np.minimum.at(result.min, mapping[valid], self.min[valid])
+        np.maximum.at(result.max, mapping[valid], self.max[valid])
+        if keep.any():
+            result._compress(mapping[self.group[keep]], self.mean[keep], self.weight[keep])
+        return result
+
+    @property
+    def counts(self):
+        return np.bincount(self.group, weights=self.weight, minlength=self.n_groups)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """(grup × quantile) matrisi; boş gruplar NaN. Komşu centroid merkezleri arasında doğrusal."""
+        groups = np.arange(self.n_groups)
+        totals = self.counts
+        out = np.full((self.n_groups, len(quantiles)), np.nan)
+        filled = totals > 0
+        if not filled.any():
+            return out
+        first = np.searchsorted(self.group, groups, side='left')[filled]
+        last = np.searchsorted(self.group, groups, side='right')[filled] - 1
+        cum = np.cumsum(self.weight)
+        center = cum - self.weight / 2
+        start = cum[first] - self.weight[first]
+        total = totals[filled]
+        lowest, highest = self.min[filled], self.max[filled]
+        for j, q in enumerate(quantiles):
+            target = start + q * total
+            i = np.clip(np.searchsorted(center, target, side='left'), first, last + 1)
+            left, right = i == first, i > last
+            lo = np.clip(i - 1, first, last)
+            hi = np.clip(i, first, last)
+            lo_value = np.where(left, lowest, self.mean[lo])
+            lo_pos = np.where(left, start, center[lo])
+            hi_value = np.where(right, highest, self.mean[hi])
+            hi_pos = np.where(right, start + total, center[hi])
+            span = hi_pos - lo_pos
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = np.where(span > 0, (target - lo_pos) / span, 0.0)
+            out[filled, j] = lo_value + (hi_value - lo_value) * np.clip(fraction, 0, 1)
+        return out
+
+
+# =============================================================================
+# HYPERLOGLOG
+# =============================================================================
+def _hash64(keys):
+    """splitmix64: tamsayı anahtarlar -> düzgün dağılmış 64 bit."""
+    x = np.asarray(keys, dtype=np.int64).view(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class DistinctCounter:
+    """Gruplanmış HyperLogLog: grup başına 2^precision adet uint8 kayıt; birleştirme kayıt bazında max."""
+
+    def __init__(self, n_groups, precision=HLL_PRECISION):
+        self.n_groups = int(n_groups)
+        self.precision = precision
+        self.registers = np.zeros((self.n_groups, 1 << precision), dtype=np.uint8)
+
+    def update(self, groups, keys):
+        if len(keys) == 0:
+            return self
+        width = 1 << self.precision
+        # Aynı (grup, anahtar) çiftleri aynı kayda düşer; önce tekilleştirmek hash işini küçültür
+        pairs = np.unique(np.asarray(groups, dtype=np.int64) << 32 | np.asarray(keys, dtype=np.int64))
+        hashed = _hash64(pairs & 0xFFFFFFFF)
+        register = (hashed >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Kalan bitlerin ilk 32'sindeki baştaki sıfırlar + 1; frexp üssü bit uzunluğudur
+        rest = ((hashed << np.uint64(self.precision)) >> np.uint64(32)).astype(np.float64)
+        rank = (33 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers.reshape(-1), (pairs >> 32) * width + register, rank)
+        return self
+
+    def merge(self, other):
+        if other.registers.shape != self.registers.shape:
+            raise ValueError("Farklı boyutlu HyperLogLog özetleri birleştirilemez")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def regroup(self, mapping, n_groups):
+        mapping = np.asarray(mapping, dtype=np.int64)
+        result = DistinctCounter(n_groups, self.precision)
+        valid = mapping >= 0
+        np.maximum.at(result.registers, mapping[valid], self.registers[valid])
+        return result
+
+    def estimate(self):
+        """Grup başına tahmini tekil sayı; küçük aralıkta doğrusal sayım (linear counting)."""
+        m = self.registers.shape[1]
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.exp2(-self.registers.astype(np.float64)).sum(axis=1)
+        zeros = (self.registers == 0).sum(axis=1)
+        with np.errstate(divide='ignore'):
+            linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+# =============================================================================
+# SEYAHAT ÖZETLERİ
+# =============================================================================
+class TripSketches:
+    """Seyahat batch'lerinden quantile ve rota özetleri; CubeBuilder ile aynı update / merge düzeni."""
+
+    def __init__(self, compression=COMPRESSION, precision=HLL_PRECISION):
+        self.shape = (len(METRICS), len(SEGMENTS), N_HOURS, N_ZONES)
+        self.digest = QuantileDigest(np.prod(self.shape), compression)
+        self.routes = DistinctCounter(len(SEGMENTS) * N_ZONES, precision)
+        self.rows = 0
+
+    def update(self, df, source):
+        if len(df) == 0:
+            return self
+        pu, do = _zones(df, 'PULocationID'), _zones(df, 'DOLocationID')
+        if source == 'yellow':
+            segment = (np.isin(pu, AIRPORT_ZONES) | np.isin(do, AIRPORT_ZONES)).astype(np.int64)
+        else:
+            segment = np.full(len(df), SEGMENTS.index('fhv'))
+        cells = np.ravel_multi_index((segment, df['hour'].to_numpy().astype(np.int64), pu), self.shape[1:])
+        per_metric = int(np.prod(self.shape[1:]))
+        groups = np.arange(len(METRICS))[:, None] * per_metric + cells[None, :]
+        self.digest.update(groups.ravel(), sketch_values(df, source).T.ravel())
+        self.routes.update(segment * N_ZONES + pu, pu * N_ZONES + do)
+        self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        self.digest.merge(other.digest)
+        self.routes.merge(other.routes)
+        self.rows += other.rows
+        return self
+
+    # ------------------------------------------------------------------ sorgu
+    def _keys(self, by, shape, grid, zone_index, **filters):
+        """Hücre ızgarası -> (yeni grup numaraları, grup sayısı, etiket çözücü)."""
+        unknown = [name for name in by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Bilinmeyen boyut: {', '.join(unknown)} (geçerli: {', '.join(DIMENSIONS)})")
+        selected = np.ones(len(grid['zone']), dtype=bool)
+        for name, values in filters.items():
+            if values is not None:
+                codes = [SEGMENTS.index(v) if name == 'segment' else int(v) for v in values]
+                selected &= np.isin(grid[name], codes)
+        keys, sizes = [], []
+        for name in by:
+            if name in ZONE_FIELDS:
+                if zone_index is None:
+                    raise ValueError(f"{name} gruplaması için zone_index gerekli")
+                field = ZONE_FIELDS[name]
+                keys.append(zone_index.codes(field, grid['zone']).astype(np.int64) + 1)
+                sizes.append(len(zone_index.categories[field]) + 1)
+            else:
+                keys.append(grid[name])
+                sizes.append(shape[('segment', 'hour', 'zone').index(name)])
+        mapping = np.ravel_multi_index(keys, sizes) if keys else np.zeros(len(selected), dtype=np.int64)
+        n_groups = int(np.prod(sizes)) if keys else 1
+
+        def labels(groups):
+            data = {}
+            for name, codes in zip(by, np.unravel_index(groups, sizes) if keys else ()):
+                if name == 'segment':
+                    data[name] = np.asarray(SEGMENTS, dtype=object)[codes]
+                elif name in ZONE_FIELDS:
+                    categories = np.asarray(zone_index.categories[ZONE_FIELDS[name]], dtype=object)
+                    data[name] = np.concatenate([[None], categories])[codes]
+                else:
+                    data[name] = codes
+            return data
+
+        return np.where(selected, mapping, -1), n_groups, labels
+
+    def quantiles(self, metric, by=(), segments=None, hours=None, zone_index=None, quantiles=QUANTILES):
+        """`by` gruplarında ölçünün quantile'ları: by sütunları + trips + <ölçü>_p50 / _p90 / _p99."""
+        if metric not in METRICS:
+            raise ValueError(f"Bilinmeyen ölçü: {metric} (geçerli: {', '.join(METRICS)})")
+        shape = self.shape[1:]
+        segment, hour, zone = (codes.ravel() for codes in np.indices(shape))
+        cell_map, n_groups, labels = self._keys(by, shape, {'segment': segment, 'hour': hour, 'zone': zone},
+                                                zone_index, segment=segments, hour=hours)
+        mapping = np.full(self.digest.n_groups, -1, dtype=np.int64)
+        offset = METRICS.index(metric) * len(cell_map)
+        mapping[offset:offset + len(cell_map)] = cell_map
+        digest = self.digest.regroup(mapping, n_groups)
+        counts = digest.counts
+        groups = np.flatnonzero(counts > 0)
+        data = labels(groups)
+        data['trips'] = counts[groups].astype(np.int64)
+        values = digest.quantiles(quantiles)[groups]
+        for j, q in enumerate(quantiles):
+            data[f"{metric}_p{q * 100:g}"] = values[:, j]
+        return pd.DataFrame(data)
+
+    def distinct_routes(self, by=(), segments=None, zone_index=None):
+        """`by` (segment / zone / borough) gruplarında tahmini tekil OD rotası sayısı."""
+        if 'hour' in by:
+            raise ValueError("Rota özetleri saat boyutu tutmaz")
+        shape = (len(SEGMENTS), N_ZONES)
+        segment, zone = (codes.ravel() for codes in np.indices(shape))
+        mapping, n_groups, labels = self._keys(by, (len(SEGMENTS), N_HOURS, N_ZONES),
+                                               {'segment': segment, 'zone': zone}, zone_index, segment=segments)
+        counter = self.routes.regroup(mapping, n_groups)
+        estimate = counter.estimate()
+        groups = np.flatnonzero(counter.registers.any(axis=1))
+        data = labels(groups)
+        data['distinct_routes'] = np.round(estimate[groups]).astype(np.int64)
+        return pd.DataFrame(data)
+
+    # ------------------------------------------------------------------ kalıcılık
+    def save(self, path, compressed=True):
+        """.npz (varsayılan sıkıştırılmış); geçici dosyaya yazılıp yerine taşınır."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {'version': SKETCH_VERSION, 'metrics': METRICS, 'segments': SEGMENTS, 'rows': self.rows,
+                'compression': self.digest.compression, 'precision': self.routes.precision}
+        digest = self.digest
+        tmp = f"{path}.tmp.npz"
+        # Değerler özellik önbelleğinde zaten float32, ağırlıklar tamsayı sayımlardır
+        write = np.savez_compressed if compressed else np.savez
+        write(tmp, meta=json.dumps(meta), group=digest.group.astype(np.int32),
+              mean=digest.mean.astype(np.float32), weight=np.round(digest.weight).astype(np.uint32),
+              min=digest.min, max=digest.max, registers=self.routes.registers)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def open(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['version'] != SKETCH_VERSION or meta['metrics'] != METRICS or meta['segments'] != SEGMENTS:
+                raise ValueError(f"Özet sürümü desteklenmiyor: {meta['version']} ({path})")
+            sketches = cls(meta['compression'], meta['precision'])
+            digest = sketches.digest
+            digest.group = data['group'].astype(np.int64)
+            digest.mean = data['mean'].astype(np.float64)
+            digest.weight = data['weight'].astype(np.float64)
+            digest.min, digest.max = data['min'], data['max']
+            sketches.routes.registers = data['registers']
+        sketches.rows = meta['rows']
+        return sketches
+
+
+# =============================================================================
+# CLI: python src/sketches.py visualizations/sketches.npz --metric fare --by borough
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantile / tekil rota özetleri sorgusu")
+    parser.add_argument('paths', nargs='+', help="özet dosyaları (.npz); birden fazlası birleştirilir (ör. aylar)")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'),
+                        help="taxi_zone_lookup.csv'nin bulunduğu dizin")
+    parser.add_argument('--metric', choices=METRICS + ['routes'], default='fare')
+    parser.add_argument('--by', default='', help=f"virgülle ayrılmış gruplama boyutları ({', '.join(DIMENSIONS)})")
+    parser.add_argument('--segment', nargs='+', choices=SEGMENTS)
+    parser.add_argument('--hours', type=int, nargs='+')
+    parser.add_argument('--quantiles', type=float, nargs='+', default=list(QUANTILES))
+    parser.add_argument('--merge-to', help="birleştirilmiş özeti bu dosyaya yaz")
+    args = parser.parse_args(argv)
+
+    sketches = TripSketches.open(args.paths[0])
+    for path in args.paths[1:]:
+        sketches.merge(TripSketches.open(path))
+    if args.merge_to:
+        print(f"📁 {sketches.save(args.merge_to)} ({sketches.rows:,} seyahat)")
+
+    by = [name for name in args.by.split(',') if name]
+    zone_index = load_zone_index(args.data_dir) if any(name in ZONE_FIELDS for name in by) else None
+    if args.metric == 'routes':
+        result = sketches.distinct_routes(by, segments=args.segment, zone_index=zone_index)
+    else:
+        result = sketches.quantiles(args.metric, by, segments=args.segment, hours=args.hours,
+                                    zone_index=zone_index, quantiles=args.quantiles)
+    print(result.round(2).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
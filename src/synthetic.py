@@ -0,0 +1,259 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Synthetic TLC Data - gerçek Yellow Taxi / FHVHV şemalarında deterministik sentetik veri
+
+Benchmark'lar ve çevrimdışı denemeler için TLC CDN'den indirmeden, istenen ölçekte
+(100 bin - 100 milyon satır) aylık Parquet dosyaları üretir. Saatlik talep profili,
+zone yoğunlukları (Manhattan ve havalimanları ağırlıklı), mesafe/süre/ücret ilişkileri ve
+temizleme kurallarının eleyeceği hatalı kayıtlar gerçek verideki dağılımlara benzetilmiştir.
+Aynı parametreler her zaman aynı dosyaları üretir; satırlar parça parça yazıldığı için
+bellek kullanımı satır sayısından bağımsızdır.
+
+    python src/synthetic.py --rows 10000000 --months 2024-01 --output data/synthetic
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tlc import ZONE_LOOKUP_FILE, DEFAULT_MONTHS, month_range, trip_filename
+from zone_index import N_ZONES
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+CHUNK_SIZE = 1_000_000
+SOURCE_IDS = {'yellow': 1, 'fhv': 2}
+
+# Saat başına göreli talep (gece düşük, akşam zirvesi 18-19)
+HOURLY_PROFILE = np.array([2.6, 1.8, 1.2, 0.8, 0.6, 0.7, 1.5, 3.0, 4.2, 4.4, 4.3, 4.5,
+                           4.8, 4.9, 5.2, 5.4, 5.4, 5.9, 6.3, 5.9, 5.2, 5.0, 4.6, 3.6])
+HOURLY_PROFILE = HOURLY_PROFILE / HOURLY_PROFILE.sum()
+
+# Hafta içi günlerin göreli ağırlığı (Pzt=0)
+DAILY_PROFILE = np.array([0.90, 1.00, 1.05, 1.10, 1.12, 1.00, 0.83])
+
+BOROUGH_WEIGHTS = {'Manhattan': 12.0, 'Queens': 1.2, 'Brooklyn': 1.5, 'Bronx': 0.4,
+                   'Staten Island': 0.05, 'EWR': 0.3, 'Unknown': 0.3}
+# Havalimanları ortalama bir zone'a göre (JFK ~%4, LGA ~%3 pickup payı)
+AIRPORT_WEIGHTS = {132: 11.0, 138: 8.0}
+
+YELLOW_SCHEMA = pa.schema([
+    ('VendorID', pa.int32()),
+    ('tpep_pickup_datetime', pa.timestamp('us')),
+    ('tpep_dropoff_datetime', pa.timestamp('us')),
+    ('passenger_count', pa.int64()),
+    ('trip_distance', pa.float64()),
+    ('PULocationID', pa.int32()),
+    ('DOLocationID', pa.int32()),
+    ('payment_type', pa.int64()),
+    ('fare_amount', pa.float64()),
+    ('tip_amount', pa.float64()),
+    ('tolls_amount', pa.float64()),
+    ('total_amount', pa.float64()),
+])
+
+FHV_SCHEMA = pa.schema([
+    ('hvfhs_license_num', pa.string()),
+    ('dispatching_base_num', pa.string()),
+    ('pickup_datetime', pa.timestamp('us')),
+    ('dropoff_datetime', pa.timestamp('us')),
+    ('PULocationID', pa.int32()),
+    ('DOLocationID', pa.int32()),
+    ('trip_miles', pa.float64()),
+    ('trip_time', pa.int64()),
+    ('base_passenger_fare', pa.float64()),
+    ('tips', pa.float64()),
+    ('driver_pay', pa.float64()),
+])
+
+LICENSES = np.array(['HV0003', 'HV0005', 'HV0004', 'HV0002'])
+LICENSE_SHARE = np.array([0.72, 0.27, 0.006, 0.004])
+BASES = {'HV0003': 'B03404', 'HV0005': 'B03406', 'HV0004': 'B02800', 'HV0002': 'B02907'}
+
+
+def zone_weights(zone_lookup=None):
+    """LocationID ile indekslenen pickup/dropoff olasılıkları (0 ve tabloda olmayanlar 0)."""
+    zone_lookup = zone_lookup or os.path.join(DATA_DIR, ZONE_LOOKUP_FILE)
+    weights = np.zeros(N_ZONES)
+    if os.path.exists(zone_lookup):
+        zones = pd.read_csv(zone_lookup)
+        ids = zones['LocationID'].to_numpy()
+        valid = (ids > 0) & (ids < N_ZONES)
+        weights[ids[valid]] = zones['Borough'].map(BOROUGH_WEIGHTS).fillna(0.3).to_numpy()[valid]
+    else:
+        weights[1:] = 1.0
+    # Aynı ilçe içinde de yoğunluk eşit değildir; sabit tohumlu Zipf benzeri çarpan
+    weights *= np.random.default_rng(2024).pareto(1.5, N_ZONES) + 0.2
+    for location_id, weight in AIRPORT_WEIGHTS.items():
+        weights[location_id] = weights[1:].mean() * weight
+    return weights / weights.sum()
+
+
+def _month_bounds(year, month):
+    start = np.datetime64(f"{year}-{month:02d}-01")
+    end = np.datetime64(f"{year + (month == 12)}-{month % 12 + 1:02d}-01")
+    return start, end
+
+
+def _pickup_times(rng, n, year, month):
+    """Gün (hafta içi ağırlıklı) + saat (HOURLY_PROFILE) + saniye; mikro saniye cinsinden."""
+    start, end = _month_bounds(year, month)
+    days = np.arange(start, end, dtype='datetime64[D]')
+    day_weights = DAILY_PROFILE[(days.astype('int64') + 3) % 7]
+    day = rng.choice(len(days), size=n, p=day_weights / day_weights.sum())
+    hour = rng.choice(24, size=n, p=HOURLY_PROFILE)
+    seconds = day * 86400 + hour * 3600 + rng.integers(0, 3600, n)
+    return start.astype('datetime64[s]').astype('int64') + seconds, hour
+
+
+def _speed_mph(rng, hour, n):
+    """Yoğun saatlerde yavaş, gece hızlı trafik."""
+    base = np.where(np.isin(hour, [7, 8, 9, 16, 17, 18, 19]), 9.0,
+                    np.where(np.isin(hour, [22, 23, 0, 1, 2, 3, 4, 5]), 17.0, 12.0))
+    return np.clip(base * rng.lognormal(0, 0.3, n), 2.0, 45.0)
+
+
+def _trips(rng, n, year, month, weights):
+    pickup, hour = _pickup_times(rng, n, year, month)
+    pu = rng.choice(N_ZONES, size=n, p=weights)
+    do = rng.choice(N_ZONES, size=n, p=weights)
+    airport = np.isin(pu, list(AIRPORT_WEIGHTS)) | np.isin(do, list(AIRPORT_WEIGHTS))
+    distance = np.where(airport, 9.0 + rng.gamma(3.0, 2.5, n), rng.gamma(1.6, 1.3, n) + 0.1)
+    # Uzun yolculuklar kısmen otoyoldan gider
+    speed = _speed_mph(rng, hour, n) * np.where(distance > 8, 1.8, 1.0)
+    minutes = distance / speed * 60 + rng.gamma(2.0, 1.0, n)
+    seconds = np.maximum((minutes * 60).astype(np.int64), 1)
+    return pickup, seconds, pu, do, distance, airport
+
+
+def _to_timestamp(seconds):
+    return pa.array(seconds * 1_000_000, type=pa.int64()).cast(pa.timestamp('us'))
+
+
+def yellow_chunk(rng, n, year, month, weights):
+    pickup, seconds, pu, do, distance, airport = _trips(rng, n, year, month, weights)
+    minutes = seconds / 60
+    fare = np.round(3.0 + 1.75 * distance + 0.7 * minutes + rng.normal(0, 1.0, n), 2)
+    fare = np.where(airport & (rng.random(n) < 0.5), 70.0, np.maximum(fare, 3.0))
+    payment = rng.choice([1, 2, 3, 4], size=n, p=[0.76, 0.2, 0.02, 0.02])
+    tip = np.where(payment == 1, np.round(fare * np.clip(rng.normal(0.2, 0.08, n), 0, 1), 2), 0.0)
+    tolls = np.where(airport & (rng.random(n) < 0.6), 6.94, 0.0)
+    passengers = rng.choice([0, 1, 2, 3, 4, 5, 6], size=n, p=[0.02, 0.71, 0.14, 0.04, 0.03, 0.03, 0.03])
+
+    # Gerçek veride olduğu gibi temizleme kurallarının eleyeceği kayıtlar
+    refund = rng.random(n) < 0.01
+    fare = np.where(refund, -fare, fare)
+    distance = np.where(rng.random(n) < 0.015, 0.0, np.round(distance, 2))
+    passenger_missing = rng.random(n) < 0.03
+
+    return pa.table({
+        'VendorID': pa.array(rng.choice([1, 2], size=n, p=[0.25, 0.75]), type=pa.int32()),
+        'tpep_pickup_datetime': _to_timestamp(pickup),
+        'tpep_dropoff_datetime': _to_timestamp(pickup + seconds),
+        'passenger_count': pa.array(passengers, mask=passenger_missing, type=pa.int64()),
+        'trip_distance': distance,
+        'PULocationID': pa.array(pu, type=pa.int32()),
+        'DOLocationID': pa.array(do, type=pa.int32()),
+        'payment_type': pa.array(payment, type=pa.int64()),
+        'fare_amount': fare,
+        'tip_amount': tip,
+        'tolls_amount': tolls,
+        'total_amount': np.round(fare + tip + tolls + 4.5, 2),
+    }, schema=YELLOW_SCHEMA)
+
+
+def fhv_chunk(rng, n, year, month, weights):
+    pickup, seconds, pu, do, distance, airport = _trips(rng, n, year, month, weights)
+    licenses = LICENSES[rng.choice(len(LICENSES), size=n, p=LICENSE_SHARE)]
+    fare = np.round(2.5 + 1.9 * distance + 0.6 * seconds / 60 + rng.normal(0, 2.0, n), 2)
+    fare = np.maximum(fare, 5.0)
+    # Birkaç iptal / sıfır mesafeli kayıt
+    distance = np.where(rng.random(n) < 0.005, 0.0, np.round(distance, 3))
+
+    return pa.table({
+        'hvfhs_license_num': licenses,
+        'dispatching_base_num': pd.Series(licenses).map(BASES).to_numpy(),
+        'pickup_datetime': _to_timestamp(pickup),
+        'dropoff_datetime': _to_timestamp(pickup + seconds),
+        'PULocationID': pa.array(pu, type=pa.int32()),
+        'DOLocationID': pa.array(do, type=pa.int32()),
+        'trip_miles': distance,
+        'trip_time': seconds,
+        'base_passenger_fare': fare,
+        'tips': np.where(rng.random(n) < 0.15, np.round(fare * 0.15, 2), 0.0),
+        'driver_pay': np.round(fare * 0.72, 2),
+    }, schema=FHV_SCHEMA)
+
+
+CHUNK_WRITERS = {'yellow': yellow_chunk, 'fhv': fhv_chunk}
+
+
+def _params(source, year, month, rows, seed, chunk_size):
+    return json.dumps({'source': source, 'year': year, 'month': month, 'rows': rows,
+                       'seed': seed, 'chunk_size': chunk_size}, sort_keys=True)
+
+
+def generate_file(path, source, year, month, rows, seed=0, chunk_size=CHUNK_SIZE, weights=None):
+    """Tek bir aylık dosya; aynı parametrelerle üretilmiş dosya varsa yeniden yazılmaz."""
+    params = _params(source, year, month, rows, seed, chunk_size)
+    if os.path.exists(path):
+        metadata = pq.read_schema(path).metadata or {}
+        if metadata.get(b'synthetic') == params.encode():
+            return path
+    weights = zone_weights() if weights is None else weights
+    schema = {'yellow': YELLOW_SCHEMA, 'fhv': FHV_SCHEMA}[source]
+    schema = schema.with_metadata({b'synthetic': params.encode()})
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for i, offset in enumerate(range(0, rows, chunk_size)):
+            # Parça bazında tohum: sonuç parça sırasından ve süreçten bağımsızdır
+            rng = np.random.default_rng([seed, SOURCE_IDS[source], year, month, i])
+            table = CHUNK_WRITERS[source](rng, min(chunk_size, rows - offset), year, month, weights)
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def generate(data_dir, months, rows, fhv_rows=None, seed=0, chunk_size=CHUNK_SIZE, zone_lookup=None):
+    """Her ay için yellow + fhvhv dosyaları ve zone tablosu; [(yol, kaynak)] döndürür."""
+    zone_lookup = zone_lookup or os.path.join(DATA_DIR, ZONE_LOOKUP_FILE)
+    os.makedirs(data_dir, exist_ok=True)
+    target = os.path.join(data_dir, ZONE_LOOKUP_FILE)
+    if os.path.exists(zone_lookup) and os.path.abspath(zone_lookup) != os.path.abspath(target):
+        shutil.copyfile(zone_lookup, target)
+    weights = zone_weights(zone_lookup)
+
+    files = []
+    for year, month in months:
+        for source, n in (('yellow', rows), ('fhv', rows if fhv_rows is None else fhv_rows)):
+            path = os.path.join(data_dir, trip_filename(source, year, month))
+            files.append((generate_file(path, source, year, month, n, seed, chunk_size, weights), source))
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentetik TLC verisi üret")
+    parser.add_argument('--rows', type=int, default=100_000, help="Ay başına Yellow Taxi satır sayısı")
+    parser.add_argument('--fhv-rows', type=int, default=None, help="Ay başına FHVHV satır sayısı (varsayılan: --rows)")
+    parser.add_argument('--months', default=DEFAULT_MONTHS, help="Ay veya aralık, örn. 2024-01 ya da 2024-01:2024-03")
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, "synthetic"), help="Çıktı klasörü")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Parça / row group boyutu (satır)")
+    args = parser.parse_args(argv)
+
+    for path, source in generate(args.output, month_range(args.months), args.rows, args.fhv_rows,
+                                 args.seed, args.chunk_size):
+        print(f"  ✅ {path} ({pq.ParquetFile(path).metadata.num_rows:,} satır)")
+
+
+if __name__ == '__main__':
+    main()
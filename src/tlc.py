@@ -0,0 +1,75 @@
+"""
+NYC Urban Mobility Intelligence Platform
+TLC dosya adları, URL'ler ve ay aralıkları
+"""
+
+import os
+import re
+
+# Official NYC TLC Data - CI / çevrimdışı makinelerde TLC_BASE_URL ile yerel bir ayna
+# klasörü (aynı trip-data/ ve misc/ düzeninde) ya da yerel bir HTTP sunucusu verilebilir
+TLC_BASE_URL = "https://d37ci6vzurychx.cloudfront.net"
+BASE_URL = os.environ.get('TLC_BASE_URL', TLC_BASE_URL)
+ZONE_LOOKUP_FILE = "taxi_zone_lookup.csv"
+ZONE_LOOKUP_PATH = "misc/taxi+_zone_lookup.csv"
+
+# Kaynak adı -> TLC dosya öneki
+FILE_PREFIX = {'yellow': 'yellow', 'fhv': 'fhvhv'}
+
+TRIP_FILE_PATTERN = re.compile(r'^(yellow|fhvhv)_(\d{4})_(\d{2})\.parquet$')
+
+DEFAULT_MONTHS = "2024-01"
+
+
+def month_range(spec):
+    """'2024-01' veya '2023-01:2024-12' biçimindeki aralığı (yıl, ay) listesine çevirir."""
+    start, _, end = spec.partition(':')
+    end = end or start
+    start_year, start_month = (int(part) for part in start.split('-'))
+    end_year, end_month = (int(part) for part in end.split('-'))
+    if not 1 <= start_month <= 12 or not 1 <= end_month <= 12:
+        raise ValueError(f"Geçersiz ay: {spec}")
+    if (end_year, end_month) < (start_year, start_month):
+        raise ValueError(f"Ay aralığı ters: {spec}")
+
+    months = []
+    year, month = start_year, start_month
+    while (year, month) <= (end_year, end_month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def trip_filename(source, year, month):
+    return f"{FILE_PREFIX[source]}_{year}_{month:02d}.parquet"
+
+
+def parse_trip_filename(filename):
+    """'yellow_2024_01.parquet' -> ('yellow', 2024, 1); tanınmayan adlar için None."""
+    match = TRIP_FILE_PATTERN.match(os.path.basename(filename))
+    if match is None:
+        return None
+    prefix, year, month = match.groups()
+    source = {prefix_: source_ for source_, prefix_ in FILE_PREFIX.items()}[prefix]
+    return source, int(year), int(month)
+
+
+def trip_url(source, year, month, base_url=None):
+    base_url = (base_url or BASE_URL).rstrip('/')
+    return f"{base_url}/trip-data/{FILE_PREFIX[source]}_tripdata_{year}-{month:02d}.parquet"
+
+
+def tlc_urls(months, base_url=None):
+    base_url = (base_url or BASE_URL).rstrip('/')
+    urls = {}
+    for year, month in months:
+        for source in FILE_PREFIX:
+            urls[trip_filename(source, year, month)] = trip_url(source, year, month, base_url)
+    urls[ZONE_LOOKUP_FILE] = f"{base_url}/{ZONE_LOOKUP_PATH}"
+    return urls
+
+
+def trip_files(data_dir, months):
+    """(yol, kaynak) çiftleri - aylar sıralı, her ay için önce yellow sonra fhv."""
+    return [(os.path.join(data_dir, trip_filename(source, year, month)), source)
+            for year, month in months for source in FILE_PREFIX]
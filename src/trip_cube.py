@@ -0,0 +1,359 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Trip Cube - (tarih × saat × PU zone × DO zone × sağlayıcı) seyrek OLAP küpü ve sorgu katmanı
+
+Her dolu hücre bir satırdır; boyutlar ve ölçüler ayrı .npy sütunları olarak yazılır ve
+np.load(mmap_mode='r') ile belleğe eşlenerek açılır. Hücreler tarihe göre sıralıdır, bu
+yüzden tarih aralığı filtreleri ikili arama ile tek bir dilime iner.
+
+    cube = TripCube.open('data/stages/clean/cube', load_zone_index('data'))
+    cube.query(by=['provider'], pu_borough='Brooklyn', day=[5, 6],
+               hour=[22, 23, 0, 1, 2, 3, 4], provider=['Uber', 'Yellow'])
+
+analysis_results.json'daki tablo bölümleri de bu küpün sabit bir sorgu kümesidir
+(aggregates.TripAggregates.from_cube).
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cleaning import COMPANIES, DAY_ORDER
+from zone_index import N_ZONES, load_zone_index
+
+CUBE_VERSION = 1
+CUBE_META = "cube.json"
+
+PROVIDERS = ['Yellow'] + COMPANIES
+DIMENSIONS = ('date', 'hour', 'pu', 'do', 'provider')
+# Tarih 1970-01-01'den bu yana gün sayısıdır (uint16: 2149'a kadar)
+SHAPE = (1 << 16, 24, N_ZONES, N_ZONES, len(PROVIDERS))
+DIM_DTYPES = {'date': np.uint16, 'hour': np.uint8, 'pu': np.uint16, 'do': np.uint16, 'provider': np.uint8}
+
+# trips dışındaki ölçüler hücre toplamıdır; ortalama = toplam / trips
+MEASURES = ('trips', 'revenue', 'fare', 'tips', 'tip_pct', 'distance', 'duration')
+
+# Sorgularda gruplanabilen boyutlar: saklananlar + türetilenler (gün, borough)
+QUERY_DIMENSIONS = DIMENSIONS + ('day', 'pu_borough', 'do_borough')
+
+# Gruplama anahtar uzayı bu boyuta kadar yoğun bincount ile, üstünde np.unique ile toplanır
+DENSE_GROUPS = 1 << 22
+
+# Derleme sırasında bekleyen hücre sayısı bu eşiği geçince parçalar birleştirilir
+COMPACT_CELLS = 4_000_000
+
+
+def _zone_ids(df, column):
+    ids = df[column].to_numpy().astype(np.int64)
+    return np.where((ids > 0) & (ids < N_ZONES), ids, 0)
+
+
+def cell_codes(df, source):
+    """Her seyahatin hücre kodu (boyutların ravel edilmiş indeksi)."""
+    dates = df['pickup_datetime'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    if source == 'yellow':
+        provider = np.zeros(len(df), dtype=np.int64)
+    else:
+        codes = pd.Categorical(df['company'], categories=COMPANIES).codes.astype(np.int64)
+        provider = 1 + np.where(codes < 0, COMPANIES.index('Other'), codes)
+    return np.ravel_multi_index((dates, df['hour'].to_numpy().astype(np.int64),
+                                 _zone_ids(df, 'PULocationID'), _zone_ids(df, 'DOLocationID'), provider), SHAPE)
+
+
+def cell_values(df, source):
+    """(seyahat × ölçü) matrisi; kaynakların sütunları ortak ölçülere eşlenir."""
+    if source == 'yellow':
+        fare = df['fare_amount'].to_numpy(dtype=np.float64)
+        tips = df['tip_amount'].to_numpy(dtype=np.float64)
+        revenue = df['total_fare'].to_numpy(dtype=np.float64)
+        tip_pct = df['tip_percentage'].to_numpy(dtype=np.float64)
+        distance = df['trip_distance'].to_numpy(dtype=np.float64)
+        duration = df['trip_duration'].to_numpy(dtype=np.float64)
+    else:
+        fare = df['base_passenger_fare'].to_numpy(dtype=np.float64)
+        tips = df['tips'].to_numpy(dtype=np.float64)
+        revenue = fare + tips
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tip_pct = np.where(fare > 0, np.clip(tips / fare * 100, 0, 100), 0.0)
+        distance = df['trip_miles'].to_numpy(dtype=np.float64)
+        duration = df['trip_time'].to_numpy(dtype=np.float64) / 60
+    return np.column_stack([np.ones(len(df)), revenue, fare, tips, tip_pct, distance, duration])
+
+
+def _reduce(codes, values):
+    """Aynı koddaki satırları toplar; kodlar sıralı ve tekil döner."""
+    cells, inverse = np.unique(codes, return_inverse=True)
+    sums = np.empty((len(cells), values.shape[1]))
+    for j in range(values.shape[1]):
+        sums[:, j] = np.bincount(inverse, weights=values[:, j], minlength=len(cells))
+    return cells, sums
+
+
+class CubeBuilder:
+    """Batch'lerden küp derler; `merge` ile süreçler arasında birleştirilebilir."""
+
+    def __init__(self):
+        self.codes = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, len(MEASURES)))
+        self.rows = 0
+        self._pending = []
+        self._pending_cells = 0
+
+    def update(self, df, source):
+        if len(df) == 0:
+            return self
+        self._add(*_reduce(cell_codes(df, source), cell_values(df, source)))
+        self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        other.compact()
+        self._add(other.codes, other.values)
+        self.rows += other.rows
+        return self
+
+    def _add(self, codes, values):
+        self._pending.append((codes, values))
+        self._pending_cells += len(codes)
+        if self._pending_cells > COMPACT_CELLS:
+            self.compact()
+
+    def compact(self):
+        if self._pending:
+            parts = [(self.codes, self.values)] + self._pending
+            self.codes, self.values = _reduce(np.concatenate([c for c, _ in parts]),
+                                              np.concatenate([v for _, v in parts]))
+            self._pending = []
+            self._pending_cells = 0
+        return self
+
+    def __getstate__(self):
+        # İşçiden dönerken yalnızca birleştirilmiş diziler taşınır
+        self.compact()
+        return self.__dict__
+
+    def finish(self, zone_index=None):
+        self.compact()
+        dims = np.unravel_index(self.codes, SHAPE)
+        columns = {name: dim.astype(DIM_DTYPES[name]) for name, dim in zip(DIMENSIONS, dims)}
+        columns['trips'] = self.values[:, 0].astype(np.uint32)
+        for j, name in enumerate(MEASURES[1:], start=1):
+            columns[name] = self.values[:, j].astype(np.float32)
+        return TripCube(columns, zone_index)
+
+
+def build_cube(frames, zone_index=None):
+    """{kaynak: temizlenmiş çerçeve} -> TripCube; her çerçeve tek geçişte hücrelere indirgenir."""
+    builder = CubeBuilder()
+    for source, df in frames.items():
+        builder.update(df, source)
+    return builder.finish(zone_index)
+
+
+class TripCube:
+    """Seyrek küp sütunları; `query` filtre + roll-up, `save` / `open` kalıcı hâl."""
+
+    def __init__(self, columns, zone_index=None):
+        self.columns = columns
+        self.zone_index = zone_index
+
+    def __len__(self):
+        return len(self.columns['trips'])
+
+    @property
+    def total(self):
+        return int(self.columns['trips'].sum(dtype=np.int64))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in DIMENSIONS + MEASURES:
+            np.save(os.path.join(path, f"{name}.npy"), self.columns[name])
+        dates = self.columns['date']
+        meta = {
+            'version': CUBE_VERSION,
+            'cells': len(self),
+            'trips': self.total,
+            'dimensions': list(DIMENSIONS),
+            'measures': list(MEASURES),
+            'providers': PROVIDERS,
+            'dates': [str(np.datetime64(int(dates[0]), 'D')), str(np.datetime64(int(dates[-1]), 'D'))] if len(self) else None,
+        }
+        # Meta en son yazılır; yarıda kalan bir küp açılmaz
+        with open(os.path.join(path, CUBE_META), 'w') as f:
+            json.dump(meta, f, indent=2)
+        return path
+
+    @classmethod
+    def open(cls, path, zone_index=None):
+        with open(os.path.join(path, CUBE_META), 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != CUBE_VERSION:
+            raise ValueError(f"Küp sürümü desteklenmiyor: {meta['version']} ({path})")
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in DIMENSIONS + MEASURES}
+        return cls(columns, zone_index)
+
+    # ------------------------------------------------------------------ sorgu
+    def _boroughs(self):
+        if self.zone_index is None:
+            raise ValueError("Borough filtreleri için küp zone_index ile açılmalı")
+        return self.zone_index.codes('Borough', np.arange(N_ZONES)).astype(np.int64) + 1
+
+    def _codes(self, name, values):
+        """Filtre değerlerinin (isim ya da numara) boyut kodları; geçersiz değerler ValueError."""
+        values = [values] if isinstance(values, (str, int, np.integer)) else list(values)
+        if name in ('pu_borough', 'do_borough'):
+            self._boroughs()
+            labels = [None] + list(self.zone_index.categories['Borough'])
+        else:
+            labels = {'provider': PROVIDERS, 'day': DAY_ORDER}.get(name)
+        size = len(labels) if labels is not None else SHAPE[DIMENSIONS.index(name)]
+        codes = []
+        for value in values:
+            if isinstance(value, str) and labels is not None:
+                if value not in labels:
+                    raise ValueError(f"Bilinmeyen {name} değeri: {value} (geçerli: {', '.join(labels[1:] if labels[0] is None else labels)})")
+                code = labels.index(value)
+            else:
+                code = int(value)
+            if not 0 <= code < size:
+                raise ValueError(f"{name} değeri aralık dışında: {value}")
+            codes.append(code)
+        return codes
+
+    def _lookup(self, name, values):
+        """(sütun adı, boolean tablo): satır filtresi tablo[sütun] ile tek bir take'e iner."""
+        codes = self._codes(name, values)
+        if name == 'day':
+            return 'date', np.isin((np.arange(SHAPE[0]) + 3) % 7, codes)
+        if name in ('pu_borough', 'do_borough'):
+            return name[:2], np.isin(self._boroughs(), codes)
+        table = np.zeros(SHAPE[DIMENSIONS.index(name)], dtype=bool)
+        table[codes] = True
+        return name, table
+
+    def _rows(self, start=None, end=None):
+        """Tarih aralığına düşen hücre dilimi (hücreler tarihe göre sıralı)."""
+        dates = self.columns['date']
+        lo = 0 if start is None else np.searchsorted(dates, _day(start), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, _day(end), side='right')
+        return slice(int(lo), int(hi))
+
+    def _dim(self, name, rows, index):
+        """Gruplama anahtarı: (kodlar, kod sayısı, kodu etikete çevirirken eklenecek taban)."""
+        if name == 'date':
+            # Dilimdeki ilk tarihe göre: kod sayısı 65536 yerine sorgulanan gün sayısı olur
+            dates = self.columns['date'][rows]
+            base = int(dates[0]) if len(dates) else 0
+            span = int(dates[-1]) - base + 1 if len(dates) else 1
+            return np.asarray(dates[index], dtype=np.int64) - base, span, base
+        if name == 'day':
+            return (self.columns['date'][rows][index].astype(np.int64) + 3) % 7, 7, 0
+        if name in ('pu_borough', 'do_borough'):
+            boroughs = self._boroughs()
+            return boroughs[self.columns[name[:2]][rows][index]], len(self.zone_index.categories['Borough']) + 1, 0
+        return self.columns[name][rows][index].astype(np.int64), SHAPE[DIMENSIONS.index(name)], 0
+
+    def _labels(self, name, codes):
+        if name == 'date':
+            return pd.to_datetime(codes, unit='D').date
+        if name == 'provider':
+            return np.asarray(PROVIDERS, dtype=object)[codes]
+        if name == 'day':
+            return np.asarray(DAY_ORDER, dtype=object)[codes]
+        if name in ('pu_borough', 'do_borough'):
+            return np.concatenate([[None], np.asarray(self.zone_index.categories['Borough'], dtype=object)])[codes]
+        return codes
+
+    def query(self, by=(), measures=MEASURES, start=None, end=None, **filters):
+        """Filtrelenmiş ve `by` boyutlarına indirgenmiş ölçü toplamları (DataFrame).
+
+        Filtreler boyut adlarıyla verilir; değer tek bir öğe ya da liste olabilir:
+        date dışındaki her boyut (hour, day, pu, do, provider, pu_borough, do_borough).
+        Gün ve sağlayıcı isimle ya da numarayla, tarih aralığı start / end (dahil) ile seçilir.
+        """
+        unknown = [name for name in list(by) + list(filters) if name not in QUERY_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Bilinmeyen boyut: {', '.join(unknown)} (geçerli: {', '.join(QUERY_DIMENSIONS)})")
+        rows = self._rows(start, end)
+        mask = None
+        for name, values in filters.items():
+            if values is None:
+                continue
+            column, table = self._lookup(name, values)
+            selected = table[self.columns[column][rows]]
+            mask = selected if mask is None else mask & selected
+        # Filtre yoksa tarih dilimi kopyalanmadan kullanılır
+        index = slice(None) if mask is None else np.flatnonzero(mask)
+        n_rows = rows.stop - rows.start if mask is None else len(index)
+
+        keys = [self._dim(name, rows, index) for name in by]
+        sizes = [size for _, size, _ in keys]
+        codes = np.ravel_multi_index([key for key, _, _ in keys], sizes) if keys else np.zeros(n_rows, dtype=np.int64)
+        n_groups = int(np.prod(sizes)) if keys else 1
+        if n_groups <= DENSE_GROUPS:
+            # Küçük anahtar uzayı: sıralama yok, yoğun bincount + boş olmayan gruplar
+            groups = np.flatnonzero(np.bincount(codes, minlength=n_groups)) if keys else np.zeros(1, dtype=np.int64)
+            inverse, size = codes, n_groups
+        else:
+            groups, inverse = np.unique(codes, return_inverse=True)
+            size = len(groups)
+
+        data = {}
+        for (name, (_, _, base)), labels in zip(zip(by, keys), np.unravel_index(groups, sizes) if keys else ()):
+            data[name] = self._labels(name, labels + base)
+        for name in measures:
+            weights = self.columns[name][rows][index].astype(np.float64)
+            sums = np.bincount(inverse, weights=weights, minlength=size)
+            if size != len(groups):
+                sums = sums[groups]
+            data[name] = sums.astype(np.int64) if name == 'trips' else sums
+        return pd.DataFrame(data)
+
+
+def _day(value):
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def hour_range(value):
+    """'22-4', '7-9,17-19' ya da '8' -> saat listesi; '22-4' gibi aralıklar gece yarısını sarar."""
+    hours = []
+    for part in value.split(','):
+        first, _, last = part.partition('-')
+        first, last = int(first), int(last or first)
+        if not (0 <= first < 24 and 0 <= last < 24):
+            raise ValueError(f"Saat 0-23 arasında olmalı: {part}")
+        hours.extend(h % 24 for h in range(first, last + (24 if last < first else 0) + 1))
+    return hours
+
+
+# =============================================================================
+# CLI: python src/trip_cube.py data/stages/clean/cube --by provider --pu-borough Brooklyn --day 5 6
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trip Cube sorgusu")
+    parser.add_argument('path', help="küp dizini (ör. data/stages/clean/cube)")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'),
+                        help="taxi_zone_lookup.csv'nin bulunduğu dizin")
+    parser.add_argument('--by', default='', help="virgülle ayrılmış gruplama boyutları")
+    parser.add_argument('--start', help="ilk tarih (YYYY-MM-DD)")
+    parser.add_argument('--end', help="son tarih (YYYY-MM-DD, dahil)")
+    parser.add_argument('--hours', type=hour_range, help="saat ya da aralık (ör. 22-4)")
+    parser.add_argument('--day', nargs='+', help="gün numarası ya da adı (0 = Monday)")
+    parser.add_argument('--provider', nargs='+', choices=PROVIDERS)
+    parser.add_argument('--pu-borough', nargs='+')
+    parser.add_argument('--do-borough', nargs='+')
+    args = parser.parse_args(argv)
+
+    cube = TripCube.open(args.path, load_zone_index(args.data_dir))
+    days = [int(d) if d.isdigit() else d for d in args.day] if args.day else None
+    result = cube.query(by=[name for name in args.by.split(',') if name], start=args.start, end=args.end,
+                        hour=args.hours, day=days, provider=args.provider,
+                        pu_borough=args.pu_borough, do_borough=args.do_borough)
+    print(result.round(2).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Trip Store - temizlenmiş seyahat sütunları için memory-map edilen Arrow IPC deposu
+
+    store = TripStore.open('data/stages/clean')
+    df = store.frame('yellow', columns=['hour', 'fare_amount'])       # pandas, kompakt şema
+    arrays = store.arrays('fhv', ['hour', 'trip_miles'], 0, 100_000)   # NumPy görünümleri
+
+Her kaynak sıkıştırılmamış, tek parçalı bir Arrow IPC dosyası (<kaynak>.arrow) olarak bir kez
+yazılır. Dosya okunmaz, belleğe eşlenir: aynı depoya bağlanan bütün süreçler işletim sisteminin
+sayfa önbelleğindeki tek kopyayı paylaşır. Sayısal ve null içermeyen sütunlar NumPy / pandas'a
+kopyasız gelir; işçilere çerçeve değil yalnızca (depo yolu, kaynak, satır aralığı) gönderilir.
+
+`TripStore.share` aynı depoyu paylaşılan bellekte (/dev/shm, tmpfs) geçici olarak kurar;
+`map_shards` bir fonksiyonu satır dilimleri üzerinde süreç havuzunda çalıştırır.
+"""
+
+import contextlib
+import functools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+
+from cleaning import apply_compact_schema
+
+STORE_SUFFIX = ".arrow"
+
+# Linux'ta paylaşılan bellek; yoksa sistemin geçici dizini kullanılır
+SHARED_ROOT = "/dev/shm"
+
+
+def write_table(path, df):
+    """Çerçeveyi tek record batch'lik Arrow IPC dosyasına yazar (önce .tmp, sonra os.replace)."""
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, path)
+
+
+class TripStore:
+    """<kök>/<kaynak>.arrow dosyaları; tablolar ilk erişimde memory-map ile açılır."""
+
+    def __init__(self, root):
+        self.root = root
+        self._tables = {}
+
+    @classmethod
+    def write(cls, root, frames):
+        os.makedirs(root, exist_ok=True)
+        for source, df in frames.items():
+            write_table(os.path.join(root, f"{source}{STORE_SUFFIX}"), df)
+        return cls(root)
+
+    @classmethod
+    def open(cls, root):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Seyahat deposu bulunamadı: {root}")
+        return cls(root)
+
+    @classmethod
+    @contextlib.contextmanager
+    def share(cls, frames):
+        """Çerçeveleri paylaşılan bellekte geçici bir depoya yazar; blok sonunda silinir."""
+        root = tempfile.mkdtemp(prefix='trip_store_', dir=SHARED_ROOT if os.path.isdir(SHARED_ROOT) else None)
+        try:
+            yield cls.write(root, frames)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def path(self, source):
+        return os.path.join(self.root, f"{source}{STORE_SUFFIX}")
+
+    @property
+    def sources(self):
+        return sorted(name[:-len(STORE_SUFFIX)] for name in os.listdir(self.root) if name.endswith(STORE_SUFFIX))
+
+    def table(self, source):
+        if source not in self._tables:
+            if not os.path.exists(self.path(source)):
+                raise KeyError(f"Depoda kaynak yok: {source} ({self.root})")
+            self._tables[source] = pa.ipc.open_file(pa.memory_map(self.path(source))).read_all()
+        return self._tables[source]
+
+    def num_rows(self, source):
+        return self.table(source).num_rows
+
+    def _slice(self, source, columns=None, start=0, stop=None):
+        table = self.table(source)
+        stop = table.num_rows if stop is None else min(stop, table.num_rows)
+        table = table.slice(start, max(stop - start, 0))
+        return table if columns is None else table.select(columns)
+
+    def frame(self, source, columns=None, start=0, stop=None):
+        """Satır aralığı [start, stop) için kompakt şemada pandas çerçevesi."""
+        return apply_compact_schema(self._slice(source, columns, start, stop).to_pandas(split_blocks=True))
+
+    def frames(self, columns=None):
+        return {source: self.frame(source, columns) for source in self.sources}
+
+    def arrays(self, source, columns, start=0, stop=None):
+        """{sütun: np.ndarray}; sayısal ve null içermeyen sütunlar eşlenen belleğe kopyasız görünümdür."""
+        table = self._slice(source, columns, start, stop)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+
+    def shards(self, source, n):
+        """Kaynağı n'e yakın eşit satır aralığına böler: [(start, stop)]."""
+        bounds = np.linspace(0, self.num_rows(source), max(n, 1) + 1).astype(np.int64)
+        return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+@functools.lru_cache(maxsize=None)
+def attach(root):
+    """Süreç başına tek TripStore; aynı işçideki ardışık görevler eşlemeyi yeniden kullanır."""
+    return TripStore.open(root)
+
+
+def _shard_task(task):
+    root, func, source, columns, start, stop = task
+    return func(attach(root).frame(source, columns, start, stop), source)
+
+
+def map_shards(store, func, sources=None, columns=None, workers=None):
+    """func(çerçeve, kaynak) her satır dilimi için süreç havuzunda; sonuç [(kaynak, değer)].
+
+    func modül düzeyinde tanımlı olmalıdır (pickle ile işçiye gider). Her kaynak işçi sayısı kadar
+    dilime bölünür; tek işçide görevler bu süreçte sırayla çalışır.
+    """
+    workers = workers or os.cpu_count() or 1
+    sources = sources or store.sources
+    tasks = [(store.root, func, source, columns, start, stop)
+             for source in sources for start, stop in store.shards(source, workers)]
+    if workers == 1 or len(tasks) <= 1:
+        results = [func(store.frame(source, columns, start, stop), source) for _, _, source, _, start, stop in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_shard_task, tasks))
+    return [(task[2], result) for task, result in zip(tasks, results)]
@@ -0,0 +1,420 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Tuning - bahşiş, talep ve süre modelleri için zamana duyarlı çapraz doğrulama ve hiperparametre araması
+
+    python src/tuning.py --months 2024-01:2024-03 --models tip,duration --search halving --trials 27
+    python src/pipeline.py --stages tune,save --months 2024-01:2024-03    # sonuç ml_results.tuning'e
+
+Her model için özellik matrisi bir kez kurulur, zamana göre sıralanır ve paylaşılan belleğe
+(multiprocessing.shared_memory) yazılır; süreç havuzundaki işçiler bloğa adıyla bağlanır, deneme
+başına veri kopyalanmaz ya da pickle edilmez. Kat'lar genişleyen pencerelidir (TimeSeriesSplit):
+model her zaman doğrulama dönemin öncesiyle eğitilir. Süre modelinin od_* özellikleri de kat
+başına, yalnızca doğrulama penceresinden önceki seyahatlerle kurulan OD matrisinden gelir.
+
+    random    bütün adaylar tam veriyle
+    halving   ardışık yarılama: adaylar önce verinin en yeni 1/eta^k kısmıyla denenir, her turda
+              en iyi 1/eta'sı bir sonraki (eta kat büyük) bütçeye geçer
+
+İşçi başına tek iş parçacığı kullanılır (paralellik denemeler arasındadır). Mevcut sabit
+parametreler her zaman aday 0'dır; sonuç tablosu iyileşmeyi buna göre verir. --deadline ile
+süre sınırı verilirse sınıra ulaşıldıktan sonra yeni deneme başlatılmaz (gece penceresi).
+"""
+
+import argparse
+import itertools
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+
+from advanced_models import DURATION_FEATURES, DURATION_PARAMS, MODEL_COLS, duration_filter
+from feature_store import ensure_features, iter_feature_batches, load_features, raw_rows
+from main_analysis import (DATA_DIR, DEMAND_FEATURES, DEMAND_PARAMS, TIP_FEATURES, TIP_PARAMS, hourly_demand, load,
+                           tip_rows)
+from od_matrix import COLUMNS as OD_COLUMNS, OD_FEATURES, ODBuilder
+from profiling import measure
+from tlc import DEFAULT_MONTHS, month_range
+
+SEARCHES = ('random', 'halving')
+FOLDS = 3
+ETA = 3
+MIN_ROWS = 2_000  # yarılamanın ilk turunda kat başına en az satır
+
+XGB_SPACE = {
+    'n_estimators': [50, 100, 200, 400],
+    'max_depth': [4, 5, 6, 8, 10],
+    'learning_rate': [0.03, 0.05, 0.1, 0.2],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.7, 0.85, 1.0],
+    'min_child_weight': [1, 5, 20],
+}
+RF_SPACE = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 8, 12, None],
+    'min_samples_leaf': [1, 2, 5, 10],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+
+# Model -> (tahminci, mevcut parametreler, arama uzayı)
+MODELS = {
+    'tip': ('xgb', TIP_PARAMS, XGB_SPACE),
+    'demand': ('rf', DEMAND_PARAMS, RF_SPACE),
+    'duration': ('xgb', DURATION_PARAMS, XGB_SPACE),
+}
+
+
+# =============================================================================
+# VERİ (zamana göre sıralı float32 matrisler)
+# =============================================================================
+def _sample(paths, columns, rows):
+    total = sum(raw_rows(path) for path in paths)
+    df = pd.concat([load_features(path, columns=columns, frac=rows / max(total, 1), random_state=42)
+                    for path in paths], ignore_index=True)
+    return df.sort_values('pickup_datetime', kind='stable', ignore_index=True)
+
+
+def _epoch(values):
+    return np.asarray(values).astype('datetime64[ns]').view(np.int64)
+
+
+def tip_matrix(paths, rows=300_000):
+    """(X, y, kat özellikleri); kat'a bağlı özellik olmayan modellerde üçüncü değer None'dır."""
+    X, y = tip_rows(_sample(paths, TIP_FEATURES + ['tip_percentage', 'pickup_datetime'], rows))
+    return X.to_numpy(np.float32), y.to_numpy(np.float32), None
+
+
+def duration_matrix(paths, rows=300_000):
+    """od_* dışındaki özellikler; od_* her kat için DurationFolds ile ayrıca kurulur."""
+    df = duration_filter(_sample(paths, MODEL_COLS + ['pickup_datetime'], rows))
+    base = [name for name in DURATION_FEATURES if name not in OD_FEATURES]
+    df = df.loc[df[base].dropna().index]
+    return (df[base].to_numpy(np.float32), df['trip_duration'].to_numpy(np.float32),
+            DurationFolds(paths, df))
+
+
+def demand_matrix(raw_paths, rows=None):
+    df = pd.concat([hourly_demand(path) for path in raw_paths], ignore_index=True)
+    df = df.sort_values(['date', 'hour'], kind='stable', ignore_index=True)
+    return df[DEMAND_FEATURES].to_numpy(np.float32), df['trip_count'].to_numpy(np.float32), None
+
+
+def prior_matrices(paths, cutoffs, batch_size=1_000_000):
+    """Artan zaman sınırlarının her biri için yalnızca sınırdan önceki seyahatlerle kurulan OD matrisi.
+
+    Dosyalar bir kez okunur: seyahatler sınırlar arasındaki dilimlerin ODBuilder'larına düşer,
+    matrisler dilimler sırayla birleştirilerek üretilir (generator; aynı anda tek matris bellekte).
+    """
+    cutoffs = np.asarray(cutoffs, dtype=np.int64)
+    builders = [ODBuilder() for _ in cutoffs]
+    for path in paths:
+        for df in iter_feature_batches(path, batch_size, OD_COLUMNS + ['pickup_datetime']):
+            segment = np.searchsorted(cutoffs, _epoch(df['pickup_datetime']), side='right')
+            for k in np.unique(segment[segment < len(cutoffs)]):
+                builders[k].update(df[segment == k])
+    prior = ODBuilder()
+    for k in range(len(builders)):
+        prior.merge(builders[k])
+        builders[k] = None
+        yield prior.matrix()
+
+
+class DurationFolds:
+    """Süre modelinin od_* özellikleri, doğrulama penceresi başına ayrı OD matrisinden.
+
+    Her doğrulama penceresinin matrisi yalnızca pencerenin ilk seyahatinden önceki seyahatlerle
+    kurulur: kat'ın eğitim satırları kendi dönemlerinin değerlerini görür, doğrulama satırlarının
+    süreleri hiçbir zaman kendi özelliklerine girmez.
+    """
+
+    def __init__(self, paths, df):
+        self.paths = paths
+        self.keys = df[['PULocationID', 'DOLocationID', 'hour']]
+        self.times = _epoch(df['pickup_datetime'])
+
+    def __call__(self, X, starts):
+        """(X + sınır başına od_* sütunları, {doğrulama başlangıcı: kat'ın DURATION_FEATURES sütunları})."""
+        cutoffs = sorted({int(self.times[start]) for start in starts})
+        base = list(range(X.shape[1]))
+        blocks, columns = [X], {}
+        for k, od in enumerate(prior_matrices(self.paths, cutoffs)):
+            features = od.features(self.keys['PULocationID'], self.keys['DOLocationID'], self.keys['hour'])
+            blocks.append(np.column_stack([features[name] for name in OD_FEATURES]).astype(np.float32))
+            first = X.shape[1] + k * len(OD_FEATURES)
+            columns[cutoffs[k]] = base + list(range(first, first + len(OD_FEATURES)))
+        return np.hstack(blocks), {start: columns[int(self.times[start])] for start in starts}
+
+
+# =============================================================================
+# PAYLAŞILAN BELLEK
+# =============================================================================
+class SharedMatrix:
+    """X ve y tek bir paylaşılan bellek bloğunda; spec ile işçiler kopyasız bağlanır."""
+
+    def __init__(self, X, y):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.ascontiguousarray(y, dtype=np.float32)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes + y.nbytes, 1))
+        self.spec = (self.shm.name, X.shape, y.shape)
+        self.X, self.y = attach_arrays(self.shm, self.spec)
+        self.X[:] = X
+        self.y[:] = y
+
+    def close(self):
+        self.X = self.y = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def attach_arrays(shm, spec):
+    _, x_shape, y_shape = spec
+    X = np.ndarray(x_shape, dtype=np.float32, buffer=shm.buf)
+    y = np.ndarray(y_shape, dtype=np.float32, buffer=shm.buf, offset=X.nbytes)
+    return X, y
+
+
+_shared = {}
+
+
+def _attach(spec):
+    """İşçi başlatıcısı: bloğa bağlanır (süreç ömrü boyunca açık kalır)."""
+    shm = shared_memory.SharedMemory(name=spec[0])
+    _shared['shm'] = shm
+    _shared['X'], _shared['y'] = attach_arrays(shm, spec)
+
+
+# =============================================================================
+# DENEME
+# =============================================================================
+def make_estimator(kind, params):
+    params = dict(params, n_jobs=1)
+    if kind == 'xgb':
+        return xgb.XGBRegressor(tree_method='hist', **params)
+    return RandomForestRegressor(**params)
+
+
+def window_start(rows, fraction):
+    """Verinin en yeni `fraction` kısmının başladığı satır."""
+    return rows - max(int(rows * fraction), 1)
+
+
+def validation_starts(rows, fractions, folds=FOLDS):
+    """Bütün bütçelerdeki kat'ların doğrulama pencerelerinin ilk satırları (mutlak konum)."""
+    starts = set()
+    for fraction in fractions:
+        start = window_start(rows, fraction)
+        for _, test in TimeSeriesSplit(n_splits=folds).split(np.empty((rows - start, 1))):
+            starts.add(start + int(test[0]))
+    return sorted(starts)
+
+
+def cross_validate(kind, params, X, y, folds=FOLDS, offset=0, columns=None):
+    """Genişleyen pencereli kat'larda ortalama MAE / R² ve toplam eğitim süresi.
+
+    columns verilirse kat'ın sütunları columns[offset + doğrulama başlangıcı] ile seçilir
+    (kat'a bağlı özellikler, ör. süre modelinin od_*).
+    """
+    maes, r2s, fit_s = [], [], 0.0
+    for train, test in TimeSeriesSplit(n_splits=folds).split(X):
+        # Kat'lar ardışık aralıklardır; dilimler paylaşılan bloğun görünümüdür, kopya değil
+        train, test = slice(train[0], train[-1] + 1), slice(test[0], test[-1] + 1)
+        X_train, X_test = X[train], X[test]
+        if columns is not None:
+            # Sütun seçimi kat'ın kopyasını alır
+            X_train, X_test = X_train[:, columns[offset + test.start]], X_test[:, columns[offset + test.start]]
+        model = make_estimator(kind, params)
+        started = time.perf_counter()
+        model.fit(X_train, y[train])
+        fit_s += time.perf_counter() - started
+        pred = model.predict(X_test)
+        maes.append(mean_absolute_error(y[test], pred))
+        r2s.append(r2_score(y[test], pred))
+    return float(np.mean(maes)), float(np.mean(r2s)), fit_s
+
+
+def _trial(task):
+    """İşçide: verinin en yeni `fraction` kısmı (paylaşılan bloğun görünümü) üzerinde çapraz doğrulama."""
+    index, kind, params, fraction, folds, columns = task
+    X, y = _shared['X'], _shared['y']
+    start = window_start(len(X), fraction)
+    started = time.perf_counter()
+    mae, r2, fit_s = cross_validate(kind, params, X[start:], y[start:], folds, start, columns)
+    return {'candidate': index, 'params': params, 'fraction': round(fraction, 4), 'rows': len(X) - start,
+            'mae': mae, 'r2': r2, 'fit_s': round(fit_s, 3), 'wall_s': round(time.perf_counter() - started, 3)}
+
+
+def candidates(base, space, n, random_state=42):
+    """Mevcut parametreler + uzaydan rastgele (tekrarsız) n - 1 aday."""
+    rng = np.random.default_rng(random_state)
+    result = [dict(base)]
+    seen = {repr(sorted(result[0].items()))}
+    limit = math.prod(len(values) for values in space.values())
+    while len(result) < min(n, limit + 1):
+        params = dict(base, **{key: values[rng.integers(len(values))] for key, values in space.items()})
+        key = repr(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            result.append(params)
+    return result
+
+
+def halving_rungs(n, rows, folds=FOLDS, eta=ETA):
+    """Ardışık yarılama turlarının veri oranları (en küçükten 1'e)."""
+    rungs = int(math.log(max(n, 1), eta)) + 1
+    smallest = min(1.0, MIN_ROWS * (folds + 1) / max(rows, 1))
+    fractions = [eta ** -(rungs - 1 - i) for i in range(rungs)]
+    return sorted({max(f, smallest) for f in fractions})
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.at = None if seconds is None else time.monotonic() + seconds
+
+    @property
+    def passed(self):
+        return self.at is not None and time.monotonic() >= self.at
+
+
+def _run(pool, tasks, deadline, width):
+    """Denemeleri en fazla `width` tanesi havuzda olacak şekilde verir; süre dolunca yenisi verilmez."""
+    tasks = iter(tasks)
+    running = {pool.submit(_trial, task) for task in itertools.islice(tasks, width)}
+    results = []
+    while running:
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        results += [future.result() for future in done]
+        if not deadline.passed:
+            running |= {pool.submit(_trial, task) for task in itertools.islice(tasks, len(done))}
+    return results
+
+
+def search(name, X, y, method='halving', trials=27, workers=None, folds=FOLDS, deadline=None, random_state=42,
+           fold_features=None):
+    """Tek model için arama; sonuç ml_results.tuning'e yazılan özet.
+
+    fold_features(X, doğrulama başlangıçları) verilirse kat'a bağlı sütunlar X'e eklenir ve her kat
+    kendi sütunlarıyla değerlendirilir (DurationFolds).
+    """
+    if method not in SEARCHES:
+        raise ValueError(f"Bilinmeyen arama: {method} (seçenekler: {', '.join(SEARCHES)})")
+    kind, base, space = MODELS[name]
+    pool_size = workers or os.cpu_count() or 1
+    deadline = Deadline(deadline)
+    pending = list(enumerate(candidates(base, space, trials, random_state)))
+    fractions = halving_rungs(len(pending), len(X), folds) if method == 'halving' else [1.0]
+    history = []
+
+    started = time.perf_counter()
+    columns = None
+    if fold_features is not None:
+        with measure(f'tune.{name}.fold_features', rows_in=len(X)):
+            X, columns = fold_features(X, validation_starts(len(X), fractions, folds))
+    with measure(f'tune.{name}', rows_in=len(X)), SharedMatrix(X, y) as shared, \
+            ProcessPoolExecutor(max_workers=pool_size, initializer=_attach, initargs=(shared.spec,)) as pool:
+        for rung, fraction in enumerate(fractions):
+            tasks = [(i, kind, params, fraction, folds, columns) for i, params in pending]
+            results = _run(pool, tasks, deadline, pool_size)
+            for result in results:
+                result['rung'] = rung
+            history += results
+            if deadline.passed or rung == len(fractions) - 1:
+                break
+            ranked = sorted(results, key=lambda r: r['mae'])
+            # Mevcut parametreler karşılaştırma için her turda kalır
+            keep = {r['candidate'] for r in ranked[:max(1, math.ceil(len(ranked) / ETA))]} | {0}
+            pending = [(i, params) for i, params in pending if i in keep]
+    wall = time.perf_counter() - started
+
+    # En iyi aday: en büyük bütçede değerlendirilenler arasından
+    top = max(r['fraction'] for r in history)
+    final = sorted((r for r in history if r['fraction'] == top), key=lambda r: r['mae'])
+    best = final[0]
+    baseline = next((r for r in final if r['candidate'] == 0), None)
+    return {
+        'search': method,
+        'rows': int(len(X)),
+        'folds': folds,
+        'candidates': len(set(r['candidate'] for r in history)),
+        'trials': len(history),
+        'rungs': [{'fraction': round(f, 4), 'trials': sum(r['fraction'] == round(f, 4) for r in history)}
+                  for f in fractions if any(r['fraction'] == round(f, 4) for r in history)],
+        'best_params': {k: v for k, v in best['params'].items() if k not in ('n_jobs', 'random_state')},
+        'cv_mae': round(best['mae'], 4),
+        'cv_r2': round(best['r2'], 4),
+        'baseline_cv_mae': None if baseline is None else round(baseline['mae'], 4),
+        'improvement_pct': None if baseline is None or baseline['mae'] == 0
+        else round((baseline['mae'] - best['mae']) / baseline['mae'] * 100, 2),
+        'wall_s': round(wall, 3),
+        'trial_fit_s': round(sum(r['fit_s'] for r in history), 3),
+        'workers': pool_size,
+        'deadline_hit': deadline.passed,
+    }
+
+
+MATRICES = {'tip': tip_matrix, 'demand': demand_matrix, 'duration': duration_matrix}
+
+
+def tune(files, models=tuple(MODELS), method='halving', trials=27, rows=300_000, workers=None,
+         folds=FOLDS, deadline=None):
+    """Pipeline 'tune' aşaması; files load aşamasının çıktısıdır.
+
+    Süre modelinin od_* özellikleri aşamanın OD matrisinden değil, kat başına doğrulama
+    penceresinden önceki seyahatlerle kurulan matrislerden gelir (DurationFolds).
+    """
+    print(f"\n[tune] Hiperparametre araması ({method}, {trials} aday, {folds} kat, "
+          f"{workers or os.cpu_count()} işçi)...")
+    yellow = [path for path, source in files if source == 'yellow']
+    features = [ensure_features(path, 'yellow') for path in yellow]
+    started = time.monotonic()
+    results = {}
+    for name in models:
+        with measure(f'tune.{name}.matrix') as m:
+            X, y, fold_features = MATRICES[name](yellow if name == 'demand' else features, rows)
+            m.rows_out = len(X)
+        remaining = None if deadline is None else deadline - (time.monotonic() - started)
+        if remaining is not None and remaining <= 0:
+            print(f"  {name}: süre sınırı doldu, atlandı")
+            continue
+        result = search(name, X, y, method, trials, workers, folds, remaining, fold_features=fold_features)
+        results[name] = result
+        print(f"  {name}: CV MAE {result['cv_mae']:.3f} (mevcut: {result['baseline_cv_mae']:.3f}), "
+              f"R² {result['cv_r2']:.3f}, {result['trials']} deneme, {result['wall_s']:.1f} s")
+        print(f"    en iyi: {result['best_params']}")
+    return {'ml_results': {'tuning': results}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Model hiperparametre araması (zamana duyarlı CV)")
+    parser.add_argument('--months', default=DEFAULT_MONTHS, help="ay veya aralık, örn. 2024-01:2024-03")
+    parser.add_argument('--models', default=','.join(MODELS), help="virgülle ayrılmış: tip,demand,duration")
+    parser.add_argument('--search', choices=SEARCHES, default='halving')
+    parser.add_argument('--trials', type=int, default=27, help="aday sayısı (mevcut parametreler dahil)")
+    parser.add_argument('--rows', type=int, default=300_000, help="tip / duration için örneklem satırı")
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--workers', type=int, default=None, help="süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument('--deadline', type=float, default=None, help="toplam süre sınırı (saniye)")
+    args = parser.parse_args(argv)
+
+    models = [name.strip() for name in args.models.split(',') if name.strip()]
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        parser.error(f"Bilinmeyen model: {', '.join(sorted(unknown))}")
+    files = load(month_range(args.months), DATA_DIR)
+    tune(files, models, args.search, args.trials, args.rows, args.workers, args.folds, args.deadline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Zone Demand - alış zone'u × saat düzeyinde Yellow ve FHV talep tahmini
+
+Seyahatler özellik önbelleğinden sayılarak yoğun bir (kaynak, zone, saat) dizisine yazılır.
+Gecikme ve kayan ortalama özellikleri bu dizi üzerinde NumPy indekslemesiyle kurulur:
+
+    lag_24h       hedef saatten 24 saat önce (dün aynı saat)
+    lag_168h      hedef saatten 168 saat önce (geçen hafta aynı saat)
+    rolling_3h    tahmin anından önceki son 3 saatin ortalaması
+    rolling_168h  tahmin anından önceki son haftanın saatlik ortalaması (zone düzeyi)
+
+Tek bir global XGBoost modeli (kaynak ve zone da birer özellik) 1-24 saat ufuklarını doğrudan
+tahmin eder; şehrin tamamı için sonraki 24 saat tek bir predict çağrısıdır (2 × 266 × 24 satır).
+Model dizini modelin yanında son haftanın sayılarını da tutar:
+
+    models/zone_demand/   model.ubj  history.npy  zone_demand.json
+
+    python src/zone_demand.py models/zone_demand --source fhv --top 10
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+
+from cleaning import time_features
+from feature_store import ensure_features, iter_feature_batches
+from model_manifest import file_month
+from od_matrix import zone_ids
+from out_of_core import booster_params
+from zone_index import N_ZONES, load_zone_index
+
+ZONE_DEMAND_VERSION = 1
+ZONE_DEMAND_META = "zone_demand.json"
+
+SOURCES = ('yellow', 'fhv')
+HORIZON = 24  # saat
+LOOKBACK = 168  # en uzun gecikme; tahmin için gereken geçmiş
+ORIGIN_STRIDE = 13  # eğitimde tahmin anları arası saat; 24 ile aralarında asal, her saat başı temsil edilir
+TEST_DAYS = 7
+
+FEATURES = ['source', 'zone', 'hour', 'day_of_week', 'is_weekend', 'is_rush_hour', 'horizon',
+            'lag_24h', 'lag_168h', 'rolling_3h', 'rolling_168h']
+ZONE_DEMAND_PARAMS = dict(n_estimators=150, max_depth=8, learning_rate=0.1, objective='count:poisson',
+                          random_state=42, n_jobs=-1)
+
+
+# =============================================================================
+# SAYIMLAR
+# =============================================================================
+def period(files):
+    """Dosya aylarının kapsadığı [başlangıç, bitiş) saat aralığı."""
+    months = sorted({month for month in (file_month(path) for path, _ in files) if month})
+    if not months:
+        raise ValueError("Dosya adlarından ay çıkarılamadı (ör. yellow_2024_01.parquet)")
+    start = np.datetime64(months[0], 'M').astype('datetime64[h]')
+    end = (np.datetime64(months[-1], 'M') + 1).astype('datetime64[h]')
+    return start, int((end - start) // np.timedelta64(1, 'h'))
+
+
+def zone_hour_counts(files, batch_size=1_000_000):
+    """(kaynak, zone, saat) seyahat sayıları (float32) ve ilk saatin zaman damgası; ayların tamamından."""
+    start, hours = period(files)
+    counts = np.zeros(len(SOURCES) * N_ZONES * hours, dtype=np.int64)
+    for path, source in files:
+        s = SOURCES.index(source)
+        for df in iter_feature_batches(ensure_features(path, source), batch_size, ['PULocationID', 'pickup_datetime']):
+            t = (df['pickup_datetime'].to_numpy().astype('datetime64[h]') - start).astype(np.int64)
+            keep = (t >= 0) & (t < hours)
+            cells = (s * N_ZONES + zone_ids(df['PULocationID'])[keep]) * hours + t[keep]
+            counts += np.bincount(cells, minlength=counts.size)
+    return counts.reshape(len(SOURCES), N_ZONES, hours).astype(np.float32), start
+
+
+# =============================================================================
+# ÖZELLİKLER
+# =============================================================================
+def calendar(start, t):
+    """Saat indeksleri -> (saat, haftanın günü, hafta sonu, yoğun saat) dizileri."""
+    features = time_features(start + t.astype('timedelta64[h]'))
+    return features['hour'], features['day_of_week'], features['is_weekend'], features['is_rush_hour']
+
+
+def feature_rows(counts, start, origins):
+    """Tahmin anları (O,) için özellik matrisi ve hedef saatler.
+
+    Satır sırası (kaynak, zone, an, ufuk); matris (S·Z·O·H, len(FEATURES)) float32, hedef saat
+    indeksleri (O, H). Tahmin anı `o`, bilinen son saat o - 1'dir; o >= LOOKBACK olmalıdır.
+    """
+    n_sources, n_zones, _ = counts.shape
+    origins = np.asarray(origins, dtype=np.int64)
+    horizon = np.arange(1, HORIZON + 1)
+    t = origins[:, None] + horizon[None, :] - 1
+    cumulative = np.zeros(counts.shape[:2] + (counts.shape[2] + 1,), dtype=np.float64)
+    np.cumsum(counts, axis=2, out=cumulative[:, :, 1:])
+    rolling_3h = (cumulative[:, :, origins] - cumulative[:, :, origins - 3]) / 3
+    rolling_168h = (cumulative[:, :, origins] - cumulative[:, :, origins - LOOKBACK]) / LOOKBACK
+    hour, day_of_week, is_weekend, is_rush_hour = calendar(start, t)
+
+    shape = (n_sources, n_zones) + t.shape
+    columns = {
+        'source': np.arange(n_sources)[:, None, None, None],
+        'zone': np.arange(n_zones)[None, :, None, None],
+        'hour': hour, 'day_of_week': day_of_week, 'is_weekend': is_weekend, 'is_rush_hour': is_rush_hour,
+        'horizon': horizon,
+        'lag_24h': counts[:, :, t - 24],
+        'lag_168h': counts[:, :, t - 168],
+        'rolling_3h': rolling_3h[..., None],
+        'rolling_168h': rolling_168h[..., None],
+    }
+    X = np.empty(shape + (len(FEATURES),), dtype=np.float32)
+    for i, name in enumerate(FEATURES):
+        X[..., i] = columns[name]
+    return X.reshape(-1, len(FEATURES)), t
+
+
+def training_rows(counts, start, origins, active):
+    """Etkin (kaynak, zone) çiftlerinin satırları -> (X, y)."""
+    X, t = feature_rows(counts, start, origins)
+    y = counts[:, :, t].reshape(-1)
+    keep = np.repeat(active.reshape(-1), t.size)
+    return X[keep], y[keep]
+
+
+def scores(y, pred):
+    error = np.abs(pred - y)
+    total = np.abs(y).sum()
+    return {'mae': round(float(error.mean()), 3),
+            'wmape': round(float(error.sum() / total), 4) if total else None,
+            'r2': round(float(1 - np.square(pred - y).sum() / np.square(y - y.mean()).sum()), 4)}
+
+
+# =============================================================================
+# MODEL
+# =============================================================================
+class ZoneDemandForecaster:
+    """Global model + son LOOKBACK saatin sayıları; forecast() şehrin tamamını tek çağrıda tahmin eder."""
+
+    def __init__(self, booster, history, start, meta=None):
+        self.booster = booster
+        self.history = np.asarray(history, dtype=np.float32)
+        self.start = np.datetime64(start, 'h')  # history[..., 0] saati
+        self.meta = meta or {}
+
+    @classmethod
+    def train(cls, counts, start, stride=ORIGIN_STRIDE, test_days=TEST_DAYS, params=ZONE_DEMAND_PARAMS):
+        """Son test_days günü ayırarak değerlendirir, sonra bütün veriyle yeniden eğitir."""
+        hours = counts.shape[2]
+        split = hours - test_days * 24
+        if split - HORIZON < LOOKBACK:
+            raise ValueError(f"En az {LOOKBACK + HORIZON + test_days * 24} saatlik veri gerekir ({hours} var)")
+        active = counts.sum(axis=2) > 0
+        native, rounds = booster_params(params)
+
+        # Değerlendirme: eğitim hedefleri test döneminden önce biter
+        train_origins = np.arange(LOOKBACK, split - HORIZON + 1, stride)
+        test_origins = np.arange(split, hours - HORIZON + 1, stride)
+        X, y = training_rows(counts, start, train_origins, active)
+        booster = xgb.train(native, xgb.QuantileDMatrix(X, y, feature_names=FEATURES), num_boost_round=rounds)
+        X_test, y_test = training_rows(counts, start, test_origins, active)
+        pred = booster.inplace_predict(X_test, validate_features=False)
+        lag_24, lag_168 = (X_test[:, FEATURES.index(name)] for name in ('lag_24h', 'lag_168h'))
+        evaluation = {'model': scores(y_test, pred), 'naive_lag_24h': scores(y_test, lag_24),
+                      'naive_lag_168h': scores(y_test, lag_168), 'test_rows': int(len(y_test))}
+
+        # Kaydedilen model son hafta dahil bütün tahmin anlarıyla
+        origins = np.arange(LOOKBACK, hours - HORIZON + 1, stride)
+        X, y = training_rows(counts, start, origins, active)
+        started = time.perf_counter()
+        booster = xgb.train(native, xgb.QuantileDMatrix(X, y, feature_names=FEATURES), num_boost_round=rounds)
+        fit_s = time.perf_counter() - started
+
+        meta = {'version': ZONE_DEMAND_VERSION, 'sources': list(SOURCES), 'features': FEATURES,
+                'horizon': HORIZON, 'trained_until': str(start + np.timedelta64(hours, 'h')),
+                'train_rows': int(len(y)), 'origins': int(len(origins)), 'active_zones':
+                    {source: int(active[s].sum()) for s, source in enumerate(SOURCES)},
+                'fit_s': round(fit_s, 3), 'evaluation': evaluation}
+        return cls(booster, counts[:, :, -LOOKBACK:], start + np.timedelta64(hours - LOOKBACK, 'h'), meta)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.booster.save_model(os.path.join(path, "model.ubj"))
+        np.save(os.path.join(path, "history.npy"), self.history)
+        # Meta en son yazılır; yarıda kalan bir model dizini açılmaz
+        with open(os.path.join(path, ZONE_DEMAND_META), 'w') as f:
+            json.dump(dict(self.meta, history_start=str(self.start)), f, indent=2)
+        return path
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, ZONE_DEMAND_META), 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != ZONE_DEMAND_VERSION:
+            raise ValueError(f"Zone talep modeli sürümü desteklenmiyor: {meta['version']} ({path})")
+        booster = xgb.Booster()
+        booster.load_model(os.path.join(path, "model.ubj"))
+        return cls(booster, np.load(os.path.join(path, "history.npy")), meta['history_start'], meta)
+
+    @property
+    def origin(self):
+        """İlk tahmin saati (geçmişten hemen sonraki saat)."""
+        return self.start + np.timedelta64(self.history.shape[2], 'h')
+
+    def forecast(self):
+        """Sonraki HORIZON saat için (kaynak, zone, ufuk) tahminleri; tek predict çağrısı."""
+        X, _ = feature_rows(self.history, self.start, [self.history.shape[2]])
+        pred = self.booster.inplace_predict(X, validate_features=False)
+        return np.maximum(pred, 0).reshape(self.history.shape[:2] + (HORIZON,))
+
+
+def forecast_section(forecaster, zone_index=None, top=10):
+    """ml_results.zone_demand: değerlendirme ve sonraki 24 saatin özeti."""
+    started = time.perf_counter()
+    forecast = forecaster.forecast()
+    forecast_ms = (time.perf_counter() - started) * 1000
+    stamps = forecaster.origin + np.arange(HORIZON).astype('timedelta64[h]')
+    top_zones = {}
+    for s, source in enumerate(SOURCES):
+        totals = forecast[s, 1:].sum(axis=1)
+        order = np.argsort(totals)[::-1][:top]
+        names = zone_index.names('Zone', order + 1) if zone_index is not None else [None] * len(order)
+        top_zones[source] = [{'PULocationID': int(z + 1), 'zone': name, 'trips': round(float(totals[z]), 1)}
+                             for z, name in zip(order, names)]
+    meta = forecaster.meta
+    return {
+        'grain': 'PULocationID x hour',
+        'features': FEATURES,
+        'train_rows': meta.get('train_rows'),
+        'fit_s': meta.get('fit_s'),
+        'evaluation': meta.get('evaluation'),
+        'next_24h': {
+            'start': str(stamps[0]),
+            'forecast_ms': round(forecast_ms, 2),
+            'city_by_hour': {source: [round(float(v), 1) for v in forecast[s].sum(axis=0)]
+                             for s, source in enumerate(SOURCES)},
+            'top_zones': top_zones,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zone bazında sonraki 24 saatin talep tahmini")
+    parser.add_argument('path', help="model dizini (ör. models/zone_demand)")
+    parser.add_argument('--source', choices=SOURCES, default='yellow')
+    parser.add_argument('--top', type=int, default=10, help="en yoğun kaç zone listelensin")
+    parser.add_argument('--data-dir', default=None, help="taxi_zone_lookup.csv'nin bulunduğu dizin (zone adları)")
+    args = parser.parse_args(argv)
+
+    forecaster = ZoneDemandForecaster.open(args.path)
+    started = time.perf_counter()
+    forecast = forecaster.forecast()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{forecaster.origin} itibarıyla sonraki {HORIZON} saat: {forecast.shape[1] * HORIZON * len(SOURCES):,} "
+          f"tahmin, {elapsed:.1f} ms")
+    names = load_zone_index(args.data_dir) if args.data_dir else None
+
+    s = SOURCES.index(args.source)
+    totals = forecast[s, 1:].sum(axis=1)
+    for z in np.argsort(totals)[::-1][:args.top]:
+        name = names.names('Zone', [z + 1])[0] if names is not None else ""
+        peak = int(np.argmax(forecast[s, z + 1]))
+        print(f"  {z + 1:>3} {str(name)[:28]:<28} {totals[z]:>9,.0f} seyahat  (tepe: +{peak + 1} saat, "
+              f"{forecast[s, z + 1, peak]:,.0f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+NYC Urban Mobility Intelligence Platform
+Zone Index - LocationID ile doğrudan indekslenen zone tabloları
+
+LocationID'ler küçük ve yoğun tamsayılar (1-265) olduğundan borough / zone / service_zone
+bilgisi hash join yerine NumPy dizilerinden vektörel `take` ile okunur.
+"""
+
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+from tlc import ZONE_LOOKUP_FILE
+
+N_ZONES = 266  # LocationID 1-265 (0 = bilinmeyen / aralık dışı)
+AIRPORT_ZONES = [1, 132, 138]  # Newark, JFK, LaGuardia
+FIELDS = ('Borough', 'Zone', 'service_zone')
+
+
+class ZoneIndex:
+
+    def __init__(self, zones_df):
+        ids = zones_df['LocationID'].to_numpy(dtype=np.int64)
+        self.size = max(int(ids.max()) + 1, N_ZONES)
+        self.categories = {}
+        self.tables = {}
+        for field in FIELDS:
+            categories = sorted(zones_df[field].dropna().unique())
+            table = np.full(self.size, -1, dtype=np.int16)
+            table[ids] = pd.Categorical(zones_df[field], categories=categories).codes
+            self.categories[field] = pd.Index(categories)
+            self.tables[field] = table
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls(pd.read_csv(path))
+
+    def codes(self, field, location_ids):
+        """Her LocationID için kategori kodu; tabloda olmayan ID'ler -1."""
+        ids = np.asarray(location_ids, dtype=np.int64)
+        valid = (ids >= 0) & (ids < self.size)
+        return np.where(valid, self.tables[field].take(np.where(valid, ids, 0)), -1).astype(np.int16)
+
+    def categorical(self, field, location_ids):
+        dtype = pd.CategoricalDtype(self.categories[field])
+        return pd.Categorical.from_codes(self.codes(field, location_ids), dtype=dtype)
+
+    def names(self, field, location_ids):
+        """Küçük tablolar (ör. zone bazında özetler) için isim dizisi; bilinmeyenler NaN."""
+        return np.asarray(self.categorical(field, location_ids).astype(object))
+
+
+@functools.lru_cache(maxsize=None)
+def load_zone_index(data_dir):
+    return ZoneIndex.from_csv(os.path.join(data_dir, ZONE_LOOKUP_FILE))
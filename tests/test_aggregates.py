@@ -0,0 +1,45 @@
+import numpy as np
+
+from aggregates import SOURCES, TripAggregates
+from feature_store import clean_batch, scan_raw
+from micro_batch import LiveAggregates
+from synthetic import generate
+from trip_cube import build_cube
+
+
+def clean_frames(data_dir, months, seed=0):
+    frames = {}
+    for path, source in generate(data_dir, months, rows=3000, fhv_rows=2000, seed=seed):
+        frames[source] = clean_batch(scan_raw(path, source, 1_000_000).to_table().to_pandas(), source, data_dir)
+    return frames
+
+
+def test_cube_rollup_has_no_std_columns(tmp_path):
+    data_dir = str(tmp_path)
+    frames = clean_frames(data_dir, [(2024, 1)])
+    cube = build_cube(frames)
+    for source in SOURCES:
+        agg = TripAggregates.from_cube(cube, source)
+        direct = TripAggregates(source).update(frames[source])
+        assert agg.sumsq is None
+        np.testing.assert_array_equal(agg.count, direct.count)
+
+        table = agg.table(keep=('hour',))
+        assert not [column for column in table.columns if column.endswith('_std')]
+        assert {f'{metric}_std' for metric in direct.metrics} <= set(direct.table(keep=('hour',)).columns)
+
+        # Bilinmeyen kareler toplamı birleştirmede de bilinmez kalır
+        assert agg.merge(direct).sumsq is None
+
+
+def test_bootstrapped_state_keeps_sumsq_unknown(tmp_path):
+    data_dir, state = str(tmp_path / 'data'), str(tmp_path / 'state')
+    cube = build_cube(clean_frames(data_dir, [(2024, 1)]))
+    live = LiveAggregates({source: TripAggregates.from_cube(cube, source) for source in SOURCES})
+    live.update(clean_frames(data_dir, [(2024, 2)], seed=1)['yellow'], 'yellow')
+    live.save(state)
+
+    reopened = LiveAggregates.open(state)
+    for source in SOURCES:
+        assert reopened.aggregates[source].sumsq is None
+        np.testing.assert_array_equal(reopened.aggregates[source].count, live.aggregates[source].count)
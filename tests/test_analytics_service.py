@@ -0,0 +1,38 @@
+import numpy as np
+
+from analytics_service import AnalyticsService
+from feature_store import clean_batch, scan_raw
+from synthetic import generate
+from trip_cube import build_cube
+from zone_index import load_zone_index
+
+
+def make_service(tmp_path):
+    data_dir, cube_dir = str(tmp_path / 'data'), str(tmp_path / 'cube')
+    frames = {}
+    for path, source in generate(data_dir, [(2024, 1)], rows=3000, fhv_rows=2000):
+        frames[source] = clean_batch(scan_raw(path, source, 1_000_000).to_table().to_pandas(), source, data_dir)
+    build_cube(frames, load_zone_index(data_dir)).save(cube_dir)
+    return AnalyticsService(cube_dir=cube_dir, data_dir=data_dir, workers=1), frames
+
+
+def test_query_rows_carry_per_trip_averages(tmp_path):
+    service, frames = make_service(tmp_path)
+    rows = service.compute('/api/query', {'by': ['provider']})['rows']
+    yellow = next(row for row in rows if row['provider'] == 'Yellow')
+    df = frames['yellow']
+    assert yellow['trips'] == len(df)
+    assert np.isclose(yellow['avg_fare'], df['fare_amount'].mean(), atol=0.01)
+    assert np.isclose(yellow['avg_tip_pct'], df['tip_percentage'].mean(), atol=0.01)
+    assert np.isclose(yellow['avg_distance'], df['trip_distance'].mean(), atol=0.01)
+    assert np.isclose(yellow['avg_duration'], df['trip_duration'].mean(), atol=0.01)
+    # Ham toplamlar da korunur
+    assert np.isclose(yellow['tip_pct'], yellow['avg_tip_pct'] * yellow['trips'], rtol=1e-3)
+
+
+def test_averaged_measure_brings_trips_along(tmp_path):
+    service, _ = make_service(tmp_path)
+    rows = service.compute('/api/query', {'by': ['provider'], 'measures': ['fare']})['rows']
+    assert set(rows[0]) == {'provider', 'trips', 'fare', 'avg_fare'}
+    rows = service.compute('/api/query', {'measures': ['revenue']})['rows']
+    assert set(rows[0]) == {'revenue'}
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_fhvhv, clean_yellow_taxi
+from trip_cube import cell_codes
+
+
+def test_null_pickup_fhv_row_is_dropped_before_cell_codes():
+    df = pd.DataFrame({
+        'hvfhs_license_num': ['HV0003', 'HV0005'],
+        'pickup_datetime': pd.to_datetime(['2024-01-02 08:15', None]),
+        'dropoff_datetime': pd.to_datetime(['2024-01-02 08:40', '2024-01-02 09:00']),
+        'PULocationID': [132, 161], 'DOLocationID': [230, 48],
+        'trip_miles': [12.0, 3.0], 'trip_time': [1500, 900],
+        'base_passenger_fare': [40.0, 15.0], 'tips': [5.0, 0.0],
+    })
+    cleaned = clean_fhvhv(df)
+    assert len(cleaned) == 1
+    assert cleaned['hour'].tolist() == [8]
+    codes = cell_codes(cleaned, 'fhv')
+    assert len(codes) == 1 and codes[0] >= 0
+
+
+def test_null_dropoff_yellow_row_is_dropped():
+    df = pd.DataFrame({
+        'tpep_pickup_datetime': pd.to_datetime(['2024-01-02 08:15', '2024-01-02 09:00']),
+        'tpep_dropoff_datetime': pd.to_datetime(['2024-01-02 08:40', None]),
+        'passenger_count': [1, 1], 'trip_distance': [3.0, 2.0], 'PULocationID': [132, 161],
+        'DOLocationID': [230, 48], 'fare_amount': [20.0, 12.0], 'tip_amount': [3.0, 1.0],
+        'tolls_amount': [0.0, 0.0], 'payment_type': [1, 1],
+    })
+    cleaned = clean_yellow_taxi(df)
+    assert len(cleaned) == 1
+    assert np.isfinite(cleaned['trip_duration']).all()
@@ -0,0 +1,154 @@
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from downloader import MANIFEST_FILE, PART_META_SUFFIX, download_files
+
+
+def _parquet_bytes(rows=5_000, seed=0):
+    buffer = io.BytesIO()
+    pd.DataFrame({'value': range(seed, seed + rows)}).to_parquet(buffer)
+    return buffer.getvalue()
+
+
+class Remote:
+    """Range / If-Range / ETag destekli yerel http.server yerine geçen sunucu."""
+
+    def __init__(self):
+        self.files = {}  # yol -> (içerik, etag)
+        self.head_ok = True
+        self.requests = []
+        remote = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _file(self):
+                return remote.files.get(self.path)
+
+            def do_HEAD(self):
+                remote.requests.append(('HEAD', self.path, dict(self.headers)))
+                item = self._file()
+                if not remote.head_ok or item is None:
+                    self.send_response(404 if item is None else 405)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(item[0])))
+                self.send_header('ETag', item[1])
+                self.end_headers()
+
+            def do_GET(self):
+                remote.requests.append(('GET', self.path, dict(self.headers)))
+                content, etag = self._file()
+                start = 0
+                byte_range = self.headers.get('Range')
+                if byte_range and self.headers.get('If-Range') in (None, etag):
+                    start = int(byte_range.split('=')[1].rstrip('-'))
+                self.send_response(206 if start else 200)
+                self.send_header('Content-Length', str(len(content) - start))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(content[start:])
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def gets(self):
+        return [headers for method, _, headers in self.requests if method == 'GET']
+
+
+@pytest.fixture
+def remote():
+    server = Remote()
+    yield server
+    server.server.shutdown()
+
+
+def _part(data_dir, name, content, etag=None):
+    path = os.path.join(data_dir, name)
+    with open(f"{path}.part", 'wb') as f:
+        f.write(content)
+    if etag is not None:
+        with open(f"{path}{PART_META_SUFFIX}", 'w') as f:
+            json.dump({'etag': etag}, f)
+    return path
+
+
+def test_truncated_part_resumes_with_its_own_etag(remote, tmp_path):
+    content = _parquet_bytes()
+    remote.files['/a.parquet'] = (content, '"v1"')
+    path = _part(tmp_path, 'a.parquet', content[:1000], etag='"v1"')
+
+    download_files({'a.parquet': f"{remote.url}/a.parquet"}, str(tmp_path), workers=1)
+
+    assert open(path, 'rb').read() == content
+    (get,) = remote.gets()
+    assert get['Range'] == 'bytes=1000-' and get['If-Range'] == '"v1"'
+    assert not os.path.exists(f"{path}.part") and not os.path.exists(f"{path}{PART_META_SUFFIX}")
+    assert json.load(open(tmp_path / MANIFEST_FILE))['a.parquet']['size'] == len(content)
+
+
+def test_part_of_an_older_version_restarts_from_zero(remote, tmp_path):
+    old, new = _parquet_bytes(seed=0), _parquet_bytes(seed=100)
+    remote.files['/a.parquet'] = (new, '"v2"')
+    path = _part(tmp_path, 'a.parquet', old[:len(old) // 2], etag='"v1"')
+
+    download_files({'a.parquet': f"{remote.url}/a.parquet"}, str(tmp_path), workers=1)
+
+    assert open(path, 'rb').read() == new
+    assert 'Range' not in remote.gets()[0]
+
+
+def test_part_without_stored_etag_restarts_from_zero(remote, tmp_path):
+    content = _parquet_bytes()
+    remote.files['/a.parquet'] = (content, '"v1"')
+    path = _part(tmp_path, 'a.parquet', b'x' * 1000)
+
+    download_files({'a.parquet': f"{remote.url}/a.parquet"}, str(tmp_path), workers=1)
+
+    assert open(path, 'rb').read() == content
+    assert 'Range' not in remote.gets()[0]
+
+
+def test_unverifiable_truncated_file_is_downloaded_again(remote, tmp_path):
+    content = _parquet_bytes()
+    remote.files['/a.parquet'] = (content, '"v1"')
+    remote.head_ok = False
+    path = tmp_path / 'a.parquet'
+    path.write_bytes(content[:len(content) - 100])
+
+    download_files({'a.parquet': f"{remote.url}/a.parquet"}, str(tmp_path), workers=1)
+
+    assert path.read_bytes() == content
+
+
+def test_unverifiable_complete_parquet_is_kept(remote, tmp_path):
+    content = _parquet_bytes()
+    remote.files['/a.parquet'] = (content, '"v1"')
+    remote.head_ok = False
+    (tmp_path / 'a.parquet').write_bytes(content)
+
+    download_files({'a.parquet': f"{remote.url}/a.parquet"}, str(tmp_path), workers=1)
+
+    assert remote.gets() == []
+
+
+def test_local_mirror_is_copied(tmp_path):
+    mirror, data_dir = tmp_path / 'mirror', tmp_path / 'data'
+    mirror.mkdir()
+    content = _parquet_bytes()
+    (mirror / 'a.parquet').write_bytes(content)
+
+    paths = download_files({'a.parquet': str(mirror / 'a.parquet')}, str(data_dir), workers=1)
+
+    assert open(paths['a.parquet'], 'rb').read() == content
+    assert not os.path.exists(f"{paths['a.parquet']}.part")
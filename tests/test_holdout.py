@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from feature_store import load_features
+from out_of_core import file_holdout, split_batches
+
+
+def test_train_and_test_parts_partition_the_file(tmp_path):
+    path = str(tmp_path / 'part-0.parquet')
+    pd.DataFrame({'value': np.arange(10_000, dtype=np.int64)}).to_parquet(path)
+
+    train = pd.concat(split_batches([path], ['value'], 'train', batch_size=999))
+    test = pd.concat(split_batches([path], ['value'], 'test', batch_size=999))
+    assert len(train) + len(test) == 10_000
+    assert not set(train['value']) & set(test['value'])
+    assert 0.15 < len(test) / 10_000 < 0.25
+
+
+def test_sampled_positions_select_the_same_test_rows(tmp_path):
+    path = str(tmp_path / 'part-0.parquet')
+    pd.DataFrame({'value': np.arange(10_000, dtype=np.int64)}).to_parquet(path)
+
+    sample = load_features(path, frac=0.3, positions=True)
+    np.testing.assert_array_equal(sample.index, sample['value'])
+    test = set(pd.concat(split_batches([path], ['value'], 'test'))['value'])
+    assert set(sample['value'][file_holdout(path, sample.index)]) <= test
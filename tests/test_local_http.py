@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from local_http import HTTPError, JSONServer, json_body
+
+
+class FailingServer(JSONServer):
+    async def route(self, method, path, params, headers, body):
+        if path == '/boom':
+            raise ValueError("bozuk sorgu")
+        if path == '/missing':
+            raise HTTPError(404, "yok")
+        return 200, {}, json_body({'ok': True})
+
+
+async def _exchange(paths):
+    server = await asyncio.start_server(FailingServer().handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = []
+        for path in paths:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            await writer.drain()
+            status = (await reader.readline()).decode()
+            headers = {}
+            while (line := await reader.readline()) != b'\r\n':
+                name, _, value = line.decode().partition(':')
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers['content-length']))
+            responses.append((status, json.loads(body)))
+        writer.close()
+        return responses
+
+
+def test_unexpected_route_error_returns_json_500_and_keeps_connection():
+    (boom, boom_body), (missing, _), (ok, ok_body) = asyncio.run(_exchange(['/boom', '/missing', '/']))
+    assert boom.startswith('HTTP/1.1 500 Internal Server Error')
+    assert 'bozuk sorgu' in boom_body['error']
+    assert missing.startswith('HTTP/1.1 404')
+    assert ok.startswith('HTTP/1.1 200') and ok_body == {'ok': True}
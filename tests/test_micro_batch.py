@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+
+from aggregates import SOURCES, TripAggregates
+from feature_store import clean_batch, scan_raw
+from micro_batch import LiveAggregates, run_once
+from synthetic import generate
+
+
+def one_shot(paths, data_dir):
+    aggregates = {source: TripAggregates(source) for source in SOURCES}
+    for path, source in paths:
+        for batch in scan_raw(path, source, 1_000_000).to_batches():
+            if batch.num_rows:
+                aggregates[source].update(clean_batch(batch.to_pandas(), source, data_dir))
+    return aggregates
+
+
+def test_corrupt_file_is_recorded_and_counters_match_one_shot(tmp_path):
+    landing, state = str(tmp_path / 'landing'), str(tmp_path / 'state')
+    output = str(tmp_path / 'analysis_results.json')
+    files = generate(landing, [(2024, 1)], rows=3000, fhv_rows=2000)
+    with open(os.path.join(landing, 'yellow_bad.parquet'), 'wb') as f:
+        f.write(b'PAR1 not a parquet file')
+
+    live = LiveAggregates()
+    assert run_once(live, landing, state, output, landing, settle=0) == 3
+    assert 'error' in live.files['yellow_bad.parquet']
+
+    # İkinci tur: yeni ay gelir, bozuk dosya değişmediği için yeniden denenmez
+    files += generate(landing, [(2024, 2)], rows=3000, fhv_rows=2000, seed=1)
+    assert run_once(live, landing, state, output, landing, settle=0) == 2
+    assert run_once(live, landing, state, output, landing, settle=0) == 0
+
+    expected = one_shot(files, landing)
+    reopened = LiveAggregates.open(state)
+    for current in (live, reopened):
+        for source in SOURCES:
+            assert current.aggregates[source].total == expected[source].total > 0
+            np.testing.assert_array_equal(current.aggregates[source].count, expected[source].count)
+            np.testing.assert_allclose(current.aggregates[source].sums, expected[source].sums)
+    assert 'error' in reopened.files['yellow_bad.parquet']
+    with open(output) as f:
+        ingestion = json.load(f)['live_ingestion']
+    assert ingestion['files'] == 4
+    assert [entry['file'] for entry in ingestion['errors']] == ['yellow_bad.parquet']
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from od_matrix import ALL_HOURS, ODBuilder, ODMatrix
+
+
+def _trips(n, seed):
+    rng = np.random.default_rng(seed)
+    duration = rng.lognormal(2.5, 0.5, n).clip(1.5, 170).astype(np.float32)
+    return pd.DataFrame({'PULocationID': rng.integers(1, 4, n), 'DOLocationID': rng.integers(1, 4, n),
+                         'hour': rng.integers(0, 24, n), 'trip_duration': duration,
+                         'trip_distance': (duration / 60 * rng.uniform(5, 25, n)).astype(np.float32)})
+
+
+def test_merged_builders_equal_single_pass():
+    a, b = _trips(5_000, 1), _trips(7_000, 2)
+    single = ODMatrix.build([a, b])
+    merged = ODBuilder().update(a).merge(ODBuilder().update(b)).matrix()
+    for name, values in single.arrays.items():
+        np.testing.assert_array_equal(values, merged.arrays[name])
+    assert merged.meta['trips'] == 12_000
+
+
+def test_percentiles_within_bin_width_of_exact():
+    df = _trips(20_000, 3)
+    od = ODMatrix.build([df])
+    pair = df[(df['PULocationID'] == 2) & (df['DOLocationID'] == 3)]
+    assert od.arrays['trips'][2, 3, ALL_HOURS] == len(pair)
+    for name, column, q in (('duration_p50', 'trip_duration', 50), ('duration_p90', 'trip_duration', 90),
+                            ('distance_p50', 'trip_distance', 50)):
+        exact = np.percentile(pair[column], q)
+        assert abs(od.arrays[name][2, 3, ALL_HOURS] - exact) / exact < 0.04
@@ -0,0 +1,43 @@
+import json
+
+from main_analysis import RESULT_KEYS, save
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_analysis_then_duration_keeps_dashboard_sections(tmp_path):
+    # main_analysis.py: tablo bölümleri + bahşiş / talep modelleri
+    save([{'summary_stats': {'yellow_trips': 10}, 'hourly_demand': {'0': 5}},
+          {'tip_analysis': {'by_hour': {'0': 1.5}}, 'ml_results': {'tip_model': {'r2': 0.5}}},
+          {'airport_analysis': {'JFK': 3}}], output_dir=tmp_path)
+    # advanced_models.py: süre modeli + kendi performans bölümü
+    path = save([{'ml_results': {'duration_model': {'mae': 4.2}}, 'congestion_analysis': {'x': 1}},
+                 {'performance': {'stages': {}}}], output_dir=tmp_path)
+
+    results = _read(path)
+    assert results['summary_stats'] == {'yellow_trips': 10}
+    assert results['hourly_demand'] == {'0': 5}
+    assert results['airport_analysis'] == {'JFK': 3}
+    assert results['tip_analysis'] == {'by_hour': {'0': 1.5}}
+    assert results['ml_results'] == {'tip_model': {'r2': 0.5}, 'duration_model': {'mae': 4.2}}
+    assert results['congestion_analysis'] == {'x': 1}
+    assert list(results)[:len(RESULT_KEYS)] == RESULT_KEYS
+
+
+def test_rerun_overwrites_only_produced_sections(tmp_path):
+    save([{'summary_stats': {'yellow_trips': 10}, 'ml_results': {'tip_model': {'r2': 0.5}}}], output_dir=tmp_path)
+    path = save([{'summary_stats': {'yellow_trips': 20}}], output_dir=tmp_path)
+
+    results = _read(path)
+    assert results['summary_stats'] == {'yellow_trips': 20}
+    assert results['ml_results'] == {'tip_model': {'r2': 0.5}}
+    assert not (tmp_path / 'analysis_results.json.tmp').exists()
+
+
+def test_save_without_existing_file_has_every_key(tmp_path):
+    results = _read(save([{'market_share': {'yellow': 0.3}}], output_dir=tmp_path))
+    assert set(RESULT_KEYS) <= set(results)
+    assert results['market_share'] == {'yellow': 0.3}
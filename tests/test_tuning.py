@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from tuning import DurationFolds, prior_matrices
+
+
+def _feature_file(tmp_path):
+    # Aynı çift: ilk 10 gün 10 dk, sonraki günler 60 dk
+    times = pd.date_range('2024-01-01', periods=2_000, freq='10min')
+    duration = np.where(times < pd.Timestamp('2024-01-11'), 10.0, 60.0).astype(np.float32)
+    df = pd.DataFrame({'PULocationID': 1, 'DOLocationID': 2, 'hour': times.hour.astype(np.uint8),
+                       'trip_distance': np.float32(3.0), 'trip_duration': duration, 'pickup_datetime': times})
+    path = str(tmp_path / 'part-0.parquet')
+    df.to_parquet(path)
+    return path, df
+
+
+def test_prior_matrices_only_see_earlier_trips(tmp_path):
+    path, df = _feature_file(tmp_path)
+    cutoffs = [pd.Timestamp('2024-01-05').value, pd.Timestamp('2024-01-12').value]
+    first, second = prior_matrices([path], cutoffs)
+    assert first.meta['trips'] == (df['pickup_datetime'] < '2024-01-05').sum()
+    assert second.meta['trips'] == (df['pickup_datetime'] < '2024-01-12').sum()
+    assert abs(first.arrays['duration_p50'][1, 2, 24] - 10) < 0.5
+
+
+def test_validation_rows_never_feed_their_own_features(tmp_path):
+    path, df = _feature_file(tmp_path)
+    X = np.zeros((len(df), 1), dtype=np.float32)
+    start = int(np.flatnonzero(df['pickup_datetime'] >= '2024-01-11')[0])
+    X_full, columns = DurationFolds([path], df)(X, [start])
+    od_duration = X_full[start:, columns[start][1]]
+    # Doğrulama penceresi 60 dk'lık seyahatlerle başlar; özellikleri yalnızca önceki 10 dk'lıkları görür
+    assert np.all(np.abs(od_duration - 10) < 0.5)